@@ -0,0 +1,151 @@
+"""
+Latency and throughput benchmarks of the hot paths, run against the simulated backends (no hardware needed)
+
+* move: latency between the end of the simulated motion and the return of ActuatorWrapper.move_at
+* read: IK220 reads per second (single axis, batched axes, and from the background sampler)
+* grab: latency between the call of DAQ_0DViewer_Arduino.grab_data and the emission of its data (needs pymodaq)
+* pid: iteration period of the ClosedLoopPositioner
+
+usage: python benchmarks/bench_hot_paths.py [--json results.json] [--compare previous.json]
+"""
+
+import argparse
+import json
+import platform
+import time
+from time import perf_counter
+
+import numpy as np
+
+from pymodaq_plugins_arduino import __version__
+from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
+from pymodaq_plugins_arduino.hardware.closed_loop import ClosedLoopPositioner
+from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
+from pymodaq_plugins_arduino.hardware.simulator import SimulatedIK220Dll, SimulatedTelemetrix, SIMULATED_PORT
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import pool
+
+
+def percentiles(values):
+    """Summary statistics of a list of durations (s)"""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return dict(n=0)
+    return dict(n=len(values), mean=float(values.mean()), p50=float(np.percentile(values, 50)),
+                p90=float(np.percentile(values, 90)), p99=float(np.percentile(values, 99)), max=float(values.max()))
+
+
+def bench_move(actuator, n_moves):
+    """Delay between the end of the simulated motion and the return of a blocking move_at"""
+    stepper = pool.board(SIMULATED_PORT).steppers[actuator.motor]
+    latencies = []
+    for ind in range(n_moves):
+        actuator.move_at(10 * (1 + ind % 2))
+        latencies.append(perf_counter() - (stepper.start_time + stepper.duration))
+    return percentiles(latencies)
+
+
+def bench_read(duration):
+    """Number of reads per second of the simulated ruler"""
+    ruler = IK220(dll=SimulatedIK220Dll(axes=[0, 1, 2, 3]))
+    results = dict()
+    for name, read in [('get_axis_position', lambda: ruler.get_axis_position(1)),
+                       ('read_axes_4', lambda: ruler.read_axes()),
+                       ]:
+        count = 0
+        start = perf_counter()
+        while perf_counter() - start < duration:
+            read()
+            count += 1
+        results[name] = count / (perf_counter() - start)
+
+    ruler.start_sampling(rate=1000.)
+    count = 0
+    start = perf_counter()
+    while perf_counter() - start < duration:
+        ruler.get_axis_position(1)
+        count += 1
+    results['get_axis_position_sampled'] = count / (perf_counter() - start)
+    results['sampler_rate'] = ruler.sampler.buffer.count / (perf_counter() - start)
+    ruler.stop_sampling()
+    return results
+
+
+def bench_grab(n_grabs):
+    """Latency between the call of grab_data and the emission of the data (skipped if pymodaq is not installed)"""
+    try:
+        from pymodaq_plugins_arduino.daq_viewer_plugins.plugins_0D.daq_0Dviewer_Arduino import DAQ_0DViewer_Arduino
+    except ImportError as e:
+        return dict(skipped=str(e))
+    viewer = DAQ_0DViewer_Arduino(None, None)
+    viewer.settings.child('simulated').setValue(True)
+    viewer.ini_detector()
+    emitted = []
+    viewer.data_grabed_signal.connect(lambda data: emitted.append(perf_counter()))
+    latencies = []
+    for ind in range(n_grabs):
+        start = perf_counter()
+        viewer.grab_data()
+        latencies.append(emitted[-1] - start)
+    viewer.close()
+    return percentiles(latencies)
+
+
+def bench_pid(actuator, n_runs):
+    """Period of the closed loop iterations, the loop rate being set far above what can be achieved"""
+    ruler = IK220(dll=SimulatedIK220Dll(axes=[1]))
+    positioner = ClosedLoopPositioner(actuator, lambda: ruler.get_axis_position(1), kp=1., output_scale=500.,
+                                      tolerance=0.002, loop_rate=1e5, max_iterations=10000)
+    periods = []
+    for ind in range(n_runs):
+        ticks = []
+        positioner.run(0.02 * (1 + ind % 2), callback=lambda position: ticks.append(perf_counter()))
+        periods.extend(np.diff(ticks))
+    return percentiles(periods)
+
+
+def compare(results, previous):
+    """Print the ratio of the p50 (or rates) between these results and previous ones"""
+    for bench, values in results['benchmarks'].items():
+        old = previous.get('benchmarks', {}).get(bench, {})
+        for key in ('p50', 'get_axis_position', 'read_axes_4', 'get_axis_position_sampled'):
+            if key in values and key in old:
+                print(f'{bench:6s} {key:26s} {values[key]:.6g} (previous {old[key]:.6g}, '
+                      f'ratio {values[key] / old[key]:.2f})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--moves', type=int, default=50, help='number of simulated moves')
+    parser.add_argument('--read-duration', type=float, default=1., help='duration (s) of each read benchmark')
+    parser.add_argument('--grabs', type=int, default=500, help='number of grabs')
+    parser.add_argument('--pid-runs', type=int, default=5, help='number of closed loop runs')
+    parser.add_argument('--latency', type=float, default=0.001, help='simulated telemetrix report latency (s)')
+    parser.add_argument('--json', help='file in which the results are written')
+    parser.add_argument('--compare', help='results of a previous run to compare with')
+    args = parser.parse_args()
+
+    pool.factory = lambda port, arduino_wait: SimulatedTelemetrix(port, latency=args.latency)
+    actuator = ActuatorWrapper()
+    actuator.open_communication(SIMULATED_PORT)
+    actuator.max_speed_set(1000)  # fastest profile accepted by telemetrix, the moves are kept to a few steps
+    actuator.accel_set(1000)
+
+    benchmarks = dict(move=bench_move(actuator, args.moves),
+                      read=bench_read(args.read_duration),
+                      grab=bench_grab(args.grabs),
+                      pid=bench_pid(actuator, args.pid_runs))
+    actuator.close_communication()
+
+    results = dict(version=__version__, python=platform.python_version(), platform=platform.platform(),
+                   date=time.strftime('%Y-%m-%d %H:%M:%S'), simulated_latency=args.latency, benchmarks=benchmarks)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+    if args.compare:
+        with open(args.compare) as fin:
+            compare(results, json.load(fin))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Import time benchmark of the plugin modules
+
+Each module is imported in a fresh interpreter (so that nothing is cached by a previous import) and the wall time of
+the import statement is measured. The serial port enumeration, which is now done lazily, is timed separately.
+
+usage: python benchmarks/bench_import.py [--repeat 5] [--json results.json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ['pymodaq_plugins_arduino.hardware.arduino_wrapper',
+           'pymodaq_plugins_arduino.hardware.ruler_wrapper',
+           'pymodaq_plugins_arduino.daq_move_plugins',
+           'pymodaq_plugins_arduino.daq_viewer_plugins.plugins_0D',
+           'pymodaq_plugins_arduino.models.PIDModelGrating']
+
+SNIPPET = """
+from time import perf_counter
+start = perf_counter()
+{statement}
+print(perf_counter() - start)
+"""
+
+
+def time_statement(statement, repeat):
+    durations = []
+    for ind in range(repeat):
+        result = subprocess.run([sys.executable, '-c', SNIPPET.format(statement=statement)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        durations.append(float(result.stdout.strip().splitlines()[-1]))
+    return durations, ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per measurement')
+    parser.add_argument('--json', help='file in which the results are written')
+    args = parser.parse_args()
+
+    statements = {module: f'import {module}' for module in MODULES}
+    statements['get_ports'] = ('from pymodaq_plugins_arduino.hardware.serial_ports import get_ports\n'
+                               'start = perf_counter()\n'
+                               'get_ports()')
+
+    results = {}
+    for name, statement in statements.items():
+        durations, error = time_statement(statement, args.repeat)
+        if durations is None:
+            print(f'{name:60s} failed: {error}')
+            results[name] = dict(error=error)
+            continue
+        results[name] = dict(median=statistics.median(durations), min=min(durations), max=max(durations))
+        print(f'{name:60s} median {1000 * results[name]["median"]:8.1f} ms '
+              f'(min {1000 * results[name]["min"]:.1f}, max {1000 * results[name]["max"]:.1f})')
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,17 @@ from pymodaq.daq_utils.daq_utils import ThreadCommand, getLineInfo  # object use
 from easydict import EasyDict as edict  # type of dict
 from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
 import time
+import functools
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import pyqtSignal, QThread
 
-from serial.tools import list_ports
-ports = [str(port.name) for port in list_ports.comports()]
+from pymodaq_plugins_arduino.hardware.serial_ports import get_ports
+from pymodaq_plugins_arduino.hardware.trajectory import waypoints
+from pymodaq_plugins_arduino.hardware.motion_profile import MotionPlanner
+from pymodaq_plugins_arduino.hardware.backends import ACTUATOR_BACKENDS, actuator_class
+from pymodaq_plugins_arduino.hardware import instrumentation
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
+
 port = 'COM5' #if 'cu.usbmodem401301' in ports else ports[0] if len(ports)>0 else ''
 class DAQ_Move_Arduino(DAQ_Move_base):
     """
@@ -24,20 +30,62 @@ class DAQ_Move_Arduino(DAQ_Move_base):
     _epsilon = 1  # TODO replace this by a value that is correct depending on your controller
 
 
-    is_multiaxes = False  # set to True if this plugin is controlled for a multiaxis controller (with a unique communication link)
-    stage_names = ['Motor 1']  # "list of strings of the multiaxes
+    is_multiaxes = True  # set to True if this plugin is controlled for a multiaxis controller (with a unique communication link)
+    stage_names = ['Motor 1', 'Motor 2', 'Motor 3', 'Motor 4']  # "list of strings of the multiaxes (telemetrix drives up to 4 steppers)
 
     params = [   ## TODO for your custom plugin
                  # elements to be added here as dicts in order to control your custom stage
                  ############
-                 {'title': 'Com port:', 'name': 'comport', 'type': 'str', 'limits':ports, 'value': port,
+                 {'title': 'Com port:', 'name': 'comport', 'type': 'str', 'value': port,
                   'tip': 'The serial COM port'},
+                 {'title': 'Detected ports:', 'name': 'detected_ports', 'type': 'list', 'limits': [],
+                  'tip': 'Serial ports found on this computer, select one to use it as Com port'},
+                 {'title': 'Refresh ports:', 'name': 'refresh_ports', 'type': 'bool_push', 'value': False},
+                 {'title': 'Backend:', 'name': 'backend', 'type': 'list', 'limits': ACTUATOR_BACKENDS,
+                  'value': ACTUATOR_BACKENDS[0],
+                  'tip': 'telemetrix: threaded board shared with the other plugins, telemetrix_aio: board driven from '
+                         'an asyncio event loop (used at initialization)'},
                  #{'title': 'Laser wavelength:', 'name': 'wavelength', 'type': 'float', 'limits': ports, 'value': port,
                   #'tip': 'The wavelength of the laser'},
-                 {'title': 'Acceleration:', 'name': 'accel', 'type': 'int', 'value': 200,
+                 {'title': 'Acceleration:', 'name': 'accel', 'type': 'int', 'value': 200, 'min': 1, 'max': 1000,
                   'tip': 'Set the stepper motor acceleration'},
-                 {'title': 'Max speed:', 'name': 'maxspeed', 'type': 'int', 'value': 1000,
+                 {'title': 'Max speed:', 'name': 'maxspeed', 'type': 'int', 'value': 1000, 'min': 1, 'max': 1000,
                   'tip': 'Set the stepper motor max speed'},
+                 {'title': 'Motion planner:', 'name': 'motion_planner', 'type': 'group', 'expanded': False, 'children': [
+                     {'title': 'Enabled:', 'name': 'planner_on', 'type': 'bool', 'value': False,
+                      'tip': 'Choose the max speed and acceleration of each move from its distance, within the '
+                             'Max speed and Acceleration limits'},
+                     {'title': 'Stall speed (steps/s):', 'name': 'stall_speed', 'type': 'float', 'value': 0., 'min': 0.,
+                      'tip': 'Speed at which the motor torque vanishes (linear torque-speed model), 0 for a constant '
+                             'torque'},
+                 ]},
+                 {'title': 'Position reports (Hz):', 'name': 'position_rate', 'type': 'float', 'value': 0., 'min': 0.,
+                  'tip': 'Rate at which the board is asked for the position, 0 to only update it after motions. '
+                         'check_position returns the last reported value'},
+                 {'title': 'Stepper pins:', 'name': 'pins', 'type': 'group', 'children': [
+                     {'title': 'Interface:', 'name': 'interface', 'type': 'list', 'value': 2, 'limits': [1, 2, 3, 4, 6, 8],
+                      'tip': 'AccelStepper interface (1: driver step/dir, 2: 2 wires, 4: 4 wires...)'},
+                     {'title': 'Pin 1:', 'name': 'pin1', 'type': 'int', 'value': 3},
+                     {'title': 'Pin 2:', 'name': 'pin2', 'type': 'int', 'value': 4},
+                     {'title': 'Pin 3:', 'name': 'pin3', 'type': 'int', 'value': 0},
+                     {'title': 'Pin 4:', 'name': 'pin4', 'type': 'int', 'value': 0},
+                 ]},
+                 {'title': 'Trajectory:', 'name': 'trajectory', 'type': 'group', 'expanded': False, 'children': [
+                     {'title': 'Waypoints:', 'name': 'waypoints_mode', 'type': 'list', 'value': 'Start/Stop/Step',
+                      'limits': ['Start/Stop/Step', 'List']},
+                     {'title': 'Start:', 'name': 'start', 'type': 'float', 'value': 0.},
+                     {'title': 'Stop:', 'name': 'stop', 'type': 'float', 'value': 1000.},
+                     {'title': 'Step:', 'name': 'step', 'type': 'float', 'value': 100.},
+                     {'title': 'Positions:', 'name': 'positions', 'type': 'str', 'value': '',
+                      'tip': 'Comma separated list of waypoints'},
+                     {'title': 'Constant speed:', 'name': 'constant_speed', 'type': 'bool', 'value': False,
+                      'tip': 'Run at a constant speed between the waypoints instead of accelerating and decelerating '
+                             'at each of them'},
+                     {'title': 'Speed (steps/s):', 'name': 'speed', 'type': 'int', 'value': 500, 'min': 1, 'max': 1000,
+                      'tip': 'Constant speed between the waypoints'},
+                     {'title': 'Run:', 'name': 'run_trajectory', 'type': 'bool_push', 'value': False,
+                      'tip': 'Run through the waypoints, the time at which each one is reached is recorded'},
+                 ]},
                  {'title': 'MultiAxes:', 'name': 'multiaxes', 'type': 'group', 'visible': is_multiaxes, 'children': [
                      {'title': 'is Multiaxes:', 'name': 'ismultiaxes', 'type': 'bool', 'value': is_multiaxes,
                       'default': False},
@@ -45,7 +93,7 @@ class DAQ_Move_Arduino(DAQ_Move_base):
                       'limits': ['Master', 'Slave']},
                      {'title': 'Axis:', 'name': 'axis', 'type': 'list', 'limits': stage_names},
 
-                 ]}] + comon_parameters
+                 ]}] + instrumentation.params + comon_parameters
 
     def __init__(self, parent=None, params_state=None):
         """
@@ -61,8 +109,12 @@ class DAQ_Move_Arduino(DAQ_Move_base):
         """
 
         super().__init__(parent, params_state)
+        self.settings.child('detected_ports').setLimits(get_ports())
+        self.trajectory = None  # last run trajectory, see run_trajectory
+        self._move_id = 0  # incremented by each move or trajectory, the done callbacks of the superseded ones are ignored
 
 
+    @instrumented('DAQ_Move_Arduino.check_position')
     def check_position(self):
         """Get the current position from the hardware with scaling conversion.
 
@@ -71,7 +123,7 @@ class DAQ_Move_Arduino(DAQ_Move_base):
         float: The position obtained after scaling conversion.
         """
         ## TODO for your custom plugin
-        pos = self.controller.get_value()
+        pos = self.controller.get_value(axis=self.axis_name)
 
         ##
 
@@ -85,7 +137,10 @@ class DAQ_Move_Arduino(DAQ_Move_base):
         Terminate the communication protocol
         """
         ## TODO for your custom plugin
-        self.controller.close_communication()        ##
+        self.controller.remove_position_listener(self._position_changed, axis=self.axis_name)
+        self.controller.unsubscribe(axis=self.axis_name)
+        if self.settings.child('multiaxes', 'multi_status').value() == "Master":
+            self.controller.close_communication()        ##
 
     def commit_settings(self, param):
         """
@@ -96,14 +151,23 @@ class DAQ_Move_Arduino(DAQ_Move_base):
         """
 
         ## TODO for your custom plugin
-        if param.name() == self.settings.child(('accel')):
-           self.controller.accel_set(self.settings.child(('accel')).value())
-        elif param.name() == self.settings.child(('maxspeed')):
-           self.controller.max_speed_set(self.settings.child(('maxspeed')).value())
+        if param.name() == 'refresh_ports':
+            self.settings.child('detected_ports').setLimits(get_ports(refresh=True))
+        elif param.name() == 'detected_ports':
+            self.settings.child('comport').setValue(param.value())
+        elif param.name() in ('accel', 'maxspeed') \
+                or (param.parent() is not None and param.parent().name() == 'motion_planner'):
+            self.update_motion_profile()
         #elif param.name() == self.settings.child(('wavelength')):
         #    self.controller.max_speed_set(self.settings.child(('wavelength')).value())
         elif param.name() == 'epsilon':
             self.controller.epsilon = param.value()
+        elif param.name() == 'position_rate':
+            self.update_position_reports()
+        elif param.name() == 'run_trajectory':
+            self.run_trajectory()
+        elif param.parent() is not None and param.parent().name() == 'instrumentation':
+            instrumentation.commit_param(param, param.parent())
 
     def ini_stage(self, controller=None):
         """Actuator communication initialization
@@ -120,14 +184,22 @@ class DAQ_Move_Arduino(DAQ_Move_base):
             *initialized: (bool): False if initialization failed otherwise True
         """
 
-        self.ini_stage_init(old_controller=controller, new_controller=ActuatorWrapper())
-        self.controller.open_communication(self.settings.child(('comport')).value())
+        self.ini_stage_init(old_controller=controller,
+                            new_controller=actuator_class(self.settings.child('backend').value())())
+        if self.settings.child('multiaxes', 'multi_status').value() == "Master":
+            # the board is shared (reference counted) with any other plugin using the same port
+            self.controller.open_communication(self.settings.child(('comport')).value(), axes={})
+        # each plugin (Master or Slave) declares its own stepper on the shared board
+        self.axis_name = self.settings.child('multiaxes', 'axis').value()
+        pins = self.settings.child('pins')
+        self.controller.add_axis(self.axis_name, **{child.name(): child.value() for child in pins.children()})
         #is_init = self.controller.open_communication(self.settings.child(('comport')).value())
         #while not is_init:
         #    QThread.msleep(1000)
         #    QtWidgets.QApplication.processEvents()
-        self.controller.accel_set(self.settings.child(('accel')).value())
-        self.controller.max_speed_set(self.settings.child(('maxspeed')).value())
+        self.update_motion_profile()
+        self.controller.add_position_listener(self._position_changed, axis=self.axis_name)
+        self.update_position_reports()
 
 
         info = "Connected"
@@ -137,26 +209,21 @@ class DAQ_Move_Arduino(DAQ_Move_base):
     def move_Abs(self, position):
         """ Move the actuator to the absolute target defined by position
 
+        The motion is dispatched to the board and the method returns right away, move_done is emitted from the
+        completion callback of the wrapper
+
         Parameters
         ----------
         position: (flaot) value of the absolute target positioning
         """
 
         position = self.check_bound(position)  #if user checked bounds, the defined bounds are applied here
-
-
-        self.controller.move_at(position)
-        self.emit_status(ThreadCommand('Update_Status',['Move done']))
-        ##############################
-
-
-
         self.target_position = position
-        self.current_position = position
-        #self.poll_moving()  #start a loop to poll the current actuator value and compare it with target position
-        #if abs(self.target_position - self.current_position)>self.controller.epsilon:
-         #   self.controller.move_at(position)
-        #self.move_done(position)
+
+        self._move_id += 1  # before move_at, that cancels the superseded move
+        future = self.controller.move_at(position, wait=False, axis=self.axis_name)
+        future.add_done_callback(functools.partial(self._move_completed, move_id=self._move_id))
+        self.emit_status(ThreadCommand('Update_Status',[f'Moving to {position}']))
 
     def move_Rel(self, position):
         """ Move the actuator to the relative target actuator value defined by position
@@ -165,16 +232,95 @@ class DAQ_Move_Arduino(DAQ_Move_base):
         ----------
         position: (flaot) value of the relative target positioning
         """
+        if round(position) == 0:  # less than a step (ex: PID output in its deadband), nothing to send to the board
+            self.move_done(self.current_position)
+            return
         position = self.check_bound(self.current_position+position)
-
-        self.controller.move_at(position)
-        self.emit_status(ThreadCommand('Update_Status',['Some info you want to log']))
-
-        self.target_position = position
+        self.move_Abs(position)
+
+    def update_motion_profile(self):
+        """Send the max speed and acceleration to the board, or use them as limits of the motion planner"""
+        max_speed = self.settings.child('maxspeed').value()
+        accel = self.settings.child('accel').value()
+        planner = self.settings.child('motion_planner')
+        if planner.child('planner_on').value():
+            self.controller.set_planner(MotionPlanner(max_speed, accel, planner.child('stall_speed').value() or None),
+                                        axis=self.axis_name)
+        else:
+            self.controller.set_planner(None, axis=self.axis_name)
+            self.controller.accel_set(accel, axis=self.axis_name)
+            self.controller.max_speed_set(max_speed, axis=self.axis_name)
+
+    def update_position_reports(self):
+        rate = self.settings.child('position_rate').value()
+        if rate > 0:
+            self.controller.subscribe(rate, axis=self.axis_name)
+        else:
+            self.controller.unsubscribe(axis=self.axis_name)
+
+    def get_waypoints(self):
+        """Waypoints of the trajectory settings, either a start/stop/step grid or a comma separated list"""
+        settings = self.settings.child('trajectory')
+        if settings.child('waypoints_mode').value() == 'List':
+            text = settings.child('positions').value()
+            return [float(value) for value in text.replace(';', ',').split(',') if value.strip()]
+        return list(waypoints(settings.child('start').value(), settings.child('stop').value(),
+                              settings.child('step').value()))
+
+    def run_trajectory(self):
+        """
+        Queue the waypoints of the trajectory settings to the stepper. check_position is emitted as each waypoint is
+        reached, its (perf_counter) timestamp being kept in self.trajectory.timestamps to be matched afterwards with
+        the ruler samples, and move_done once the last one is reached
+        """
+        positions = [self.check_bound(position) for position in self.get_waypoints()]
+        settings = self.settings.child('trajectory')
+        speed = settings.child('speed').value() if settings.child('constant_speed').value() else None
+        self.target_position = positions[-1] if positions else self.current_position
+        self._move_id += 1
+        self.trajectory = self.controller.run_trajectory(positions, speed=speed,
+                                                         callback=self._waypoint_reached, axis=self.axis_name)
+        self.trajectory.future.add_done_callback(functools.partial(self._trajectory_completed,
+                                                                   move_id=self._move_id))
+        self.emit_status(ThreadCommand('Update_Status', [f'Running a trajectory of {len(positions)} waypoints']))
+
+    def _waypoint_reached(self, index, value, timestamp):
+        pos = self.get_position_with_scaling(value)
+        self.current_position = pos
+        self.emit_status(ThreadCommand('check_position', [pos]))
+
+    def _trajectory_completed(self, future, move_id):
+        if move_id != self._move_id:  # superseded by a new move, that emits its own move_done
+            return
+        if future.cancelled():  # stopped, the interrupted move has no other done callback
+            self.emit_status(ThreadCommand('Update_Status', [f'Trajectory stopped after {self.trajectory.index} '
+                                                             f'waypoints']))
+            self.move_done()
+            return
+        self.emit_status(ThreadCommand('Update_Status', [f'Trajectory of {len(self.trajectory.positions)} waypoints '
+                                                         f'done in {self.trajectory.elapsed:.3f} s']))
+        self.move_done(self.current_position)
+
+    def _move_completed(self, future, move_id):
+        """Done callback of the move future, called from the telemetrix thread (or from stop_motion)"""
+        if move_id != self._move_id:  # superseded by a new move, that emits its own move_done
+            return
+        if future.cancelled():  # interrupted, current_position is updated by the position listener
+            self.move_done()
+            return
+        position = self.get_position_with_scaling(future.result())
+        self.current_position = position
+        predicted, actual = self.controller.move_timing(axis=self.axis_name)
+        if predicted is not None and actual is not None:
+            self.emit_status(ThreadCommand('Update_Status',
+                                           [f'Move done in {actual:.3f} s (predicted {predicted:.3f} s)']))
         self.move_done(position)
-        ##############################
 
-        #self.poll_moving()
+    def _position_changed(self, value):
+        """Position listener of the wrapper, forward the values reported by the board to the UI"""
+        pos = self.get_position_with_scaling(value)
+        self.current_position = pos
+        self.emit_status(ThreadCommand('check_position', [pos]))
 
     def move_Home(self):
         """
@@ -192,7 +338,7 @@ class DAQ_Move_Arduino(DAQ_Move_base):
 
     def stop_motion(self):
       """
-        Call the specific move_done function (depending on the hardware).
+        Stop the motor, move_done is then emitted by the done callback of the interrupted move (if any).
 
         See Also
         --------
@@ -200,9 +346,10 @@ class DAQ_Move_Arduino(DAQ_Move_base):
       """
 
       ## TODO for your custom plugin
-     # self.
-      self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
-      self.move_done() #to let the interface know the actuator stopped
+      interrupted = self.controller.stop(axis=self.axis_name)
+      self.emit_status(ThreadCommand('Update_Status', ['Motion stopped']))
+      if not interrupted:
+          self.move_done() #to let the interface know the actuator stopped
       ##############################
 
 
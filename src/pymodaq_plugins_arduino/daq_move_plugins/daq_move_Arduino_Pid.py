@@ -3,12 +3,19 @@ from pymodaq.daq_move.utility_classes import comon_parameters  # common set of p
 from pymodaq.daq_utils.daq_utils import ThreadCommand, getLineInfo  # object used to send info back to the main thread
 from easydict import EasyDict as edict  # type of dict
 from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
-from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
-import simple_pid as PID
+from pymodaq_plugins_arduino.hardware.backends import create_encoder, is_simulated
+from pymodaq_plugins_arduino.hardware.closed_loop import ClosedLoopPositioner, TwoPhasePositioner
+from pymodaq_plugins_arduino.hardware.fly_scan import FlyScan
+from pymodaq_plugins_arduino.hardware.calibration import StepCalibration
+import os
+import numpy as np
+import threading
 
 
-from serial.tools import list_ports
-ports = [str(port.name) for port in list_ports.comports()]
+from pymodaq_plugins_arduino.hardware.serial_ports import get_ports
+from pymodaq_plugins_arduino.hardware import instrumentation
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
+
 port = 'COM5' #if 'cu.usbmodem401301' in ports else ports[0] if len(ports)>0 else ''
 class DAQ_Move_Arduino_Pid(DAQ_Move_base):
     """
@@ -30,14 +37,68 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
     params = [   ## TODO for your custom plugin
                  # elements to be added here as dicts in order to control your custom stage
                  ############
-                 {'title': 'Com port:', 'name': 'comport', 'type': 'str', 'limits':ports, 'value': port,
+                 {'title': 'Com port:', 'name': 'comport', 'type': 'str', 'value': port,
                   'tip': 'The serial COM port'},
+                 {'title': 'Detected ports:', 'name': 'detected_ports', 'type': 'list', 'limits': [],
+                  'tip': 'Serial ports found on this computer, select one to use it as Com port'},
+                 {'title': 'Refresh ports:', 'name': 'refresh_ports', 'type': 'bool_push', 'value': False},
                  #{'title': 'Laser wavelength:', 'name': 'wavelength', 'type': 'float', 'limits': ports, 'value': port,
                   #'tip': 'The wavelength of the laser'},
-                 {'title': 'Acceleration:', 'name': 'accel', 'type': 'int', 'value': 200,
+                 {'title': 'Acceleration:', 'name': 'accel', 'type': 'int', 'value': 200, 'min': 1, 'max': 1000,
                   'tip': 'Set the stepper motor acceleration'},
-                 {'title': 'Max speed:', 'name': 'maxspeed', 'type': 'int', 'value': 1000,
+                 {'title': 'Max speed:', 'name': 'maxspeed', 'type': 'int', 'value': 1000, 'min': 1, 'max': 1000,
                   'tip': 'Set the stepper motor max speed'},
+                 {'title': 'Ruler axis:', 'name': 'ruler_axis', 'type': 'int', 'value': 1,
+                  'tip': 'IK220 axis used as position feedback'},
+                 {'title': 'Closed loop:', 'name': 'closed_loop', 'type': 'group', 'children': [
+                     {'title': 'Kp:', 'name': 'kp', 'type': 'float', 'value': 20.},
+                     {'title': 'Ki:', 'name': 'ki', 'type': 'float', 'value': 0.},
+                     {'title': 'Kd:', 'name': 'kd', 'type': 'float', 'value': 0.},
+                     {'title': 'Steps per output unit:', 'name': 'output_scale', 'type': 'float', 'value': 100.,
+                      'tip': 'Number of steps sent to the stepper per unit of PID output'},
+                     {'title': 'Max steps per correction:', 'name': 'max_step', 'type': 'int', 'value': 20000},
+                     {'title': 'Loop rate (Hz):', 'name': 'loop_rate', 'type': 'float', 'value': 100., 'min': 1.},
+                     {'title': 'Max iterations:', 'name': 'max_iterations', 'type': 'int', 'value': 1000, 'min': 1},
+                     {'title': 'Time budget (s):', 'name': 'time_budget', 'type': 'float', 'value': 10., 'min': 0.},
+                 ]},
+                 {'title': 'Two phase moves:', 'name': 'two_phase', 'type': 'group', 'expanded': False, 'children': [
+                     {'title': 'Enabled:', 'name': 'two_phase_on', 'type': 'bool', 'value': False,
+                      'tip': 'Fast open loop slew (Max speed / Acceleration) then slow closed loop approach'},
+                     {'title': 'Slew threshold:', 'name': 'coarse_threshold', 'type': 'float', 'value': 1., 'min': 0.,
+                      'tip': 'Errors (ruler units) above which the fast slew is done'},
+                     {'title': 'Approach offset:', 'name': 'approach_offset', 'type': 'float', 'value': 0.1,
+                      'min': 0., 'tip': 'Distance (ruler units) from the target at which the slew stops'},
+                     {'title': 'Approach from:', 'name': 'approach_side', 'type': 'list', 'value': 'below',
+                      'limits': ['below', 'above']},
+                     {'title': 'Steps per ruler unit:', 'name': 'steps_per_unit', 'type': 'float', 'value': 500.,
+                      'tip': 'Used for the slew when the step calibration cannot predict it'},
+                     {'title': 'Fine max speed:', 'name': 'fine_speed', 'type': 'int', 'value': 200, 'min': 1,
+                      'max': 1000},
+                     {'title': 'Fine acceleration:', 'name': 'fine_accel', 'type': 'int', 'value': 100, 'min': 1,
+                      'max': 1000},
+                 ]},
+                 {'title': 'Step calibration:', 'name': 'calibration', 'type': 'group', 'expanded': False, 'children': [
+                     {'title': 'Feed forward:', 'name': 'feed_forward', 'type': 'bool', 'value': True,
+                      'tip': 'Start each move with the step count predicted by the calibration'},
+                     {'title': 'File:', 'name': 'path', 'type': 'str', 'value': '',
+                      'tip': 'json file loaded at initialization and saved when closing (if not empty)'},
+                     {'title': 'Load:', 'name': 'load', 'type': 'bool_push', 'value': False},
+                     {'title': 'Save:', 'name': 'save', 'type': 'bool_push', 'value': False},
+                     {'title': 'Clear:', 'name': 'clear', 'type': 'bool_push', 'value': False},
+                     {'title': 'Points:', 'name': 'n_points', 'type': 'int', 'value': 0, 'readonly': True},
+                     {'title': 'Backlash (steps):', 'name': 'backlash', 'type': 'float', 'value': 0.,
+                      'readonly': True},
+                 ]},
+                 {'title': 'Fly scan:', 'name': 'fly_scan', 'type': 'group', 'expanded': False, 'children': [
+                     {'title': 'Start (steps):', 'name': 'start', 'type': 'float', 'value': 0.},
+                     {'title': 'Stop (steps):', 'name': 'stop', 'type': 'float', 'value': 10000.},
+                     {'title': 'Speed (steps/s):', 'name': 'speed', 'type': 'int', 'value': 500, 'min': 1, 'max': 1000},
+                     {'title': 'Sample rate (Hz):', 'name': 'sample_rate', 'type': 'float', 'value': 1000., 'min': 1.},
+                     {'title': 'Save to (.npz):', 'name': 'save_path', 'type': 'str', 'value': '',
+                      'tip': 'If not empty, the timestamps, ruler positions and commanded steps are saved there'},
+                     {'title': 'Run:', 'name': 'run_fly_scan', 'type': 'bool_push', 'value': False,
+                      'tip': 'Sweep from start to stop at constant speed while sampling the ruler'},
+                 ]},
                  {'title': 'MultiAxes:', 'name': 'multiaxes', 'type': 'group', 'visible': is_multiaxes, 'children': [
                      {'title': 'is Multiaxes:', 'name': 'ismultiaxes', 'type': 'bool', 'value': is_multiaxes,
                       'default': False},
@@ -45,7 +106,7 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
                       'limits': ['Master', 'Slave']},
                      {'title': 'Axis:', 'name': 'axis', 'type': 'list', 'limits': stage_names},
 
-                 ]}] + comon_parameters
+                 ]}] + instrumentation.params + comon_parameters
 
     def __init__(self, parent=None, params_state=None):
         """
@@ -61,8 +122,10 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         """
 
         super().__init__(parent, params_state)
+        self.settings.child('detected_ports').setLimits(get_ports())
 
 
+    @instrumented('DAQ_Move_Arduino_Pid.check_position')
     def check_position(self):
         """Get the current position from the hardware with scaling conversion.
 
@@ -71,7 +134,7 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         float: The position obtained after scaling conversion.
         """
         ## TODO for your custom plugin
-        pos = self.ruler.get_axis_position(1)
+        pos = self.read_ruler()
         ##
 
         pos = self.get_position_with_scaling(pos)
@@ -84,7 +147,13 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         Terminate the communication protocol
         """
         ## TODO for your custom plugin
-        self.controller.close_communication()        ##
+        self._run_id += 1
+        self._stop_loop_thread()  # before releasing the board it drives
+        path = self.settings.child('calibration', 'path').value()
+        if path and len(self.calibration):
+            self.calibration.save(path)
+        if self.settings.child('multiaxes', 'multi_status').value() == "Master":
+            self.controller.close_communication()        ##
 
     def commit_settings(self, param):
         """
@@ -95,14 +164,73 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         """
 
         ## TODO for your custom plugin
-        if param.name() == self.settings.child(('accel')):
-           self.controller.accel_set(self.settings.child(('accel')).value())
-        elif param.name() == self.settings.child(('maxspeed')):
-           self.controller.max_speed_set(self.settings.child(('maxspeed')).value())
+        if param.name() == 'refresh_ports':
+            self.settings.child('detected_ports').setLimits(get_ports(refresh=True))
+        elif param.name() == 'detected_ports':
+            self.settings.child('comport').setValue(param.value())
+        elif param.name() == 'accel':
+            self.controller.accel_set(param.value())
+            self.update_positioner()
+        elif param.name() == 'maxspeed':
+            self.controller.max_speed_set(param.value())
+            self.update_positioner()
         #elif param.name() == self.settings.child(('wavelength')):
         #    self.controller.max_speed_set(self.settings.child(('wavelength')).value())
         elif param.name() == 'epsilon':
             self.controller.epsilon = param.value()
+            self.positioner.tolerance = param.value()
+        elif param.name() == 'ruler_axis':
+            self._ruler_axis = param.value()
+        elif param.parent() is not None and param.parent().name() in ('closed_loop', 'two_phase'):
+            self.update_positioner()
+        elif param.parent() is not None and param.parent().name() == 'calibration':
+            self.commit_calibration(param)
+        elif param.name() == 'run_fly_scan':
+            self.run_fly_scan()
+        elif param.parent() is not None and param.parent().name() == 'instrumentation':
+            instrumentation.commit_param(param, param.parent())
+
+    def read_ruler(self):
+        return self.ruler.get_axis_position(self._ruler_axis)
+
+    def update_positioner(self):
+        """Push the closed loop settings to the positioner"""
+        loop = self.settings.child('closed_loop')
+        self.positioner.kp = loop.child('kp').value()
+        self.positioner.ki = loop.child('ki').value()
+        self.positioner.kd = loop.child('kd').value()
+        self.positioner.output_scale = loop.child('output_scale').value()
+        self.positioner.max_step = loop.child('max_step').value()
+        self.positioner.loop_rate = loop.child('loop_rate').value()
+        self.positioner.max_iterations = loop.child('max_iterations').value()
+        self.positioner.timeout = loop.child('time_budget').value()
+        self.positioner.tolerance = self.settings.child('epsilon').value()
+
+        two_phase = self.settings.child('two_phase')
+        self.two_phase.coarse_threshold = two_phase.child('coarse_threshold').value()
+        self.two_phase.approach_offset = two_phase.child('approach_offset').value()
+        self.two_phase.approach_side = 1 if two_phase.child('approach_side').value() == 'below' else -1
+        self.two_phase.steps_per_unit = two_phase.child('steps_per_unit').value()
+        self.two_phase.fast_profile = (self.settings.child('maxspeed').value(), self.settings.child('accel').value())
+        self.two_phase.fine_profile = (two_phase.child('fine_speed').value(), two_phase.child('fine_accel').value())
+        self.mover = self.two_phase if two_phase.child('two_phase_on').value() else self.positioner
+
+    def commit_calibration(self, param):
+        path = self.settings.child('calibration', 'path').value()
+        if param.name() == 'feed_forward':
+            self.positioner.feed_forward = param.value()
+        elif param.name() == 'load' and path:
+            self.calibration = StepCalibration.load(path)
+            self.positioner.calibration = self.calibration
+        elif param.name() == 'save' and path:
+            self.calibration.save(path)
+        elif param.name() == 'clear':
+            self.calibration.clear()
+        self.update_calibration_status()
+
+    def update_calibration_status(self):
+        self.settings.child('calibration', 'n_points').setValue(len(self.calibration))
+        self.settings.child('calibration', 'backlash').setValue(self.calibration.backlash)
 
     def ini_stage(self, controller=None):
         """Actuator communication initialization
@@ -120,8 +248,10 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         """
 
         self.ini_stage_init(old_controller=controller, new_controller=ActuatorWrapper())
-        self.controller.open_communication(self.settings.child(('comport')).value())
-        self.ruler=IK220()
+        if self.settings.child('multiaxes', 'multi_status').value() == "Master":
+            # the board is shared (reference counted) with any other plugin using the same port
+            self.controller.open_communication(self.settings.child(('comport')).value())
+        self.ruler = create_encoder(simulated=is_simulated(self.settings.child(('comport')).value()))
         #is_init = self.controller.open_communication(self.settings.child(('comport')).value())
         #while not is_init:
         #    QThread.msleep(1000)
@@ -129,6 +259,20 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         self.controller.accel_set(self.settings.child(('accel')).value())
         self.controller.max_speed_set(self.settings.child(('maxspeed')).value())
 
+        self._ruler_axis = self.settings.child('ruler_axis').value()
+        self.calibration = StepCalibration()
+        path = self.settings.child('calibration', 'path').value()
+        if path and os.path.isfile(path):
+            self.calibration = StepCalibration.load(path)
+        self.positioner = ClosedLoopPositioner(self.controller, self.read_ruler, calibration=self.calibration)
+        self.positioner.feed_forward = self.settings.child('calibration', 'feed_forward').value()
+        self.two_phase = TwoPhasePositioner(self.positioner)
+        self.update_calibration_status()
+        self.update_positioner()
+        self._loop_thread = None
+        self._run_id = 0  # incremented by each closed loop or fly scan run, the superseded runs do not emit move_done
+        self.fly_scan = FlyScan(self.controller, self.ruler)
+        self.fly_scan_result = None  # last FlyScanResult
 
         info = "Connected"
         initialized =True   # todo
@@ -137,31 +281,85 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
     def move_Abs(self, position):
         """ Move the actuator to the absolute target defined by position
 
+        A bounded closed loop (PID on the ruler reading) is run in a background thread, move_done is emitted once
+        it converged, was stopped or exhausted its iteration/time budget
+
         Parameters
         ----------
         position: (flaot) value of the absolute target positioning
         """
         position = self.check_bound(position)#if user checked bounds, the defined bounds are applied here
-        pid=PID(20,0,0,setpoint=position)
-
-        self.current_position=self.ruler.get_axis_position(1)
-        while True:
-            control = pid(self.current_position)
-            steps = round(control*100)
-            self.controller.move_at(steps)
-            self.current_position = self.ruler.get_axis_position(1)
-            print(self.current_position)
-        self.emit_status(ThreadCommand('Update_Status',['Move done']))
-        ##############################
-
-
-
         self.target_position = position
-        self.current_position = position
-        #self.poll_moving()  #start a loop to poll the current actuator value and compare it with target position
-        #if abs(self.target_position - self.current_position)>self.controller.epsilon:
-         #   self.controller.move_at(position)
-        #self.move_done(position)
+
+        self._start_loop_thread(self._run_closed_loop, position)
+
+    def _start_loop_thread(self, target, *args):
+        """Run target(*args, run_id) in the background thread, replacing the closed loop or fly scan running there"""
+        self._run_id += 1  # before the abort, so that the superseded run does not emit move_done
+        self._stop_loop_thread()
+        # cleared here rather than in the thread, so that a stop_motion sent before the thread starts is not lost
+        self.mover.reset()
+        self.fly_scan.reset()
+        self._loop_thread = threading.Thread(target=target, args=args + (self._run_id,), daemon=True)
+        self._loop_thread.start()
+
+    def _stop_loop_thread(self):
+        """Abort the closed loop or fly scan running in the background thread and wait for its end"""
+        if self._loop_thread is not None and self._loop_thread.is_alive():
+            self.mover.abort()
+            self.fly_scan.abort()
+            self._loop_thread.join()
+
+    def _run_closed_loop(self, position, run_id):
+        try:
+            result = self.mover.run(position, callback=self._position_changed)
+            if run_id != self._run_id:  # superseded by a new move (or closed), that emits its own move_done
+                return
+            if result.converged:
+                self.emit_status(ThreadCommand('Update_Status', [f'Move done in {result.iterations} iterations '
+                                                                 f'({result.elapsed:.3f} s)']))
+            else:
+                self.emit_status(ThreadCommand('Update_Status',
+                                               [f'Closed loop stopped at {result.position} after {result.iterations} '
+                                                f'iterations ({result.elapsed:.3f} s) without reaching {position}']))
+            self.current_position = self.get_position_with_scaling(result.position)
+            self.update_calibration_status()
+        except Exception as e:  # the exceptions of the thread would otherwise be lost, and move_done never emitted
+            self.emit_status(ThreadCommand('Update_Status', [f'Closed loop to {position} failed: {e}', 'log']))
+        if run_id == self._run_id:
+            self.move_done(self.current_position)
+
+    def run_fly_scan(self):
+        """Run the fly scan of the settings in the background thread of the closed loop"""
+        self._start_loop_thread(self._run_fly_scan)
+
+    def _run_fly_scan(self, run_id):
+        try:
+            settings = self.settings.child('fly_scan')
+            self.fly_scan.ruler_axis = self._ruler_axis
+            self.fly_scan.rate = settings.child('sample_rate').value()
+            self.emit_status(ThreadCommand('Update_Status', ['Fly scan started']))
+            result = self.fly_scan.run(settings.child('start').value(), settings.child('stop').value(),
+                                       int(settings.child('speed').value()),
+                                       max_speed=self.settings.child('maxspeed').value())
+            self.fly_scan_result = result
+            self.emit_status(ThreadCommand('Update_Status',
+                                           [f'Fly scan {"done" if result.completed else "stopped"}: '
+                                            f'{len(result.timestamps)} samples in {result.duration:.3f} s']))
+            path = settings.child('save_path').value()
+            if path:
+                np.savez(path, timestamps=result.timestamps, positions=result.positions, steps=result.steps)
+            if len(result.positions):
+                self.current_position = self.get_position_with_scaling(result.positions[-1])
+        except Exception as e:  # see _run_closed_loop
+            self.emit_status(ThreadCommand('Update_Status', [f'Fly scan failed: {e}', 'log']))
+        if run_id == self._run_id:  # not superseded by a new move
+            self.move_done(self.current_position)
+
+    def _position_changed(self, value):
+        """Called at each closed loop iteration with the ruler reading"""
+        pos = self.get_position_with_scaling(value)
+        self.emit_status(ThreadCommand('check_position', [pos]))
 
     def move_Rel(self, position):
         """ Move the actuator to the relative target actuator value defined by position
@@ -171,15 +369,7 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
         position: (flaot) value of the relative target positioning
         """
         position = self.check_bound(self.current_position+position)
-
-        self.controller.move_at(position)
-        self.emit_status(ThreadCommand('Update_Status',['Some info you want to log']))
-
-        self.target_position = position
-        self.move_done(position)
-        ##############################
-
-        #self.poll_moving()
+        self.move_Abs(position)
 
     def move_Home(self):
         """
@@ -197,7 +387,7 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
 
     def stop_motion(self):
       """
-        Call the specific move_done function (depending on the hardware).
+        Abort the closed loop (move_done is then emitted by the loop thread) and stop the motor.
 
         See Also
         --------
@@ -205,9 +395,10 @@ class DAQ_Move_Arduino_Pid(DAQ_Move_base):
       """
 
       ## TODO for your custom plugin
-     # self.
-      self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
-      self.move_done() #to let the interface know the actuator stopped
+      self.positioner.abort()
+      self.fly_scan.abort()
+      self.controller.stop()
+      self.emit_status(ThreadCommand('Update_Status', ['Motion stopped']))
+      if self._loop_thread is None or not self._loop_thread.is_alive():
+          self.move_done() #to let the interface know the actuator stopped
       ##############################
-
-
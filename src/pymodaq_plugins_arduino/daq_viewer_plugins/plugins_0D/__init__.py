@@ -3,11 +3,15 @@ from pathlib import Path
 from pymodaq.daq_utils import daq_utils as utils
 logger = utils.set_logger('viewer0D_plugins', add_to_console=False)
 
-for path in Path(__file__).parent.iterdir():
+# the plugin modules are imported on first access (as done by PyMoDAQ when listing the plugins), not with the package
+_plugins = [path.stem for path in Path(__file__).parent.iterdir() if path.suffix == '.py' and path.stem != '__init__']
+
+
+def __getattr__(name):
+    if name not in _plugins:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
     try:
-        if '__init__' not in str(path):
-            importlib.import_module('.' + path.stem, __package__)
+        return importlib.import_module('.' + name, __package__)
     except Exception as e:
-        logger.warning("{:} plugin couldn't be loaded due to some missing packages or errors: {:}".format(path.stem, str(e)))
-        pass
-
+        logger.warning("{:} plugin couldn't be loaded due to some missing packages or errors: {:}".format(name, str(e)))
+        raise
@@ -1,9 +1,13 @@
 import numpy as np
+from time import perf_counter, sleep
 from pymodaq.daq_utils.daq_utils import ThreadCommand
-from pymodaq.daq_utils.daq_utils import DataFromPlugins
+from pymodaq.daq_utils.daq_utils import DataFromPlugins, Axis
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 from pymodaq.daq_utils.parameter import Parameter
-from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
+from pymodaq_plugins_arduino.hardware.ruler_wrapper import RulerCalibration
+from pymodaq_plugins_arduino.hardware.backends import create_encoder
+from pymodaq_plugins_arduino.hardware import instrumentation
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
 
 
 
@@ -11,11 +15,33 @@ from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
 class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
     """
     """
-    params = comon_parameters+[{'title': 'Axis:', 'name': 'axis', 'type': 'int', 'value': 1.00},
+    hardware_averaging = True  # Naverage samples are taken and averaged within a single grab_data call
+    params = comon_parameters+[{'title': 'Simulated:', 'name': 'simulated', 'type': 'bool', 'value': False,
+         'tip': 'Use a simulated ruler (following the simulated stepper board if opened) instead of the IK220 card'},
+        {'title': 'Axis:', 'name': 'axis', 'type': 'int', 'value': 1.00},
+        {'title': 'All axes:', 'name': 'all_axes', 'type': 'bool', 'value': False,
+         'tip': 'Read all the present rulers in one pass, one channel per axis'},
+        {'title': 'Emit std:', 'name': 'show_std', 'type': 'bool', 'value': False,
+         'tip': 'When averaging, append the standard deviation of each axis as extra channels'},
         {'title': 'Laser Wavelength (nm):', 'name': 'las_wave', 'type': 'float', 'value': 457.00},
-        {'title': 'correction:', 'name': 'correc', 'type': 'float', 'value': 5905.0}
+        {'title': 'correction:', 'name': 'correc', 'type': 'float', 'value': 5905.0},
+        {'title': 'Background sampling:', 'name': 'sampling', 'type': 'group', 'children': [
+            {'title': 'Enabled:', 'name': 'sampling_on', 'type': 'bool', 'value': False,
+             'tip': 'Sample the ruler in a background thread, grabs then read the latest sample'},
+            {'title': 'Rate (Hz):', 'name': 'sample_rate', 'type': 'float', 'value': 1000., 'min': 1.},
+            {'title': 'Buffer size:', 'name': 'buffer_size', 'type': 'int', 'value': 10000, 'min': 1},
+        ]},
+        {'title': 'Streaming:', 'name': 'streaming', 'type': 'group', 'children': [
+            {'title': 'Enabled:', 'name': 'streaming_on', 'type': 'bool', 'value': False,
+             'tip': 'Each grab emits all the samples acquired by the background sampler since the previous one, as a '
+                    'time trace plus their mean (background sampling is started if needed)'},
+            {'title': 'Samples per batch:', 'name': 'batch_size', 'type': 'int', 'value': 100, 'min': 1,
+             'tip': 'Minimum number of new samples before a batch is emitted'},
+            {'title': 'Max emission rate (Hz):', 'name': 'emit_rate', 'type': 'float', 'value': 10., 'min': 0.1,
+             'tip': 'Batches are not emitted more often than this rate'},
+        ]},
         ## TODO for your custom plugin: elements to be added here as dicts in order to control your custom stage
-        ]
+        ] + instrumentation.params
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -26,11 +52,57 @@ class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
             A given parameter (within detector_settings) whose value has been changed by the user
         """
         if param.name() == 'las_wave':
-            self.wavelength = 1e7 / param.value()
+            self.calibration.laser_wavelength = param.value()
         elif param.name() == 'correc':
-            self.correction = param.value()
-        elif param.name() == 'axis':
-            self.axis = param.value()
+            self.calibration.correction = param.value()
+        elif param.name() in ('axis', 'all_axes', 'show_std'):
+            self.update_grab_settings()
+        elif param.parent() is not None and param.parent().name() == 'sampling':
+            self.update_sampling()
+        elif param.parent() is not None and param.parent().name() == 'streaming':
+            self.update_streaming()
+        elif param.parent() is not None and param.parent().name() == 'instrumentation':
+            instrumentation.commit_param(param, param.parent())
+
+    def update_grab_settings(self):
+        """Cache the settings used by grab_data so that it never has to look into the parameter tree"""
+        self.all_axes = self.settings.child('all_axes').value()
+        self.show_std = self.settings.child('show_std').value()
+        self.axis = self.settings.child('axis').value()
+        if self.all_axes:
+            self.axes = list(self.controller.axis)
+            self.labels = [f'Axis {axis}' for axis in self.axes]
+        else:
+            self.axes = [self.axis]
+            self.labels = ['dat0']
+
+    def update_sampling(self):
+        """Start, restart or stop the background sampling of the ruler according to the settings"""
+        sampling = self.settings.child('sampling')
+        if sampling.child('sampling_on').value():
+            self.controller.start_sampling(rate=sampling.child('sample_rate').value(),
+                                           size=sampling.child('buffer_size').value())
+        elif not self.streaming:
+            self.controller.stop_sampling()
+        if self.streaming:  # the sampler (and its buffer) may have been replaced
+            self.update_streaming()
+
+    def update_streaming(self):
+        """Cache the streaming settings and make sure the background sampler runs if streaming is enabled"""
+        streaming = self.settings.child('streaming')
+        self.streaming = streaming.child('streaming_on').value()
+        self.batch_size = streaming.child('batch_size').value()
+        self.emit_period = 1 / streaming.child('emit_rate').value()
+        if self.streaming:
+            if self.controller.sampler is None:
+                sampling = self.settings.child('sampling')
+                self.controller.start_sampling(rate=sampling.child('sample_rate').value(),
+                                               size=sampling.child('buffer_size').value())
+            self._stream_start = self.controller.sampler.buffer.count
+            self._stream_t0 = perf_counter()
+            self._last_emit = 0.
+        else:
+            self.update_sampling()
 
     def ini_detector(self, controller=None):
         """Detector communication initialization
@@ -49,7 +121,14 @@ class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
         """
 
         #raise NotImplemented  # TODO when writing your own plugin remove this line and modify the one below
-        self.controller=IK220()
+        self.controller = create_encoder(simulated=self.settings.child('simulated').value())
+        self.calibration = RulerCalibration(self.settings.child('correc').value(),
+                                            self.settings.child('las_wave').value())
+        self.update_grab_settings()
+        self.streaming = False
+        self._stop_grab = False
+        self.update_sampling()
+        self.update_streaming()
         #self.ini_detector_init(old_controller=controller,new_controller=PythonWrapperOfYourInstrument())
 
         # TODO for your custom plugin (optional) initialize viewers panel with the future type of data
@@ -61,8 +140,10 @@ class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
 
     def close(self):
         """Terminate the communication protocol"""
+        self.controller.stop_sampling()
         #del self.controller # when writing your own plugin remove this line
 
+    @instrumented('DAQ_0DViewer_Arduino.grab_data')
     def grab_data(self, Naverage=1, **kwargs):
         """Start a grab from the detector
 
@@ -76,11 +157,56 @@ class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
         """
 
         # synchrone version (blocking function)
-
-        data_tot = (self.controller.get_axis_position(self.settings.child('axis').value())
-                    +self.settings.child('correc').value())-(1e7 /self.settings.child('las_wave').value())
-
-        self.data_grabed_signal.emit([DataFromPlugins(name='Ruler', data=[np.array([data_tot])], dim='Data0D',labels=['dat0', 'data1'])])
+        if self.streaming:
+            self.grab_stream()
+            return
+
+        axes = self.axes
+        std = None
+        if Naverage > 1:
+            samples = self.controller.sample_axes(axes, Naverage)
+            data_tot = self.calibration.convert(samples.mean(axis=0))
+            std = samples.std(axis=0)
+        elif self.all_axes:
+            data_tot = self.calibration.convert(self.controller.get_axes_positions(axes))
+        else:
+            data_tot = [self.calibration.convert(self.controller.get_axis_position(self.axis))]
+
+        labels = self.labels
+        data = [np.array([value]) for value in data_tot]
+        if self.show_std:
+            if std is None:
+                std = np.zeros(len(axes))
+            data.extend([np.array([value]) for value in std])
+            labels = labels + [f'{label} std' for label in labels]
+
+        self.data_grabed_signal.emit([DataFromPlugins(name='Ruler', data=data, dim='Data0D', labels=labels)])
+
+    def grab_stream(self):
+        """
+        Wait for at least batch_size new samples (and for the emission period) then emit all the samples acquired since
+        the previous batch: their mean as Data0D and the full rate trace as Data1D with a time axis
+        """
+        sampler = self.controller.sampler
+        buffer = sampler.buffer
+        self._stop_grab = False
+        while not self._stop_grab and sampler.running and \
+                (buffer.count - self._stream_start < self.batch_size
+                 or perf_counter() - self._last_emit < self.emit_period):
+            sleep(1 / sampler.rate)
+        timestamps, positions, _, _, self._stream_start = buffer.since(self._stream_start)
+        self._last_emit = perf_counter()
+        if len(timestamps) == 0:
+            return
+
+        columns = [sampler.index(axis) for axis in self.axes]
+        data_tot = self.calibration.convert(positions[:, columns])
+        self.data_grabed_signal.emit([
+            DataFromPlugins(name='Ruler', data=[np.array([value]) for value in data_tot.mean(axis=0)],
+                            dim='Data0D', labels=self.labels),
+            DataFromPlugins(name='Ruler_stream', data=[data_tot[:, ind] for ind in range(len(columns))],
+                            dim='Data1D', labels=self.labels,
+                            x_axis=Axis(data=timestamps - self._stream_t0, label='Time', units='s'))])
 
     def callback(self):
         """optional asynchrone method called when the detector has finished its acquisition of data"""
@@ -91,7 +217,7 @@ class DAQ_0DViewer_Arduino(DAQ_Viewer_base):
     def stop(self):
         """Stop the current grab hardware wise if necessary"""
         ## TODO for your custom plugin
-
+        self._stop_grab = True
         self.emit_status(ThreadCommand('Update_Status', ['Stop']))
         ##############################
         return ''
@@ -5,97 +5,522 @@ Demo Wrapper to illustrate the plugin developpement. This Mock wrapper will emul
 from time import perf_counter, sleep
 import time
 import math
+import logging
+import threading
+from concurrent.futures import Future, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
 
-from serial.tools import list_ports
-ports = [port.name for port in list_ports.comports()]
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import pool
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
+from pymodaq_plugins_arduino.hardware.trajectory import Trajectory, AxisView
+from pymodaq_plugins_arduino.hardware.motion_profile import trapezoid_duration
 
-from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
-from telemetrix import telemetrix
-class ActuatorWrapper:
-    units = 'wavenumber (cm-1)'
-    def __init__(self):
-        self._com_port = ''
+logger = logging.getLogger(__name__)
+
+DEFAULT_AXES = {'Motor 1': dict(interface=2, pin1=3, pin2=4)}
+SPEED_LIMIT = 1000  # telemetrix only accepts integer constant speeds within +/- SPEED_LIMIT steps/s
+
+
+class StepperAxis:
+    """
+    State and telemetrix callbacks of one stepper of a board
+
+    Parameters
+    ----------
+    name: (str) name of the axis
+    device: (Telemetrix) the board
+    motor: (int) telemetrix motor id
+    """
+
+    def __init__(self, name, device, motor):
+        self.name = name
+        self.device = device
+        self.motor = motor
         self._current_value = 0
         self._target_value = None
         self.running = False
         self.status = 0
+        self._move_future = None
+        self._position_listeners = []
+        self.position_time = None  # perf_counter time at which status was last updated
+        self.planner = None  # MotionPlanner choosing the max speed and acceleration of each move, see set_planner
+        self.max_speed = None  # last values sent to the board, see set_profile
+        self.acceleration = None
+        self.predicted_duration = None  # of the current (or last) move, None if the profile is unknown
+        self.last_duration = None  # actual duration of the last completed move
+        self._move_start = None
+        self._reports = 0  # number of position reports received
+        self._report_condition = threading.Condition()
+
+    def add_position_listener(self, callback):
+        if callback not in self._position_listeners:
+            self._position_listeners.append(callback)
+
+    def remove_position_listener(self, callback):
+        if callback in self._position_listeners:
+            self._position_listeners.remove(callback)
+
+    def _notify_position(self, value):
+        for callback in self._position_listeners:
+            callback(value)
+
+    def set_profile(self, max_speed=None, acceleration=None):
+        """Send the max speed and/or acceleration to the board, only if they differ from the last sent values"""
+        if max_speed is not None and max_speed != self.max_speed:
+            self.device.stepper_set_max_speed(self.motor, max_speed)
+            self.max_speed = max_speed
+        if acceleration is not None and acceleration != self.acceleration:
+            self.device.stepper_set_acceleration(self.motor, acceleration)
+            self.acceleration = acceleration
+
+    @property
+    def position_age(self):
+        """Time (s) since the cached position (status) was updated, inf if it never was"""
+        return math.inf if self.position_time is None else perf_counter() - self.position_time
+
+    @instrumented('StepperAxis.current_position_callback')
+    def current_position_callback(self, data):
+        with self._report_condition:
+            self.status = data[2]
+            self.position_time = perf_counter()
+            self._reports += 1
+            if not self.running:
+                self._current_value = self.status
+            self._report_condition.notify_all()
+        self._notify_position(self.status)
+
+    @instrumented('StepperAxis.the_callback')
+    def the_callback(self, data):
+        """
+        Completion callback fired by telemetrix once the motor reached its target. Resolves the pending move future
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data[2]))
+            logger.debug('Motor %s absolute motion completed at: %s.', data[1], date)
+        self.running = False
+        self._current_value = self._target_value
+        self.status = self._target_value
+        self.position_time = perf_counter()
+        if self._move_start is not None:
+            self.last_duration = self.position_time - self._move_start
+            if self.predicted_duration is not None:
+                logger.debug('Motor %s move done in %.3f s (predicted %.3f s)', data[1], self.last_duration,
+                             self.predicted_duration)
+        self._notify_position(self._current_value)
+        future = self._move_future
+        if future is not None and not future.done():
+            future.set_result(self._current_value)
 
+    def start_move(self, value, speed=None):
+        """
+        Send the target to the board and start the motion without waiting
+        Parameters
+        ----------
+        value: (float) the target
+        speed: (int) constant speed (steps/s) of the motion, None to use the accelerated profile
 
+        Returns
+        -------
+        Future: resolved with the reached value when the motion is completed, cancelled if the axis is stopped or if
+            another motion is started before
 
+        Raises
+        ------
+        ValueError if the speed is out of the telemetrix range, see check_speed
+        """
+        speed = self.check_speed(speed)
+        previous = self._move_future
+        future = Future()
+        self._move_future = future
+        if previous is not None and not previous.done():
+            previous.cancel()  # superseded, the board is retargeted
+        if not self._begin_move(value, speed):
+            future.set_result(self._current_value)
+            return future
+
+        # absolute target: the board position stays the reference even if the motor is shared with other wrappers
+        self.device.stepper_move_to(self.motor, self._target_value)
+        if speed is None:
+            self.device.stepper_run(self.motor, completion_callback=self.the_callback)
+        else:
+            # the direction is given by the target, the sign of the speed is ignored by runSpeedToPosition
+            self.device.stepper_set_speed(self.motor, speed)
+            self.device.stepper_run_speed_to_position(self.motor, completion_callback=self.the_callback)
+        return future
+
+    @staticmethod
+    def check_speed(speed):
+        """
+        Constant speed as sent to the board: a whole number of steps/s within 1 and SPEED_LIMIT, the sign being ignored
+        (the direction is given by the target)
+        """
+        if speed is None:
+            return None
+        speed = abs(int(round(speed)))
+        if not 1 <= speed <= SPEED_LIMIT:
+            raise ValueError(f'The speed of a stepper must be within 1 and {SPEED_LIMIT} steps/s, not {speed}')
+        return speed
 
-    def open_communication(self, port):
+    def _begin_move(self, value, speed=None):
         """
-        fake instrument opening communication.
+        Update the state for a new move (target, predicted duration, start time)
+        Returns
+        -------
+        bool: False if the motor is idle at the target, nothing being then sent to the board. While the motor runs,
+            _current_value is the target of the previous move, not the position, and the new target is always sent
+        """
+        retarget = self.running
+        self._target_value = int(round(value))  # the board only reaches whole steps, see the_callback
+        self._init_value = self._current_value
+        n_steps = round(self._target_value - self._init_value)
+        if n_steps == 0 and not retarget:
+            return False
+
+        self.running = True
+        if retarget:  # starting from an unknown position and speed
+            self.predicted_duration = None
+        elif speed is not None:
+            self.predicted_duration = abs(n_steps) / abs(speed) if speed else None
+        elif self.max_speed is not None and self.acceleration is not None:
+            self.predicted_duration = trapezoid_duration(n_steps, self.max_speed, self.acceleration)
+        else:
+            self.predicted_duration = None
+        self._move_start = perf_counter()
+        return True
+
+    def wait_move_done(self, timeout):
+        future = self._move_future
+        if future is None:
+            return self._current_value
+        try:
+            return future.result(timeout)
+        except CancelledError:  # motion interrupted by stop
+            return self._current_value
+        except FutureTimeoutError:
+            raise TimeoutError(f'Motion of {self.name} to {self._target_value} not completed after {timeout} s')
+
+    def stop(self):
+        self.device.stepper_stop(self.motor)
+        self.running = False
+        future = self._move_future
+        interrupted = future is not None and future.cancel()
+        # the motor stopped somewhere along the way, ask for its actual position
+        self.request_position()
+        return interrupted
+
+    def request_position(self):
+        """Ask the board for the position, the cache is updated when the report comes back"""
+        self.device.stepper_get_current_position(self.motor, self.current_position_callback)
+
+    def get_value(self, fresh=False, timeout=1.):
+        """
+        Cached position, a new report is waited for if fresh is True or if the board never reported it
+
+        Raises
+        ------
+        TimeoutError if no report came back within timeout
+        """
+        if fresh or self.position_time is None:
+            with self._report_condition:
+                reports = self._reports
+                self.request_position()
+                if not self._report_condition.wait_for(lambda: self._reports != reports, timeout):
+                    raise TimeoutError(f'No position report of {self.name} after {timeout} s')
+        self._current_value = self.status
+        return self._current_value
+
+
+class ActuatorWrapper:
+    """
+    Steppers driven by one telemetrix board. Each axis has its own pins, position and state, the methods act on the
+    current axis (see select_axis) unless an axis name is given. The state of a motor (StepperAxis) is shared with the
+    other wrappers driving it.
+    """
+    units = 'wavenumber (cm-1)'
+    move_timeout = 60.  # default time (s) to wait for a motion completion
+    def __init__(self):
+        self._com_port = ''
+        self.device = None
+        self.axes = {}  # axis name: StepperAxis
+        self.axis_name = None  # current axis
+        self._polled_axes = set()  # names of the axes whose position is requested periodically, see subscribe
+        self._poll_period = 0.1
+        self._poll_stop = threading.Event()
+        self._poll_thread = None
+
+
+
+
+    def open_communication(self, port, axes=None):
+        """
+        Open (or attach to the already opened) telemetrix board connected to port and declare the steppers
+        Parameters
+        ----------
+        port: (str) the serial port
+        axes: (dict) axis name: dict of pins (interface, pin1, pin2, pin3, pin4), default to DEFAULT_AXES
+
         Returns
         -------
         bool: True is instrument is opened else False
         """
-        self.device=telemetrix.Telemetrix(com_port=port,arduino_wait=4)
+        self.device = pool.acquire(port)
+        self._com_port = port
 
-        self.motor = self.device.set_pin_mode_stepper(interface=2, pin1=3, pin2=4)
+        if axes is None:
+            axes = DEFAULT_AXES
+        for name, pins in axes.items():
+            self.add_axis(name, **pins)
 
         return True
 
-    def current_position_callback(self, data):
-        #print(f'pos {data[2]}\n')
-        self.status = data[2]
+    def add_axis(self, name, interface=2, pin1=3, pin2=4, pin3=0, pin4=0):
+        """
+        Declare a stepper on the board, the first declared axis becomes the current one. A motor already driven by
+        another wrapper is shared with it (same StepperAxis, see TelemetrixPool.get_axis)
+        Returns
+        -------
+        StepperAxis
+        """
+        self.axes[name] = pool.get_axis(self._com_port, lambda device, motor: StepperAxis(name, device, motor),
+                                        interface=interface, pin1=pin1, pin2=pin2, pin3=pin3, pin4=pin4)
+        if self.axis_name is None:
+            self.axis_name = name
+        return self.axes[name]
 
-    def is_running_callback(self, data):
-        self.running = data[1]
-        print(f'is_running_callback returns {data[1]}\n')
+    def select_axis(self, name):
+        self.axis_name = name
 
-    def the_callback(self, data):
-        date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data[2]))
-        print(f'Motor {data[1]} absolute motion completed at: {date}.')
+    def _axis_name(self, axis=None):
+        return self.axis_name if axis is None else axis
+
+    def _axis(self, axis=None):
+        return self.axes[self._axis_name(axis)]
+
+    @property
+    def motor(self):
+        return self._axis().motor
 
-    def move_at(self, value):
+    @property
+    def running(self):
+        return any(axis.running for axis in self.axes.values())
+
+    def add_position_listener(self, callback, axis=None):
+        """
+        Register a callable called (from the telemetrix thread) with the new value each time the board reports it
+        """
+        self._axis(axis).add_position_listener(callback)
+
+    def remove_position_listener(self, callback, axis=None):
+        self._axis(axis).remove_position_listener(callback)
+
+    @instrumented('ActuatorWrapper.move_at')
+    def move_at(self, value, wait=True, timeout=None, axis=None, speed=None):
         """
         Send a call to the actuator to move at the given value
         Parameters
         ----------
         value: (float) the target value
+        wait: (bool) if True, block until the completion callback is fired (no polling of the board)
+        timeout: (float) maximum time (s) to wait for the completion, default to move_timeout
+        axis: (str) name of the axis, default to the current one
+        speed: (int) constant speed (steps/s) of the motion, None to use the accelerated profile
+
+        Returns
+        -------
+        Future: resolved with the reached value when the motion is completed (use asyncio.wrap_future to await it)
         """
-        self._target_value = value
-        self._init_value = self._current_value
-        n_steps = round((self._target_value - self._init_value))
+        stepper = self._axis(axis)
+        if speed is None:
+            self._apply_planner(stepper, value)
+        future = stepper.start_move(value, speed=speed)
+        if wait:
+            self.wait_move_done(timeout, axis=axis)
+        return future
 
-        self.device.stepper_move(self.motor, n_steps)
-        self.device.stepper_run(self.motor, completion_callback=self.the_callback)
-        self.device.stepper_is_running(self.motor, self.is_running_callback)
-        time.sleep(0.01)
-        while self.running == 1:
-            time.sleep(0.01)
-            self.device.stepper_is_running(self.motor, self.is_running_callback)
-            time.sleep(0.01)
-            self.get_value()
-        # self._start_time = perf_counter()
-        self._moving = True
+    def set_planner(self, planner, axis=None):
+        """
+        Parameters
+        ----------
+        planner: (MotionPlanner) sets the max speed and acceleration of each move (not of the constant speed ones) from
+            its distance, None to keep the values set by max_speed_set and accel_set
+        axis: (str) name of the axis, default to the current one
+        """
+        self._axis(axis).planner = planner
 
-    def max_speed_set(self,value):
-        self.device.stepper_set_max_speed(self.motor, value)
+    @staticmethod
+    def _apply_planner(stepper, value):
+        if stepper.planner is not None:
+            profile = stepper.planner.plan(round(value) - stepper._current_value)
+            stepper.set_profile(round(profile.max_speed), round(profile.acceleration))
 
-    def accel_set(self,value):
-        self.device.stepper_set_acceleration(self.motor, value)
+    def move_axes(self, targets, wait=True, timeout=None):
+        """
+        Start a coordinated move of several axes: all the targets are sent before waiting so that the steppers run in
+        parallel on the board
+        Parameters
+        ----------
+        targets: (dict) axis name: target value
+        wait: (bool) if True, block until all the completion callbacks are fired
+        timeout: (float) maximum time (s) to wait for all the completions, default to move_timeout
 
+        Returns
+        -------
+        dict: axis name: Future of its motion
+        """
+        for name, value in targets.items():
+            self._apply_planner(self._axis(name), value)
+        futures = {name: self._axis(name).start_move(value) for name, value in targets.items()}
+        if wait:
+            if timeout is None:
+                timeout = self.move_timeout
+            done, not_done = wait_futures(futures.values(), timeout)
+            if not_done:
+                names = [name for name, future in futures.items() if future in not_done]
+                raise TimeoutError(f'Motion of {names} not completed after {timeout} s')
+        return futures
 
-    def get_value(self):
+    def run_trajectory(self, positions, speed=None, callback=None, wait=False, timeout=None, axis=None):
         """
-        Get the current actuator value
+        Run through a list of waypoints, each motion being sent from the completion callback of the previous one
+        Parameters
+        ----------
+        positions: (list of float) the waypoints, see trajectory.waypoints for a start/stop/step grid
+        speed: (int) constant speed (steps/s) of the motions, None to use the accelerated profile, planned for each
+            waypoint if a planner is set
+        callback: (callable) callback(index, position, timestamp) called when a waypoint is reached
+        wait: (bool) if True, block until the last waypoint is reached
+        timeout: (float) maximum time (s) to wait, default to move_timeout per waypoint
+        axis: (str) name of the axis, default to the current one
+
         Returns
         -------
-        float: The current value
+        Trajectory: holds the reached positions and their timestamps
         """
+        trajectory = Trajectory(AxisView(self, self._axis_name(axis)), positions, speed=speed, callback=callback)
+        trajectory.start()
+        if wait:
+            if timeout is None:
+                timeout = self.move_timeout * max(1, len(trajectory.positions))
+            try:
+                trajectory.future.result(timeout)
+            except CancelledError:  # stopped
+                pass
+            except FutureTimeoutError:
+                raise TimeoutError(f'Trajectory not completed after {timeout} s, {trajectory.index} waypoints '
+                                   f'reached out of {len(trajectory.positions)}')
+        return trajectory
 
-        self.device.stepper_get_current_position(self.motor, self.current_position_callback)
-        self._current_value = self.status
-        return self._current_value
+    def move_by(self, n_steps, wait=True, timeout=None, axis=None):
+        """
+        Move the actuator by a relative number of steps, see move_at
+        """
+        return self.move_at(self._axis(axis)._current_value + n_steps, wait=wait, timeout=timeout, axis=axis)
 
-    def close_communication(self):
-        self.device.shutdown()
-        return f'Motor disconnected:'
+    def wait_move_done(self, timeout=None, axis=None):
+        """
+        Block until the pending motion is completed
+        Parameters
+        ----------
+        timeout: (float) maximum time (s) to wait, default to move_timeout
+        axis: (str) name of the axis, default to the current one
 
+        Returns
+        -------
+        float: the reached value
 
+        Raises
+        ------
+        TimeoutError if the completion callback has not been fired within timeout
+        """
+        if timeout is None:
+            timeout = self.move_timeout
+        return self._axis(axis).wait_move_done(timeout)
 
+    def stop(self, axis=None):
+        """
+        Stop the motor and cancel the pending move future (if any)
+        Returns
+        -------
+        bool: True if a motion was interrupted
+        """
+        return self._axis(axis).stop()
 
+    def stop_all(self):
+        for axis in self.axes.values():
+            axis.stop()
 
+    def max_speed_set(self, value, axis=None):
+        self._axis(axis).set_profile(max_speed=value)
 
+    def accel_set(self, value, axis=None):
+        self._axis(axis).set_profile(acceleration=value)
+
+    def move_timing(self, axis=None):
+        """
+        Returns
+        -------
+        tuple: (predicted, actual) durations (s) of the last move, predicted being None if the profile was unknown
+        """
+        stepper = self._axis(axis)
+        return stepper.predicted_duration, stepper.last_duration
+
+    @instrumented('ActuatorWrapper.get_value')
+    def get_value(self, axis=None, fresh=False, timeout=1., with_age=False):
+        """
+        Get the current actuator value from the position cache, updated by the telemetrix callbacks (see subscribe to
+        have the board report it periodically)
+        Parameters
+        ----------
+        axis: (str) name of the axis, default to the current one
+        fresh: (bool) if True, request a report from the board and wait for it
+        timeout: (float) maximum time (s) to wait for a fresh report
+        with_age: (bool) if True, also return the age (s) of the value
+
+        Returns
+        -------
+        float: The current value (or tuple (value, age) if with_age)
+        """
+        stepper = self._axis(axis)
+        value = stepper.get_value(fresh=fresh, timeout=timeout)
+        if with_age:
+            return value, stepper.position_age
+        return value
+
+    def subscribe(self, rate, axis=None):
+        """
+        Have the position of the axis reported at the given rate. The firmware has no periodic report, so a host
+        thread requests it, the position listeners are called with each report
+        Parameters
+        ----------
+        rate: (float) report rate (Hz), shared by all the subscribed axes
+        axis: (str) name of the axis, default to the current one
+        """
+        self._polled_axes.add(self._axis_name(axis))
+        self._poll_period = 1. / rate
+        if self._poll_thread is None or not self._poll_thread.is_alive():
+            self._poll_stop.clear()
+            self._poll_thread = threading.Thread(target=self._poll, daemon=True)
+            self._poll_thread.start()
+
+    def unsubscribe(self, axis=None):
+        self._polled_axes.discard(self._axis_name(axis))
+        if not self._polled_axes:
+            self._stop_polling()
+
+    def _stop_polling(self):
+        self._poll_stop.set()
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+        self._poll_thread = None
+
+    def _poll(self):
+        while not self._poll_stop.wait(self._poll_period):
+            for name in list(self._polled_axes):
+                self.axes[name].request_position()
+
+    def close_communication(self):
+        """Release the board, it is only shut down if no other wrapper uses it"""
+        self._polled_axes.clear()
+        self._stop_polling()
+        pool.release(self._com_port)
+        return f'Motor disconnected:'
@@ -0,0 +1,719 @@
+"""
+asyncio variant of the stepper wrapper, built on telemetrix_aio
+
+* AsyncActuatorWrapper: the ActuatorWrapper API with the board I/O (moves, setters, position requests) as coroutines
+  resolved by the telemetrix_aio callbacks. Several boards (and rulers, see AsyncEncoder) are driven from one event
+  loop without a thread per device, see wait_moves to await the completions of motors of several boards together.
+* SyncActuatorWrapper: blocking facade over an AsyncActuatorWrapper running in a shared event loop thread, with the
+  API of ActuatorWrapper, so that DAQ_Move_Arduino can use either backend.
+
+The simulated port uses the SimulatedTelemetrix of the telemetrix pool (see ThreadedBoardAdapter). A real board opened
+here is not registered in the telemetrix pool: it cannot be shared with the plugins using the threaded backend.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
+
+from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper, StepperAxis, DEFAULT_AXES
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import pool, SIMULATED_PORT
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
+from pymodaq_plugins_arduino.hardware.trajectory import Trajectory, AxisView
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadedBoardAdapter:
+    """
+    telemetrix_aio like API (coroutines, coroutine callbacks) over a threaded board (StepperBoardBase), its callbacks
+    being run in the event loop
+
+    Parameters
+    ----------
+    board: (StepperBoardBase) the threaded board, ex: SimulatedTelemetrix
+    loop: (asyncio.AbstractEventLoop) the loop in which the callbacks are run
+    """
+
+    def __init__(self, board, loop):
+        self.board = board
+        self.loop = loop
+
+    def _callback(self, callback):
+        if callback is None:
+            return None
+
+        def threaded_callback(data):
+            asyncio.run_coroutine_threadsafe(callback(data), self.loop)
+        return threaded_callback
+
+    async def set_pin_mode_stepper(self, interface=1, pin1=2, pin2=3, pin3=4, pin4=5, enable=True):
+        return self.board.set_pin_mode_stepper(interface, pin1, pin2, pin3, pin4, enable)
+
+    async def stepper_move_to(self, motor_id, position):
+        self.board.stepper_move_to(motor_id, position)
+
+    async def stepper_move(self, motor_id, relative_position):
+        self.board.stepper_move(motor_id, relative_position)
+
+    async def stepper_run(self, motor_id, completion_callback=None):
+        self.board.stepper_run(motor_id, completion_callback=self._callback(completion_callback))
+
+    async def stepper_run_speed_to_position(self, motor_id, completion_callback=None):
+        self.board.stepper_run_speed_to_position(motor_id, completion_callback=self._callback(completion_callback))
+
+    async def stepper_set_speed(self, motor_id, speed):
+        self.board.stepper_set_speed(motor_id, speed)
+
+    async def stepper_set_max_speed(self, motor_id, max_speed):
+        self.board.stepper_set_max_speed(motor_id, max_speed)
+
+    async def stepper_set_acceleration(self, motor_id, acceleration):
+        self.board.stepper_set_acceleration(motor_id, acceleration)
+
+    async def stepper_set_current_position(self, motor_id, position):
+        self.board.stepper_set_current_position(motor_id, position)
+
+    async def stepper_stop(self, motor_id):
+        self.board.stepper_stop(motor_id)
+
+    async def stepper_get_current_position(self, motor_id, current_position_callback):
+        self.board.stepper_get_current_position(motor_id, self._callback(current_position_callback))
+
+    async def stepper_is_running(self, motor_id, callback):
+        self.board.stepper_is_running(motor_id, self._callback(callback))
+
+    async def shutdown(self):
+        self.board.shutdown()
+
+
+class AsyncStepperAxis(StepperAxis):
+    """
+    Stepper of a telemetrix_aio board: same state and bookkeeping as StepperAxis, the board I/O and the callbacks
+    being coroutines. Its methods are to be called from the event loop of the board.
+
+    Parameters
+    ----------
+    name: (str) name of the axis
+    device: (TelemetrixAIO) the board (or a ThreadedBoardAdapter)
+    motor: (int) telemetrix motor id
+    """
+
+    def __init__(self, name, device, motor):
+        super().__init__(name, device, motor)
+        self._report_waiters = []  # futures resolved by the next position report, see get_value
+
+    async def set_profile(self, max_speed=None, acceleration=None):
+        """Send the max speed and/or acceleration to the board, only if they differ from the last sent values"""
+        if max_speed is not None and max_speed != self.max_speed:
+            await self.device.stepper_set_max_speed(self.motor, max_speed)
+            self.max_speed = max_speed
+        if acceleration is not None and acceleration != self.acceleration:
+            await self.device.stepper_set_acceleration(self.motor, acceleration)
+            self.acceleration = acceleration
+
+    async def current_position_callback(self, data):
+        super().current_position_callback(data)
+        for waiter in self._report_waiters:
+            if not waiter.done():
+                waiter.set_result(self.status)
+        self._report_waiters.clear()
+
+    async def the_callback(self, data):
+        super().the_callback(data)
+
+    async def start_move(self, value, speed=None):
+        """
+        Send the target to the board and start the motion without waiting
+        Parameters
+        ----------
+        value: (float) the target
+        speed: (int) constant speed (steps/s) of the motion, None to use the accelerated profile
+
+        Returns
+        -------
+        asyncio.Future: resolved with the reached value when the motion is completed, cancelled if the axis is stopped
+            or if another motion is started before
+
+        Raises
+        ------
+        ValueError if the speed is out of the telemetrix range, see StepperAxis.check_speed
+        """
+        speed = self.check_speed(speed)
+        previous = self._move_future
+        if previous is not None and not previous.done():
+            previous.cancel()
+        future = asyncio.get_running_loop().create_future()
+        self._move_future = future
+        if not self._begin_move(value, speed):
+            future.set_result(self._current_value)
+            return future
+
+        await self.device.stepper_move_to(self.motor, self._target_value)
+        if speed is None:
+            await self.device.stepper_run(self.motor, completion_callback=self.the_callback)
+        else:
+            await self.device.stepper_set_speed(self.motor, speed)
+            await self.device.stepper_run_speed_to_position(self.motor, completion_callback=self.the_callback)
+        return future
+
+    async def wait_move_done(self, timeout):
+        future = self._move_future
+        if future is None:
+            return self._current_value
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.CancelledError:
+            if not future.cancelled():  # the waiting task itself has been cancelled
+                raise
+            return self._current_value  # motion interrupted by stop
+        except asyncio.TimeoutError:
+            raise TimeoutError(f'Motion of {self.name} to {self._target_value} not completed after {timeout} s')
+
+    async def stop(self):
+        await self.device.stepper_stop(self.motor)
+        self.running = False
+        future = self._move_future
+        interrupted = future is not None and future.cancel()
+        await self.request_position()
+        return interrupted
+
+    async def request_position(self):
+        """Ask the board for the position, the cache is updated when the report comes back"""
+        await self.device.stepper_get_current_position(self.motor, self.current_position_callback)
+
+    async def get_value(self, fresh=False, timeout=1.):
+        """
+        Cached position, a new report is awaited if fresh is True or if the board never reported it
+
+        Raises
+        ------
+        TimeoutError if no report came back within timeout
+        """
+        if fresh or self.position_time is None:
+            waiter = asyncio.get_running_loop().create_future()
+            self._report_waiters.append(waiter)
+            await self.request_position()
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f'No position report of {self.name} after {timeout} s')
+        self._current_value = self.status
+        return self._current_value
+
+
+async def open_board(port, arduino_wait=4):
+    """
+    Open the telemetrix_aio board connected to port in the running event loop
+    Returns
+    -------
+    TelemetrixAIO, or a ThreadedBoardAdapter over the simulated board of the telemetrix pool for SIMULATED_PORT
+    """
+    loop = asyncio.get_running_loop()
+    if port == SIMULATED_PORT:
+        return ThreadedBoardAdapter(pool.acquire(port), loop)
+    from telemetrix_aio import telemetrix_aio
+    # the loop may be shared by other boards (see EventLoopThread): a shutdown of this one must not stop it
+    board = telemetrix_aio.TelemetrixAIO(com_port=port, arduino_wait=arduino_wait, autostart=False, loop=loop,
+                                         close_loop_on_shutdown=False, shutdown_on_exception=False)
+    await board.start_aio()
+    return board
+
+
+async def wait_moves(futures, timeout=None):
+    """
+    Await the completion of several motions, possibly of different boards
+    Parameters
+    ----------
+    futures: (iterable of asyncio.Future) as returned by AsyncActuatorWrapper.move_at or move_axes
+    timeout: (float) maximum time (s) to wait, None to wait for ever
+
+    Returns
+    -------
+    list: the reached values, None for the interrupted motions
+
+    Raises
+    ------
+    TimeoutError if some motions are not completed within timeout
+    """
+    futures = list(futures)
+    if not futures:
+        return []
+    done, pending = await asyncio.wait(futures, timeout=timeout)
+    if pending:
+        raise TimeoutError(f'{len(pending)} motions out of {len(futures)} not completed after {timeout} s')
+    return [None if future.cancelled() else future.result() for future in futures]
+
+
+class AsyncActuatorWrapper:
+    """
+    Steppers driven by one telemetrix_aio board, see ActuatorWrapper. The methods talking to the board are coroutines
+    to be awaited in the event loop in which the board was opened, the commands of one wrapper are serialized so that
+    a stop is never sent in the middle of the commands of a move.
+    """
+    units = ActuatorWrapper.units
+    move_timeout = ActuatorWrapper.move_timeout
+
+    def __init__(self):
+        self._com_port = ''
+        self.device = None
+        self.axes = {}  # axis name: AsyncStepperAxis
+        self.axis_name = None  # current axis
+        self._lock = asyncio.Lock()
+        self._polled_axes = set()  # see subscribe
+        self._poll_period = 0.1
+        self._poll_task = None
+
+    async def open_communication(self, port, axes=None, board=None):
+        """
+        Open the board connected to port and declare the steppers
+        Parameters
+        ----------
+        port: (str) the serial port, SIMULATED_PORT for the simulated board
+        axes: (dict) axis name: dict of pins (interface, pin1, pin2, pin3, pin4), default to DEFAULT_AXES
+        board: (TelemetrixAIO) an already opened board, port being then only used as a label
+
+        Returns
+        -------
+        bool: True is instrument is opened else False
+        """
+        self.device = await open_board(port) if board is None else board
+        self._com_port = port
+
+        if axes is None:
+            axes = DEFAULT_AXES
+        for name, pins in axes.items():
+            await self.add_axis(name, **pins)
+        return True
+
+    async def add_axis(self, name, interface=2, pin1=3, pin2=4, pin3=0, pin4=0):
+        """
+        Declare a stepper on the board, the first declared axis becomes the current one
+        Returns
+        -------
+        AsyncStepperAxis
+        """
+        if isinstance(self.device, ThreadedBoardAdapter):
+            # the pool keeps one state object per motor of its boards, shared by the wrappers driving it
+            device = self.device
+            axis = pool.get_axis(self._com_port, lambda board, motor: AsyncStepperAxis(name, device, motor),
+                                 interface=interface, pin1=pin1, pin2=pin2, pin3=pin3, pin4=pin4)
+            if not isinstance(axis, AsyncStepperAxis):
+                raise RuntimeError(f'The stepper on pins {(interface, pin1, pin2, pin3, pin4)} of {self._com_port} '
+                                   f'is already driven by a threaded wrapper')
+            self.axes[name] = axis
+        else:
+            motor = await self.device.set_pin_mode_stepper(interface=interface, pin1=pin1, pin2=pin2, pin3=pin3,
+                                                           pin4=pin4)
+            self.axes[name] = AsyncStepperAxis(name, self.device, motor)
+        if self.axis_name is None:
+            self.axis_name = name
+        return self.axes[name]
+
+    def select_axis(self, name):
+        self.axis_name = name
+
+    def _axis_name(self, axis=None):
+        return self.axis_name if axis is None else axis
+
+    def _axis(self, axis=None):
+        return self.axes[self._axis_name(axis)]
+
+    @property
+    def running(self):
+        return any(axis.running for axis in self.axes.values())
+
+    def add_position_listener(self, callback, axis=None):
+        """
+        Register a callable called (from the event loop) with the new value each time the board reports it
+        """
+        self._axis(axis).add_position_listener(callback)
+
+    def remove_position_listener(self, callback, axis=None):
+        self._axis(axis).remove_position_listener(callback)
+
+    def set_planner(self, planner, axis=None):
+        """See ActuatorWrapper.set_planner"""
+        self._axis(axis).planner = planner
+
+    async def _apply_planner(self, stepper, value):
+        if stepper.planner is not None:
+            profile = stepper.planner.plan(round(value) - stepper._current_value)
+            await stepper.set_profile(round(profile.max_speed), round(profile.acceleration))
+
+    async def move_at(self, value, wait=True, timeout=None, axis=None, speed=None):
+        """
+        Send a call to the actuator to move at the given value
+        Parameters
+        ----------
+        value: (float) the target value
+        wait: (bool) if True, return once the completion callback is fired
+        timeout: (float) maximum time (s) to wait for the completion, default to move_timeout
+        axis: (str) name of the axis, default to the current one
+        speed: (int) constant speed (steps/s) of the motion, None to use the accelerated profile
+
+        Returns
+        -------
+        asyncio.Future: resolved with the reached value when the motion is completed
+        """
+        stepper = self._axis(axis)
+        async with self._lock:
+            if speed is None:
+                await self._apply_planner(stepper, value)
+            future = await stepper.start_move(value, speed=speed)
+        if wait:
+            await self.wait_move_done(timeout, axis=axis)
+        return future
+
+    async def move_by(self, n_steps, wait=True, timeout=None, axis=None):
+        """
+        Move the actuator by a relative number of steps, see move_at
+        """
+        return await self.move_at(self._axis(axis)._current_value + n_steps, wait=wait, timeout=timeout, axis=axis)
+
+    async def move_axes(self, targets, wait=True, timeout=None):
+        """
+        Start a coordinated move of several axes, see ActuatorWrapper.move_axes
+        Returns
+        -------
+        dict: axis name: asyncio.Future of its motion
+        """
+        futures = dict()
+        async with self._lock:
+            for name, value in targets.items():
+                await self._apply_planner(self._axis(name), value)
+            for name, value in targets.items():
+                futures[name] = await self._axis(name).start_move(value)
+        if wait:
+            await wait_moves(futures.values(), self.move_timeout if timeout is None else timeout)
+        return futures
+
+    async def wait_move_done(self, timeout=None, axis=None):
+        """
+        Await the completion of the pending motion
+        Returns
+        -------
+        float: the reached value
+
+        Raises
+        ------
+        TimeoutError if the completion callback has not been fired within timeout
+        """
+        if timeout is None:
+            timeout = self.move_timeout
+        return await self._axis(axis).wait_move_done(timeout)
+
+    async def stop(self, axis=None):
+        """
+        Stop the motor and cancel the pending move future (if any)
+        Returns
+        -------
+        bool: True if a motion was interrupted
+        """
+        async with self._lock:
+            return await self._axis(axis).stop()
+
+    async def stop_all(self):
+        async with self._lock:
+            for axis in self.axes.values():
+                await axis.stop()
+
+    async def max_speed_set(self, value, axis=None):
+        async with self._lock:
+            await self._axis(axis).set_profile(max_speed=value)
+
+    async def accel_set(self, value, axis=None):
+        async with self._lock:
+            await self._axis(axis).set_profile(acceleration=value)
+
+    def move_timing(self, axis=None):
+        """See ActuatorWrapper.move_timing"""
+        stepper = self._axis(axis)
+        return stepper.predicted_duration, stepper.last_duration
+
+    async def get_value(self, axis=None, fresh=False, timeout=1., with_age=False):
+        """
+        Get the current actuator value from the position cache, see ActuatorWrapper.get_value
+        """
+        stepper = self._axis(axis)
+        value = await stepper.get_value(fresh=fresh, timeout=timeout)
+        if with_age:
+            return value, stepper.position_age
+        return value
+
+    async def subscribe(self, rate, axis=None):
+        """
+        Have the position of the axis reported at the given rate, by a task of the event loop requesting it (the
+        firmware has no periodic report)
+        """
+        self._polled_axes.add(self._axis_name(axis))
+        self._poll_period = 1. / rate
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def unsubscribe(self, axis=None):
+        self._polled_axes.discard(self._axis_name(axis))
+        if not self._polled_axes:
+            await self._stop_polling()
+
+    async def _stop_polling(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+        self._poll_task = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self._poll_period)
+            for name in list(self._polled_axes):
+                await self.axes[name].request_position()
+
+    async def close_communication(self):
+        """Shut the board down (release it to the telemetrix pool if simulated)"""
+        self._polled_axes.clear()
+        await self._stop_polling()
+        if isinstance(self.device, ThreadedBoardAdapter):
+            pool.release(self._com_port)
+        elif self.device is not None:
+            await self.device.shutdown()
+        self.device = None
+        return f'Motor disconnected:'
+
+
+class AsyncEncoder:
+    """
+    Coroutine reads of an encoder card (EncoderBase) from an event loop. The readings of the card are blocking and
+    are done in an executor, except when its background sampler holds them
+
+    Parameters
+    ----------
+    encoder: (EncoderBase) the card
+    executor: (concurrent.futures.Executor) executor of the card readings, None for the default one of the loop
+    """
+
+    def __init__(self, encoder, executor=None):
+        self.encoder = encoder
+        self.executor = executor
+
+    async def get_axis_position(self, axis):
+        sampler = self.encoder.sampler
+        if sampler is not None and axis in sampler.axes:
+            return self.encoder.get_axis_position(axis)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.encoder.get_axis_position, axis)
+
+    async def get_axes_positions(self, axes=None):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.encoder.get_axes_positions, axes)
+
+
+class EventLoopThread:
+    """An asyncio event loop running for ever in a daemon thread, shared by the SyncActuatorWrapper instances"""
+    timeout = 30.  # default maximum time (s) to wait for a coroutine run by run, longer than a board handshake
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name='telemetrix_aio loop')
+        self._thread.start()
+
+    def run(self, coroutine, timeout=None):
+        """
+        Run the coroutine in the loop and block until its result
+        Parameters
+        ----------
+        coroutine: the coroutine to run
+        timeout: (float) maximum time (s) to wait, default to the timeout attribute
+
+        Raises
+        ------
+        TimeoutError if the coroutine is not done within timeout (it is then cancelled)
+        RuntimeError if called from the loop thread itself (it would wait for ever)
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('EventLoopThread.run cannot be called from its own loop, await the coroutine instead')
+        if timeout is None:
+            timeout = self.timeout
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f'Coroutine not done after {timeout} s in the telemetrix_aio loop')
+
+    def submit(self, coroutine):
+        """
+        Returns
+        -------
+        concurrent.futures.Future: resolved with the result of the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def loop_thread():
+    """The EventLoopThread shared by the SyncActuatorWrapper instances, started on the first call"""
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = EventLoopThread()
+        return _loop_thread
+
+
+class SyncActuatorWrapper:
+    """
+    Blocking facade with the API of ActuatorWrapper over an AsyncActuatorWrapper running in the shared event loop
+    thread (see loop_thread). The move futures are concurrent.futures.Future, their done callbacks and the position
+    listeners being called from the loop thread.
+    """
+    units = ActuatorWrapper.units
+    move_timeout = ActuatorWrapper.move_timeout
+
+    def __init__(self):
+        self._loop = loop_thread()
+        self.aio = self._loop.run(self._create())
+        self._moves = {}  # axis name: Future of its last motion
+
+    @staticmethod
+    async def _create():
+        return AsyncActuatorWrapper()  # created in the loop thread
+
+    @property
+    def axes(self):
+        return self.aio.axes
+
+    @property
+    def axis_name(self):
+        return self.aio.axis_name
+
+    @property
+    def motor(self):
+        return self.aio._axis().motor
+
+    @property
+    def running(self):
+        return self.aio.running
+
+    def open_communication(self, port, axes=None):
+        return self._loop.run(self.aio.open_communication(port, axes=axes))
+
+    def add_axis(self, name, interface=2, pin1=3, pin2=4, pin3=0, pin4=0):
+        return self._loop.run(self.aio.add_axis(name, interface=interface, pin1=pin1, pin2=pin2, pin3=pin3, pin4=pin4))
+
+    def select_axis(self, name):
+        self.aio.select_axis(name)
+
+    def add_position_listener(self, callback, axis=None):
+        self.aio.add_position_listener(callback, axis=axis)
+
+    def remove_position_listener(self, callback, axis=None):
+        self.aio.remove_position_listener(callback, axis=axis)
+
+    def set_planner(self, planner, axis=None):
+        self.aio.set_planner(planner, axis=axis)
+
+    def move_timing(self, axis=None):
+        return self.aio.move_timing(axis=axis)
+
+    async def _move(self, value, axis, speed):
+        move = await self.aio.move_at(value, wait=False, axis=axis, speed=speed)
+        return await move  # cancelled with the move by stop
+
+    @instrumented('SyncActuatorWrapper.move_at')
+    def move_at(self, value, wait=True, timeout=None, axis=None, speed=None):
+        """
+        See ActuatorWrapper.move_at
+        Returns
+        -------
+        Future: resolved with the reached value when the motion is completed, cancelled if interrupted
+        """
+        name = self.aio._axis_name(axis)
+        future = self._loop.submit(self._move(value, name, speed))
+        self._moves[name] = future
+        if wait:
+            self.wait_move_done(timeout, axis=name)
+        return future
+
+    def move_by(self, n_steps, wait=True, timeout=None, axis=None):
+        return self.move_at(self.aio._axis(axis)._current_value + n_steps, wait=wait, timeout=timeout, axis=axis)
+
+    def move_axes(self, targets, wait=True, timeout=None):
+        """See ActuatorWrapper.move_axes"""
+        futures = {name: self.move_at(value, wait=False, axis=name) for name, value in targets.items()}
+        if wait:
+            if timeout is None:
+                timeout = self.move_timeout
+            done, not_done = wait_futures(futures.values(), timeout)
+            if not_done:
+                names = [name for name, future in futures.items() if future in not_done]
+                raise TimeoutError(f'Motion of {names} not completed after {timeout} s')
+        return futures
+
+    def run_trajectory(self, positions, speed=None, callback=None, wait=False, timeout=None, axis=None):
+        """See ActuatorWrapper.run_trajectory, the callback being called from the loop thread"""
+        trajectory = Trajectory(AxisView(self, self.aio._axis_name(axis)), positions, speed=speed, callback=callback)
+        trajectory.start()
+        if wait:
+            if timeout is None:
+                timeout = self.move_timeout * max(1, len(trajectory.positions))
+            try:
+                trajectory.future.result(timeout)
+            except CancelledError:
+                pass
+            except FutureTimeoutError:
+                raise TimeoutError(f'Trajectory not completed after {timeout} s, {trajectory.index} waypoints '
+                                   f'reached out of {len(trajectory.positions)}')
+        return trajectory
+
+    def wait_move_done(self, timeout=None, axis=None):
+        """See ActuatorWrapper.wait_move_done"""
+        if timeout is None:
+            timeout = self.move_timeout
+        stepper = self.aio._axis(axis)
+        future = self._moves.get(self.aio._axis_name(axis))
+        if future is None:
+            return stepper._current_value
+        try:
+            return future.result(timeout)
+        except CancelledError:
+            return stepper._current_value
+        except FutureTimeoutError:
+            raise TimeoutError(f'Motion of {stepper.name} to {stepper._target_value} not completed after {timeout} s')
+
+    def stop(self, axis=None):
+        return self._loop.run(self.aio.stop(axis=axis))
+
+    def stop_all(self):
+        self._loop.run(self.aio.stop_all())
+
+    def max_speed_set(self, value, axis=None):
+        self._loop.run(self.aio.max_speed_set(value, axis=axis))
+
+    def accel_set(self, value, axis=None):
+        self._loop.run(self.aio.accel_set(value, axis=axis))
+
+    @instrumented('SyncActuatorWrapper.get_value')
+    def get_value(self, axis=None, fresh=False, timeout=1., with_age=False):
+        """See ActuatorWrapper.get_value, the cached value is returned without going through the event loop"""
+        stepper = self.aio._axis(axis)
+        if fresh or stepper.position_time is None:
+            self._loop.run(stepper.get_value(fresh=True, timeout=timeout))
+        # as StepperAxis.get_value: the relative and zero length moves start from _current_value
+        stepper._current_value = stepper.status
+        value = stepper._current_value
+        if with_age:
+            return value, stepper.position_age
+        return value
+
+    def subscribe(self, rate, axis=None):
+        self._loop.run(self.aio.subscribe(rate, axis=axis))
+
+    def unsubscribe(self, axis=None):
+        self._loop.run(self.aio.unsubscribe(axis=axis))
+
+    def close_communication(self):
+        return self._loop.run(self.aio.close_communication())
@@ -0,0 +1,68 @@
+"""
+Factories of the hardware backends, so that the plugins and scripts pick the real or the simulated hardware in one
+place (see base for the interfaces)
+"""
+
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT
+
+
+def create_encoder(simulated=False, dllpath=None, **simulator_options):
+    """
+    Parameters
+    ----------
+    simulated: (bool) if True, the IK220 wrapper runs over a SimulatedIK220Dll (following the simulated stepper board)
+    dllpath: (str) folder of the Heidenhain dll, default to the one of IK220
+    simulator_options: keyword arguments of SimulatedIK220Dll (axes, noise, read_latency...)
+
+    Returns
+    -------
+    EncoderBase
+    """
+    from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
+    if simulated:
+        from pymodaq_plugins_arduino.hardware.simulator import SimulatedIK220Dll
+        return IK220(dll=SimulatedIK220Dll(**simulator_options))
+    if dllpath is None:
+        return IK220()
+    return IK220(dllpath=dllpath)
+
+
+ACTUATOR_BACKENDS = ['telemetrix', 'telemetrix_aio']
+
+
+def actuator_class(backend='telemetrix'):
+    """
+    Returns
+    -------
+    type: ActuatorWrapper for the threaded telemetrix backend, SyncActuatorWrapper (facade over an asyncio wrapper,
+        see arduino_wrapper_aio) for telemetrix_aio
+    """
+    if backend == 'telemetrix':
+        from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
+        return ActuatorWrapper
+    if backend == 'telemetrix_aio':
+        from pymodaq_plugins_arduino.hardware.arduino_wrapper_aio import SyncActuatorWrapper
+        return SyncActuatorWrapper
+    raise ValueError(f'Unknown actuator backend {backend}, should be one of {ACTUATOR_BACKENDS}')
+
+
+def create_actuator(port, axes=None, backend='telemetrix'):
+    """
+    Parameters
+    ----------
+    port: (str) serial port of the telemetrix board, SIMULATED_PORT for the simulated one
+    axes: (dict) axis name: dict of pins, default to DEFAULT_AXES of arduino_wrapper
+    backend: (str) one of ACTUATOR_BACKENDS, see actuator_class
+
+    Returns
+    -------
+    ActuatorWrapper: with its communication opened (with the telemetrix backend, the board is shared through the
+        telemetrix pool)
+    """
+    actuator = actuator_class(backend)()
+    actuator.open_communication(port, axes=axes)
+    return actuator
+
+
+def is_simulated(port):
+    return port == SIMULATED_PORT
@@ -0,0 +1,187 @@
+"""
+Interfaces of the hardware layer
+
+* EncoderBase: encoder cards. A backend only implements the raw reads (read_axis, read_axes) and lists its present
+  axes in self.axis, the background sampling, the batched reads and the fast path of get_axis_position are shared.
+  IK220 is the implementation over the Heidenhain dll, with either the real library or a SimulatedIK220Dll.
+* StepperBoardBase: the subset of the telemetrix API used by the stepper wrappers (StepperAxis, ActuatorWrapper),
+  implemented by telemetrix.Telemetrix and by SimulatedTelemetrix.
+
+See backends for the factories building them.
+"""
+
+from abc import ABC, abstractmethod
+from time import sleep
+
+import numpy as np
+
+from pymodaq_plugins_arduino.hardware.instrumentation import instrumented
+from pymodaq_plugins_arduino.hardware.sampler import EncoderSampler
+
+
+class EncoderBase:
+    """
+    Encoder card with several axes, positions are given in the units of the card (already scaled by the backend)
+    """
+    units = ''
+
+    def __init__(self):
+        self.axis = []  # present axes
+        self.sampler = None
+
+    def read_axis(self, axis):
+        """
+        Raw reading of one axis
+        Returns
+        -------
+        tuple: (position, status, alarm)
+        """
+        raise NotImplementedError
+
+    def read_axes(self, axes=None):
+        """
+        Raw reading of several axes in one pass
+        Parameters
+        ----------
+        axes: (list of int) the axes to read, default to all the present axes
+
+        Returns
+        -------
+        tuple of ndarray: (positions, status, alarm) one entry per axis
+        """
+        raise NotImplementedError
+
+    def get_axes_positions(self, axes=None):
+        """
+        Positions of several axes (same units as get_axis_position, not rounded), taken from the background sampler
+        if it samples all of them, otherwise read from the card
+        Returns
+        -------
+        ndarray: one position per axis
+        """
+        if axes is None:
+            axes = self.axis
+        sampler = self.sampler
+        if sampler is not None and sampler.buffer.count > 0 and all(axis in sampler.axes for axis in axes):
+            latest = sampler.buffer.latest()[1]
+            return latest[[sampler.index(axis) for axis in axes]]
+        return self.read_axes(axes)[0]
+
+    def sample_axes(self, axes=None, n_samples=1):
+        """
+        Take n_samples consecutive readings of several axes, either the next samples of the background sampler (if
+        it samples all the axes) or readings done in a tight loop
+        Returns
+        -------
+        ndarray: array of positions of shape (n_samples, len(axes))
+        """
+        if axes is None:
+            axes = self.axis
+        sampler = self.sampler
+        if sampler is not None and sampler.running and all(axis in sampler.axes for axis in axes) \
+                and n_samples <= sampler.buffer.size:
+            start = sampler.buffer.count
+            while sampler.buffer.count - start < n_samples and sampler.running:
+                sleep(1 / sampler.rate)
+            positions = sampler.buffer.since(start)[1][:n_samples]
+            return positions[:, [sampler.index(axis) for axis in axes]]
+
+        samples = np.empty((n_samples, len(axes)))
+        for ind in range(n_samples):
+            samples[ind] = self.read_axes(axes)[0]
+        return samples
+
+    def start_sampling(self, axes=None, rate=1000., size=10000):
+        """
+        Start a background thread sampling the given axes at a fixed rate into a ring buffer. While it runs,
+        get_axis_position returns the latest sample of the buffer and never reads the card.
+        Parameters
+        ----------
+        axes: (list of int) the axes to sample, default to all the present axes
+        rate: (float) sampling rate in Hz
+        size: (int) number of samples kept in the buffer
+        """
+        self.stop_sampling()
+        if axes is None:
+            axes = self.axis
+        self.sampler = EncoderSampler(self.read_axes, axes, rate, size)
+        self.sampler.start()
+
+    def stop_sampling(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+
+    @instrumented('EncoderBase.get_axis_position')
+    def get_axis_position(self, axis):
+        """
+        Position of one axis rounded to 1e-3 (the latest sample of the background sampler if it samples this axis)
+        """
+        sampler = self.sampler
+        if sampler is not None and axis in sampler.axes:
+            position = sampler.latest_position(axis)
+            if position is not None:
+                return round(float(position), 3)
+        return round(self.read_axis(axis)[0], 3)
+
+
+class StepperBoardBase(ABC):
+    """
+    Stepper API of a telemetrix board, as used by the stepper wrappers. Motor ids are returned by
+    set_pin_mode_stepper, reports are given to the callbacks as lists: [report id, motor id, value(s)..., time]
+
+    telemetrix.Telemetrix does not derive from it but has the same methods, the simulated boards derive from it so
+    that a missing method is reported at their instantiation.
+    """
+
+    @abstractmethod
+    def set_pin_mode_stepper(self, interface=1, pin1=2, pin2=3, pin3=4, pin4=5, enable=True):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_move_to(self, motor_id, position):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_move(self, motor_id, relative_position):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_run(self, motor_id, completion_callback=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_run_speed_to_position(self, motor_id, completion_callback=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_set_speed(self, motor_id, speed):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_set_max_speed(self, motor_id, max_speed):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_set_acceleration(self, motor_id, acceleration):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_set_current_position(self, motor_id, position):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_stop(self, motor_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_get_current_position(self, motor_id, current_position_callback):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stepper_is_running(self, motor_id, callback):
+        raise NotImplementedError
+
+    @abstractmethod
+    def shutdown(self):
+        raise NotImplementedError
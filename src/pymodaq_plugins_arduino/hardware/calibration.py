@@ -0,0 +1,161 @@
+"""
+Calibration of the stepper against the ruler: (step count, ruler position) pairs recorded at the end of the moves are
+turned into a piecewise linear map per direction of approach, so that a move can be sent with the step count landing
+on a ruler target at the first try, the closed loop only correcting the residual
+
+The step counter of the board restarts at 0 at each power-up or reconnection: a calibration loaded from a file is only
+used once anchored on the current (step count, ruler position) pair, see StepCalibration.anchor
+"""
+
+import json
+from collections import deque
+
+import numpy as np
+
+
+class StepCalibration:
+    """
+    Piecewise linear maps ruler position -> step count, one per direction of approach (the difference between the
+    two being the backlash of the mechanics)
+
+    Parameters
+    ----------
+    max_points: (int) number of pairs kept per direction, the oldest ones being dropped first
+    """
+
+    def __init__(self, max_points=2000):
+        self.max_points = max_points
+        self.points = {1: deque(maxlen=max_points), -1: deque(maxlen=max_points)}
+        self._maps = None  # direction: (positions, steps) sorted by position, see fit
+        self.anchored = True  # the step counts are the ones of the current board counter
+
+    def __len__(self):
+        return len(self.points[1]) + len(self.points[-1])
+
+    def clear(self):
+        for points in self.points.values():
+            points.clear()
+        self._maps = None
+
+    def record(self, steps, position, direction):
+        """
+        Parameters
+        ----------
+        steps: (int) step count of the stepper at the end of a move
+        position: (float) ruler position read once the move was done
+        direction: (int) sign of the move (1 or -1), backlash makes the maps of both directions differ
+        """
+        if direction == 0:
+            return
+        if not self.anchored:
+            self.anchor(steps, position, direction)
+        self.points[1 if direction > 0 else -1].append((float(steps), float(position)))
+        self._maps = None
+
+    def fit(self):
+        """
+        Build the maps: points with the same position are averaged, so that the maps are monotonic in the sampled
+        positions
+        Returns
+        -------
+        dict: direction: (positions, steps) arrays sorted by position (direction missing if less than 2 points)
+        """
+        maps = dict()
+        for direction, points in self.points.items():
+            if len(points) < 2:
+                continue
+            data = np.array(points)
+            positions, inverse = np.unique(data[:, 1], return_inverse=True)
+            if len(positions) < 2:
+                continue
+            steps = np.bincount(inverse, weights=data[:, 0]) / np.bincount(inverse)
+            maps[direction] = (positions, steps)
+        self._maps = maps
+        return maps
+
+    @property
+    def maps(self):
+        if self._maps is None:
+            self.fit()
+        return self._maps
+
+    @property
+    def backlash(self):
+        """Mean step difference between the forward and backward maps over their common range, 0 if unknown"""
+        maps = self.maps
+        if 1 not in maps or -1 not in maps:
+            return 0.
+        low = max(maps[1][0][0], maps[-1][0][0])
+        high = min(maps[1][0][-1], maps[-1][0][-1])
+        if high <= low:
+            return 0.
+        grid = np.linspace(low, high, 50)
+        return float(np.mean(self._interp(grid, *maps[1]) - self._interp(grid, *maps[-1])))
+
+    @staticmethod
+    def _interp(position, positions, steps):
+        """np.interp, extended outside the sampled range by the slope of a linear fit of the whole map"""
+        slope = np.polyfit(positions, steps, 1)[0]
+        value = np.interp(position, positions, steps)
+        value = np.where(position < positions[0], steps[0] + slope * (position - positions[0]), value)
+        return np.where(position > positions[-1], steps[-1] + slope * (position - positions[-1]), value)
+
+    def anchor(self, steps, position, direction=None):
+        """
+        Shift the step counts of the pairs so that the maps go through the current step count and ruler position
+        Parameters
+        ----------
+        steps: (int) current step count of the board
+        position: (float) ruler position read at this step count
+        direction: (int) direction of the last move if known, otherwise the maps of both directions are averaged
+            (the error being then at most half the backlash)
+        """
+        maps = self.maps
+        if direction is not None and (1 if direction > 0 else -1) in maps:
+            predicted = self._interp(position, *maps[1 if direction > 0 else -1])
+        elif maps:
+            predicted = np.mean([self._interp(position, *direction_map) for direction_map in maps.values()])
+        else:
+            predicted = None
+        if predicted is not None:
+            offset = float(steps - predicted)
+            for points in self.points.values():
+                shifted = [(point_steps + offset, point_position) for point_steps, point_position in points]
+                points.clear()
+                points.extend(shifted)
+            self._maps = None
+        self.anchored = True
+
+    def steps_for(self, position, direction):
+        """
+        Step count expected to land on position when approaching it in the given direction
+        Returns
+        -------
+        float: the step count, None if the calibration has not enough points or is not anchored
+        """
+        if not self.anchored:
+            return None
+        direction = 1 if direction >= 0 else -1
+        maps = self.maps
+        if direction in maps:
+            return float(self._interp(position, *maps[direction]))
+        if -direction in maps:  # the backlash is unknown until both directions are sampled
+            return float(self._interp(position, *maps[-direction]))
+        return None
+
+    def save(self, path):
+        with open(path, 'w') as fout:
+            json.dump(dict(max_points=self.max_points, forward=list(self.points[1]),
+                           backward=list(self.points[-1])), fout)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fin:
+            content = json.load(fin)
+        calibration = cls(content.get('max_points', 2000))
+        for steps, position in content['forward']:
+            calibration.record(steps, position, 1)
+        for steps, position in content['backward']:
+            calibration.record(steps, position, -1)
+        calibration.anchored = False  # the step counter of the board may have been reset since
+        return calibration
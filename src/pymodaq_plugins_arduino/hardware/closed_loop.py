@@ -0,0 +1,253 @@
+"""
+Closed loop positioning of the grating: the stepper is driven by incremental (non blocking) moves computed by a PID
+from the ruler reading, until the reading is within tolerance of the target or the iteration/time budget is exhausted.
+TwoPhasePositioner precedes this loop by a fast open loop slew for the large moves.
+"""
+
+import threading
+from collections import namedtuple
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from time import perf_counter
+
+ClosedLoopResult = namedtuple('ClosedLoopResult', ['converged', 'position', 'iterations', 'elapsed'])
+
+
+class ClosedLoopPositioner:
+    """
+    Bounded PID loop between an actuator (ActuatorWrapper like object exposing move_by and stop) and a position
+    reading function (for instance IK220.get_axis_position)
+
+    Parameters
+    ----------
+    actuator: (ActuatorWrapper) the stepper to drive
+    read_position: (callable) return the current position, in the units of the target
+    kp, ki, kd: (float) PID gains
+    output_scale: (float) number of steps sent to the stepper per unit of PID output
+    tolerance: (float) the loop converged when abs(target - position) <= tolerance
+    loop_rate: (float) rate (Hz) at which the position is read and corrections are computed
+    max_iterations: (int) maximum number of loop iterations
+    timeout: (float) maximum duration (s) of the loop
+    max_step: (int) maximum number of steps of a single correction, None for no limit
+    calibration: (StepCalibration) if given, the loop starts with the move predicted by the calibration (the PID
+        only correcting the residual) and the (steps, position) pair reached after each move is recorded in it
+    """
+
+    def __init__(self, actuator, read_position, kp=20., ki=0., kd=0., output_scale=100., tolerance=1.,
+                 loop_rate=100., max_iterations=1000, timeout=10., max_step=None, calibration=None):
+        self.actuator = actuator
+        self.read_position = read_position
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_scale = output_scale
+        self.tolerance = tolerance
+        self.loop_rate = loop_rate
+        self.max_iterations = max_iterations
+        self.timeout = timeout
+        self.max_step = max_step
+        self.calibration = calibration
+        self.feed_forward = calibration is not None  # use the calibration to predict the first move
+        # corrections against approach_side (1, -1, None for both ways) overshoot by backoff steps, so that the target
+        # is always reached moving in the same direction (same side of the backlash)
+        self.approach_side = None
+        self.backoff = 0
+        self._abort = threading.Event()
+        self._move = None  # pending open loop move, see move_to
+
+    def abort(self):
+        """Ask a running loop to stop at its next iteration, and stop a pending open loop move (thread safe)"""
+        self._abort.set()
+        move = self._move
+        if move is not None and not move.done():
+            self.actuator.stop()
+
+    def reset(self):
+        """
+        Clear a previous abort. Called by the caller before starting a move (in its thread), so that an abort sent
+        between the reset and the start of the loop is not lost
+        """
+        self._abort.clear()
+
+    @property
+    def aborted(self):
+        return self._abort.is_set()
+
+    def move_to(self, steps, timeout=None):
+        """
+        Open loop move to a step count, interrupted (and the motor stopped) by abort
+        Parameters
+        ----------
+        steps: (int) the target step count
+        timeout: (float) maximum duration (s) of the move, default to the move_timeout of the actuator
+
+        Returns
+        -------
+        bool: True if the move is completed, False if aborted or timed out
+        """
+        future = self.actuator.move_at(steps, wait=False)
+        self._move = future
+        try:
+            if self._abort.is_set():  # aborted before the move was registered
+                self.actuator.stop()
+            future.result(getattr(self.actuator, 'move_timeout', None) if timeout is None else timeout)
+            return True
+        except CancelledError:
+            return False
+        except FutureTimeoutError:
+            self.actuator.stop()
+            return False
+        finally:
+            self._move = None
+
+    def predicted_steps(self, target, position):
+        """
+        Step count predicted by the calibration to reach target from position (ruler reading), None if unknown. A
+        calibration loaded from a file is first anchored on the current step count of the board and on position
+        """
+        calibration = self.calibration
+        if calibration is None:
+            return None
+        if not calibration.anchored:
+            calibration.anchor(self.actuator.get_value(fresh=True), position)
+        return calibration.steps_for(target, target - position)
+
+    def _steps_from_control(self, control):
+        steps = round(control * self.output_scale)
+        if self.max_step is not None:
+            steps = max(-self.max_step, min(self.max_step, steps))
+        if self.approach_side is not None and steps * self.approach_side < 0:
+            steps -= self.approach_side * self.backoff
+        return steps
+
+    def run(self, target, callback=None):
+        """
+        Run the loop until convergence, abort, or exhaustion of the iteration/time budget. A previous abort is not
+        cleared, see reset
+        Parameters
+        ----------
+        target: (float) the position to reach
+        callback: (callable) called with the position read at each iteration
+
+        Returns
+        -------
+        ClosedLoopResult: (converged, position, iterations, elapsed)
+        """
+        from simple_pid import PID
+
+        pid = PID(self.kp, self.ki, self.kd, setpoint=target, sample_time=None)
+        period = 1. / self.loop_rate
+
+        start = perf_counter()
+        future = None
+        recorded = True  # the end of the last move has been recorded in the calibration
+        converged = False
+        iterations = 0
+        position = self.read_position()
+        if self.calibration is not None and self.feed_forward and abs(target - position) > self.tolerance:
+            steps = self.predicted_steps(target, position)
+            if steps is not None:
+                direction = 1 if target > position else -1
+                future = self.actuator.move_at(round(steps), wait=False)
+                recorded = False
+        while iterations < self.max_iterations:
+            tick = perf_counter()
+            if callback is not None:
+                callback(position)
+            moving = future is not None and not future.done()
+            if not moving and not recorded:
+                if not future.cancelled():
+                    position = self.read_position()  # the previous reading may predate the end of the move
+                    self.calibration.record(future.result(), position, direction)
+                recorded = True
+            if not moving and abs(target - position) <= self.tolerance:
+                converged = True
+                break
+            if self._abort.is_set() or tick - start > self.timeout:
+                break
+            if not moving:
+                steps = self._steps_from_control(pid(position))
+                if steps != 0:
+                    future = self.actuator.move_by(steps, wait=False)
+                    direction = 1 if steps > 0 else -1
+                    recorded = self.calibration is None
+            iterations += 1
+            if self._abort.wait(max(0., period - (perf_counter() - tick))):
+                break
+            position = self.read_position()
+
+        if future is not None and not future.done():
+            self.actuator.stop()
+        return ClosedLoopResult(converged, position, iterations, perf_counter() - start)
+
+
+class TwoPhasePositioner:
+    """
+    Two phase move: a fast open loop slew stopping short of the target on the approach side, then the fine closed
+    loop of a ClosedLoopPositioner at low speed and acceleration, its corrections always approaching from that side
+
+    Parameters
+    ----------
+    positioner: (ClosedLoopPositioner) the fine closed loop (sharing its actuator, position reading, calibration and
+        abort)
+    coarse_threshold: (float) errors (position units) above which the slew is done
+    approach_offset: (float) distance (position units) from the target at which the slew stops
+    approach_side: (int) 1 to approach the targets from below (increasing positions), -1 from above
+    steps_per_unit: (float) steps per position unit, used for the slew when the calibration cannot predict it
+    fast_profile: (tuple) (max speed, acceleration) of the slew, None to keep the current profile
+    fine_profile: (tuple) (max speed, acceleration) of the fine approach, None to keep the current profile
+    """
+
+    def __init__(self, positioner, coarse_threshold=1., approach_offset=0.1, approach_side=1, steps_per_unit=500.,
+                 fast_profile=None, fine_profile=None):
+        self.positioner = positioner
+        self.coarse_threshold = coarse_threshold
+        self.approach_offset = approach_offset
+        self.approach_side = approach_side
+        self.steps_per_unit = steps_per_unit
+        self.fast_profile = fast_profile
+        self.fine_profile = fine_profile
+
+    def abort(self):
+        self.positioner.abort()
+
+    def reset(self):
+        """See ClosedLoopPositioner.reset"""
+        self.positioner.reset()
+
+    def _set_profile(self, profile):
+        if profile is not None:
+            self.positioner.actuator.max_speed_set(profile[0])
+            self.positioner.actuator.accel_set(profile[1])
+
+    def _slew_steps(self, target, position):
+        steps = self.positioner.predicted_steps(target, position)
+        if steps is not None:
+            return round(steps)
+        return round(self.positioner.actuator.get_value() + (target - position) * self.steps_per_unit)
+
+    def run(self, target, callback=None):
+        """
+        Returns
+        -------
+        ClosedLoopResult: (converged, position, iterations of the fine phase, elapsed time of both phases)
+        """
+        positioner = self.positioner
+        start = perf_counter()
+        position = positioner.read_position()
+        error = target - position
+        # slew for large errors, and when the target would otherwise be reached from the wrong side
+        if abs(error) > self.coarse_threshold or error * self.approach_side < 0:
+            slew_target = target - self.approach_side * self.approach_offset
+            self._set_profile(self.fast_profile)
+            if not positioner.move_to(self._slew_steps(slew_target, position)) and positioner.aborted:
+                return ClosedLoopResult(False, positioner.read_position(), 0, perf_counter() - start)
+
+        self._set_profile(self.fine_profile)
+        positioner.approach_side = self.approach_side
+        positioner.backoff = round(self.approach_offset * self.steps_per_unit)
+        try:
+            result = positioner.run(target, callback)
+        finally:
+            positioner.approach_side = None
+            self._set_profile(self.fast_profile)
+        return result._replace(elapsed=perf_counter() - start)
@@ -0,0 +1,123 @@
+"""
+Fly scans: a constant speed motion of a stepper during which an encoder axis is sampled at a fixed rate, replacing
+the step-settle-read cycles of a stepped scan by a single sweep
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from time import perf_counter, sleep
+
+import numpy as np
+
+from pymodaq_plugins_arduino.hardware.arduino_wrapper import StepperAxis
+from pymodaq_plugins_arduino.hardware.sampler import EncoderSampler
+
+logger = logging.getLogger(__name__)
+
+# timestamps: (ndarray) time (s) of the samples relative to the start of the sweep
+# positions: (ndarray) ruler readings, aligned with timestamps
+# steps: (ndarray) commanded stepper position at each timestamp (constant speed model of the sweep)
+# start_time: (float) perf_counter time at which the sweep was sent
+# duration: (float) time (s) between the start of the sweep and its completion callback
+# completed: (bool) False if the sweep has been stopped or timed out
+FlyScanResult = namedtuple('FlyScanResult', ['timestamps', 'positions', 'steps', 'start_time', 'duration',
+                                             'completed'])
+
+
+class FlyScan:
+    """
+    Constant speed sweep of a stepper axis while a ruler axis is sampled in the background
+
+    Parameters
+    ----------
+    actuator: (ActuatorWrapper) the stepper board
+    ruler: (IK220) the ruler card
+    ruler_axis: (int) the sampled ruler axis
+    rate: (float) sampling rate (Hz)
+    settle: (float) time (s) sampled before and after the sweep
+    axis: (str) name of the stepper axis, default to the current one
+    """
+
+    def __init__(self, actuator, ruler, ruler_axis=1, rate=1000., settle=0.05, axis=None):
+        self.actuator = actuator
+        self.ruler = ruler
+        self.ruler_axis = ruler_axis
+        self.rate = rate
+        self.settle = settle
+        self.axis = axis
+        self._abort = threading.Event()
+
+    def abort(self):
+        """Stop the running scan (from another thread)"""
+        self._abort.set()
+        self.actuator.stop(axis=self.axis)
+
+    def reset(self):
+        """Clear a previous abort, see ClosedLoopPositioner.reset"""
+        self._abort.clear()
+
+    def run(self, start, stop, speed, max_speed=None, timeout=None):
+        """
+        Move to start, then sweep to stop at constant speed while sampling the ruler. A previous abort is not
+        cleared, see reset
+        Parameters
+        ----------
+        start: (float) start of the sweep (steps), reached with the accelerated profile
+        stop: (float) end of the sweep (steps)
+        speed: (int) speed of the sweep (steps/s), within 1 and arduino_wrapper.SPEED_LIMIT
+        max_speed: (int) max speed configured on the stepper. AccelStepper clips the speed to it, so it is raised
+            to speed (hence never above SPEED_LIMIT) during the sweep and restored afterwards
+        timeout: (float) maximum duration (s) of the sweep, default to twice its expected duration plus the
+            actuator move_timeout
+
+        Returns
+        -------
+        FlyScanResult
+        """
+        if speed <= 0:
+            raise ValueError('The speed of a fly scan must be positive')
+        speed = StepperAxis.check_speed(speed)
+        self.actuator.move_at(start, axis=self.axis)
+        if self._abort.is_set():
+            return FlyScanResult(np.zeros(0), np.zeros(0), np.zeros(0), perf_counter(), 0., False)
+        expected = abs(stop - start) / speed
+        if timeout is None:
+            timeout = 2 * expected + self.actuator.move_timeout
+        size = int((expected + 2 * self.settle) * self.rate * 1.5) + 100
+        sampler = EncoderSampler(self.ruler.read_axes, [self.ruler_axis], rate=self.rate, size=size)
+        raise_speed = max_speed is not None and speed > max_speed
+
+        sampler.start()
+        try:
+            sleep(self.settle)
+            if raise_speed:
+                self.actuator.max_speed_set(speed, axis=self.axis)
+            start_time = perf_counter()
+            move = self.actuator.move_at(stop, wait=False, speed=speed, axis=self.axis)
+            try:
+                if self._abort.is_set():  # aborted while the sampler was starting
+                    self.actuator.stop(axis=self.axis)
+                move.result(timeout)
+                completed = True
+            except CancelledError:  # stopped
+                completed = False
+            except FutureTimeoutError:
+                self.actuator.stop(axis=self.axis)
+                completed = False
+                logger.warning('Fly scan to %s not completed after %s s', stop, timeout)
+            duration = perf_counter() - start_time
+            sleep(self.settle)
+        finally:
+            sampler.stop()
+            if raise_speed:
+                self.actuator.max_speed_set(max_speed, axis=self.axis)
+
+        if sampler.buffer.count > sampler.buffer.size:
+            logger.warning('Fly scan sampler overflow, only the last %d samples are kept', sampler.buffer.size)
+        timestamps, positions, status, alarm = sampler.buffer.last(sampler.buffer.count)
+        timestamps = timestamps - start_time
+        direction = 1 if stop >= start else -1
+        steps = start + direction * speed * np.clip(timestamps, 0, abs(stop - start) / speed)
+        return FlyScanResult(timestamps, positions[:, 0], steps, start_time, duration, completed)
@@ -0,0 +1,206 @@
+"""
+Headless PID: the ruler and the stepper are wired straight into the convert_input / convert_output methods of a PID
+model, the loop running on a fixed period scheduler instead of the event loop of the PyMoDAQ PID GUI
+
+usage: python -m pymodaq_plugins_arduino.models.PIDModelGrating --headless --port COM5 --setpoint 17000
+"""
+
+import argparse
+import logging
+import threading
+from time import perf_counter
+
+from pymodaq_plugins_arduino.hardware.instrumentation import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class FixedPeriodScheduler:
+    """
+    Ticks at start + k * period. A tick is missed when the previous one overran its deadline: the missed deadlines
+    are skipped (no burst of late ticks) and counted
+
+    Parameters
+    ----------
+    period: (float) period (s) of the ticks
+    stop_event: (threading.Event) interrupt the waits when set
+    """
+
+    def __init__(self, period, stop_event=None):
+        self.period = period
+        self.stop_event = threading.Event() if stop_event is None else stop_event
+        self.ticks = 0
+        self.missed = 0
+        self.lateness = LatencyStats()  # delay between the deadlines and the actual ticks
+        self._next = None
+
+    def start(self):
+        self._next = perf_counter()
+        self.ticks = 0
+        self.missed = 0
+        self.lateness = LatencyStats()
+
+    def wait(self):
+        """
+        Wait for the next deadline
+        Returns
+        -------
+        bool: False if the scheduler has been stopped
+        """
+        self._next += self.period
+        now = perf_counter()
+        if now > self._next + self.period:  # overran at least one whole period
+            skipped = int((now - self._next) / self.period)
+            self.missed += skipped
+            self._next += skipped * self.period
+        delay = self._next - now
+        if delay > 0 and self.stop_event.wait(delay):
+            return False
+        self.lateness.add(max(0., perf_counter() - self._next))
+        self.ticks += 1
+        return not self.stop_event.is_set()
+
+    def statistics(self):
+        return dict(ticks=self.ticks, missed=self.missed, **{f'lateness_{key}': value for key, value in
+                                                             self.lateness.as_dict().items() if key != 'histogram'})
+
+
+class HeadlessPID:
+    """
+    Hold a setpoint with a PID model without the PyMoDAQ GUI
+
+    The model is built by its headless classmethod (see PIDModelGrating.headless). At each tick the ruler position is
+    converted to the setpoint units with the calibration and fed to convert_input as the viewer data would be, the PID
+    output goes through convert_output and its relative value is sent to the stepper (if the previous move is done).
+
+    Parameters
+    ----------
+    model_class: (type) a PID model class of this package exposing a headless classmethod
+    actuator: (ActuatorWrapper) the opened stepper board
+    ruler: (EncoderBase) the ruler card
+    setpoint: (float) the setpoint (model units, ex: wavenumber)
+    calibration: (RulerCalibration) conversion of the ruler positions, None to feed the raw positions
+    ruler_axis: (int) the ruler axis
+    period: (float) period (s) of the loop
+    log_interval: (float) interval (s) between two logs of the loop statistics
+    """
+
+    def __init__(self, model_class, actuator, ruler, setpoint, calibration=None, ruler_axis=1, period=0.01,
+                 log_interval=60.):
+        self.model = model_class.headless(setpoints=[setpoint])
+        self.actuator = actuator
+        self.ruler = ruler
+        self.calibration = calibration
+        self.ruler_axis = ruler_axis
+        self.log_interval = log_interval
+        self.scheduler = FixedPeriodScheduler(period)
+        self.work = LatencyStats()  # duration of the loop body
+        self.moves = 0
+        # same structure as the measurements of the PID module, the inner dict is updated in place at each tick
+        self._channel = dict(data=0.)
+        detector = model_class.detectors_name[0]
+        self._measurements = {detector: {'data0D': {f'{detector}_{detector}_CH000': self._channel}}}
+
+    @property
+    def setpoint(self):
+        return self.model.pid_controller.setpoints[0]
+
+    @setpoint.setter
+    def setpoint(self, value):
+        self.model.pid_controller.setpoints[0] = value
+
+    def stop(self):
+        """Stop the loop (thread safe)"""
+        self.scheduler.stop_event.set()
+
+    def read(self):
+        position = self.ruler.get_axis_position(self.ruler_axis)
+        return position if self.calibration is None else self.calibration.convert(position)
+
+    def statistics(self):
+        return dict(moves=self.moves, work_mean=self.work.as_dict()['mean'], work_max=self.work.max,
+                    **self.scheduler.statistics())
+
+    def log_statistics(self):
+        stats = self.statistics()
+        logger.info('%d ticks, %d missed deadlines, %d moves, lateness p99 < %.3f ms (max %.3f ms), '
+                    'loop body mean %.3f ms (max %.3f ms)', stats['ticks'], stats['missed'], stats['moves'],
+                    1e3 * stats['lateness_p99'], 1e3 * stats['lateness_max'], 1e3 * stats['work_mean'],
+                    1e3 * stats['work_max'])
+
+    def run(self, duration=None):
+        """
+        Run the loop until stop is called (or for duration s)
+        Returns
+        -------
+        dict: the loop statistics
+        """
+        from simple_pid import PID
+
+        konstants = self.model.konstants
+        pid = PID(konstants['kp'], konstants['ki'], konstants['kd'], setpoint=self.setpoint, sample_time=None)
+        limits = self.model.limits
+        pid.output_limits = (limits['min']['value'] if limits['min']['state'] else None,
+                             limits['max']['value'] if limits['max']['state'] else None)
+
+        self.scheduler.stop_event.clear()
+        self.scheduler.start()
+        start = last_log = perf_counter()
+        last_tick = start
+        future = None
+        while self.scheduler.wait():
+            tick = perf_counter()
+            self._channel['data'] = self.read()
+            model_input = self.model.convert_input(self._measurements)
+            pid.setpoint = self.setpoint
+            output = pid(model_input.values[0])
+            command = self.model.convert_output([output], tick - last_tick)
+            last_tick = tick
+            steps = command.values[0]
+            if steps and (future is None or future.done()):
+                future = self.actuator.move_by(steps, wait=False)
+                self.moves += 1
+            self.work.add(perf_counter() - tick)
+
+            if tick - last_log > self.log_interval:
+                self.log_statistics()
+                last_log = tick
+            if duration is not None and tick - start > duration:
+                break
+
+        if future is not None and not future.done():
+            self.actuator.stop()
+        self.log_statistics()
+        return self.statistics()
+
+
+def main(model_class, argv=None):
+    """Command line entry of the headless PID, see the __main__ of the models"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--headless', action='store_true', help='run without the PID GUI')
+    parser.add_argument('--port', default='COM5', help='serial port of the stepper board ("simulated" to simulate)')
+    parser.add_argument('--setpoint', type=float, required=True, help='setpoint, in the model units')
+    parser.add_argument('--ruler-axis', type=int, default=1)
+    parser.add_argument('--period', type=float, default=0.01, help='loop period (s)')
+    parser.add_argument('--duration', type=float, help='run duration (s), until Ctrl-C if not given')
+    parser.add_argument('--laser-wavelength', type=float, default=457., help='(nm)')
+    parser.add_argument('--correction', type=float, default=5905.)
+    parser.add_argument('--log-interval', type=float, default=60., help='interval (s) between two statistics logs')
+    args = parser.parse_args(argv)
+
+    from pymodaq_plugins_arduino.hardware.backends import create_actuator, create_encoder, is_simulated
+    from pymodaq_plugins_arduino.hardware.ruler_wrapper import RulerCalibration
+
+    logging.basicConfig(level=logging.INFO)
+    actuator = create_actuator(args.port)
+    ruler = create_encoder(simulated=is_simulated(args.port))
+    runner = HeadlessPID(model_class, actuator, ruler, args.setpoint,
+                         calibration=RulerCalibration(args.correction, args.laser_wavelength),
+                         ruler_axis=args.ruler_axis, period=args.period, log_interval=args.log_interval)
+    try:
+        runner.run(args.duration)
+    except KeyboardInterrupt:
+        runner.log_statistics()
+    finally:
+        actuator.stop_all()
+        actuator.close_communication()
@@ -0,0 +1,170 @@
+"""
+Opt-in instrumentation of the hot paths: call counts and latency histograms of the decorated methods, and the log
+level of the hardware modules
+
+When disabled, an instrumented method only costs an extra function call and a boolean test.
+"""
+
+import functools
+import json
+import logging
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+LOGGER_NAME = 'pymodaq_plugins_arduino'
+logger = logging.getLogger(LOGGER_NAME)
+
+# upper edges (s) of the histogram buckets: 4 per decade from 1 µs to 10 s, plus an overflow bucket
+BUCKET_EDGES = [1e-6 * 10 ** (ind / 4) for ind in range(29)]
+
+# parameters added to the settings of the plugins, see commit_param
+params = [{'title': 'Instrumentation:', 'name': 'instrumentation', 'type': 'group', 'expanded': False, 'children': [
+    {'title': 'Log level:', 'name': 'log_level', 'type': 'list', 'value': 'WARNING',
+     'limits': ['DEBUG', 'INFO', 'WARNING', 'ERROR']},
+    {'title': 'Timing enabled:', 'name': 'timing_on', 'type': 'bool', 'value': False,
+     'tip': 'Record call counts and latencies of the hot paths'},
+    {'title': 'Snapshot:', 'name': 'snapshot', 'type': 'bool_push', 'value': False,
+     'tip': 'Show (and log) the current statistics'},
+    {'title': 'Reset:', 'name': 'reset', 'type': 'bool_push', 'value': False},
+    {'title': 'Statistics:', 'name': 'stats', 'type': 'text', 'value': '', 'readonly': True},
+]}]
+
+
+class LatencyStats:
+    """Call count, extrema and log-spaced histogram of durations (s)"""
+    __slots__ = ('count', 'total', 'min', 'max', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = float('inf')
+        self.max = 0.
+        self.histogram = [0] * (len(BUCKET_EDGES) + 1)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        self.histogram[bisect_left(BUCKET_EDGES, duration)] += 1
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket containing the given fraction of the calls (bounded by the max)"""
+        threshold = fraction * self.count
+        cumulated = 0
+        for ind, count in enumerate(self.histogram):
+            cumulated += count
+            if cumulated >= threshold:
+                return min(BUCKET_EDGES[ind], self.max) if ind < len(BUCKET_EDGES) else self.max
+        return self.max
+
+    def as_dict(self):
+        return dict(count=self.count, mean=self.total / self.count if self.count else 0., min=self.min,
+                    max=self.max, p50=self.percentile(0.5), p90=self.percentile(0.9), p99=self.percentile(0.99),
+                    histogram=list(self.histogram))
+
+
+class Instrumentation:
+    """Registry of the timing statistics, keyed by the name of the instrumented methods"""
+
+    def __init__(self):
+        self.enabled = False
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = LatencyStats()
+            stats.add(duration)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def snapshot(self):
+        """
+        Returns
+        -------
+        dict: name: dict(count, mean, min, max, p50, p90, p99, histogram), durations in s, the histogram counts
+            being those of the buckets whose upper edges are BUCKET_EDGES (the last one counting the longer calls)
+        """
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def summary(self):
+        """Human readable table of the snapshot"""
+        lines = []
+        for name, stats in sorted(self.snapshot().items()):
+            lines.append(f'{name}: {stats["count"]} calls, mean {1e3 * stats["mean"]:.3f} ms, '
+                         f'p50 < {1e3 * stats["p50"]:.3f} ms, p99 < {1e3 * stats["p99"]:.3f} ms, '
+                         f'max {1e3 * stats["max"]:.3f} ms')
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """Write the snapshot as json"""
+        with open(path, 'w') as fout:
+            json.dump(dict(bucket_edges=BUCKET_EDGES, stats=self.snapshot()), fout, indent=2)
+
+
+instrumentation = Instrumentation()
+
+
+def instrumented(name=None):
+    """
+    Decorator recording the duration of each call of the decorated function when the instrumentation is enabled
+    Parameters
+    ----------
+    name: (str) key of the statistics, default to the qualified name of the function
+    """
+    def decorator(func):
+        key = func.__qualname__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                instrumentation.record(key, perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def set_log_level(level):
+    """Set the level (name or value) of the loggers of this package"""
+    logger.setLevel(level)
+
+
+def commit_param(param, group):
+    """
+    Apply a change of one of the instrumentation params (see params)
+    Parameters
+    ----------
+    param: (Parameter) the changed parameter
+    group: (Parameter) the instrumentation group of the settings
+
+    Returns
+    -------
+    bool: True if param was one of the instrumentation params
+    """
+    if param.parent() is None or param.parent().name() != 'instrumentation':
+        return False
+    if param.name() == 'log_level':
+        set_log_level(param.value())
+    elif param.name() == 'timing_on':
+        instrumentation.enabled = param.value()
+    elif param.name() == 'snapshot':
+        summary = instrumentation.summary()
+        group.child('stats').setValue(summary)
+        logger.info('Instrumentation snapshot:\n%s', summary)
+    elif param.name() == 'reset':
+        instrumentation.reset()
+        group.child('stats').setValue('')
+    return True
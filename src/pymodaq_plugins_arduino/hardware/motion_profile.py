@@ -0,0 +1,92 @@
+"""
+Motion profiles of the steppers: duration of the AccelStepper trapezoidal moves, and a planner choosing the max speed
+and acceleration of each move from its distance so that it is as short as the motor allows
+"""
+
+import math
+from collections import namedtuple
+
+# max_speed (steps/s), acceleration (steps/s2), duration (s) predicted for the move
+MoveProfile = namedtuple('MoveProfile', ['max_speed', 'acceleration', 'duration'])
+
+
+def trapezoid_duration(distance, max_speed, acceleration):
+    """
+    Duration (s) of an AccelStepper move of distance steps: ramp up at acceleration, cruise at max_speed (if reached)
+    and ramp down
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.
+    if distance * acceleration >= max_speed ** 2:  # max speed is reached
+        return distance / max_speed + max_speed / acceleration
+    return 2 * math.sqrt(distance / acceleration)
+
+
+class MotionPlanner:
+    """
+    Choose the (max speed, acceleration) pair minimising the duration of a move within the configured limits
+
+    The motor model is a linear torque-speed curve: the acceleration available when cruising at a speed v is
+    accel_limit * (1 - v / stall_speed), so short moves are faster with a lower cruise speed and a stronger
+    acceleration, long ones with the highest speed. With no stall speed (constant torque) the limits are always used.
+
+    Parameters
+    ----------
+    speed_limit: (float) maximum speed (steps/s)
+    accel_limit: (float) maximum acceleration (steps/s2)
+    stall_speed: (float) speed (steps/s) at which the motor has no torque left, None for a constant torque motor
+    n_candidates: (int) number of cruise speeds tried between speed_limit / n_candidates and speed_limit
+    """
+
+    def __init__(self, speed_limit=1000., accel_limit=200., stall_speed=None, n_candidates=20):
+        self.speed_limit = speed_limit
+        self.accel_limit = accel_limit
+        self.stall_speed = stall_speed
+        self.n_candidates = n_candidates
+        self._cache = dict()  # distance: MoveProfile
+
+    def configure(self, speed_limit=None, accel_limit=None, stall_speed=None):
+        if speed_limit is not None:
+            self.speed_limit = speed_limit
+        if accel_limit is not None:
+            self.accel_limit = accel_limit
+        self.stall_speed = stall_speed if stall_speed else None
+        self._cache.clear()
+
+    def available_acceleration(self, speed):
+        if self.stall_speed is None:
+            return self.accel_limit
+        return self.accel_limit * max(0., 1 - speed / self.stall_speed)
+
+    def plan(self, distance):
+        """
+        Returns
+        -------
+        MoveProfile: the fastest profile for a move of distance steps
+        """
+        distance = abs(round(distance))
+        profile = self._cache.get(distance)
+        if profile is not None:
+            return profile
+        if self.stall_speed is None:
+            profile = MoveProfile(self.speed_limit, self.accel_limit,
+                                  trapezoid_duration(distance, self.speed_limit, self.accel_limit))
+        else:
+            profile = None
+            for ind in range(1, self.n_candidates + 1):
+                speed = self.speed_limit * ind / self.n_candidates
+                acceleration = self.available_acceleration(speed)
+                if acceleration <= 0:  # at or above the stall speed
+                    break
+                duration = trapezoid_duration(distance, speed, acceleration)
+                if profile is None or duration < profile.duration:
+                    profile = MoveProfile(speed, acceleration, duration)
+            if profile is None:  # stall speed below the first candidate: crawl at half of it
+                speed = self.stall_speed / 2
+                profile = MoveProfile(speed, self.available_acceleration(speed),
+                                      trapezoid_duration(distance, speed, self.available_acceleration(speed)))
+        if len(self._cache) > 10000:
+            self._cache.clear()
+        self._cache[distance] = profile
+        return profile
@@ -0,0 +1,81 @@
+"""
+Shaping of the PID outputs sent to the stepper as relative moves: gain scheduling on the error size, deadband, clamp
+of the step size per tick and minimum interval between two commands. Used by the PID models of this package.
+"""
+
+from time import perf_counter
+
+# parameters of the PID models, see OutputShaper.update_from_settings
+params = [{'title': 'Output shaping:', 'name': 'output_shaping', 'type': 'group', 'children': [
+    {'title': 'Coarse threshold:', 'name': 'coarse_threshold', 'type': 'float', 'value': 5., 'min': 0.,
+     'tip': 'Errors larger than this (setpoint units) use the coarse gain, smaller ones the fine gain'},
+    {'title': 'Coarse gain:', 'name': 'coarse_gain', 'type': 'float', 'value': 1.,
+     'tip': 'Multiplier of the PID output for large errors'},
+    {'title': 'Fine gain:', 'name': 'fine_gain', 'type': 'float', 'value': 0.3,
+     'tip': 'Multiplier of the PID output for small errors'},
+    {'title': 'Deadband:', 'name': 'deadband', 'type': 'float', 'value': 0.05, 'min': 0.,
+     'tip': 'No move is sent for errors smaller than this (setpoint units)'},
+    {'title': 'Max steps per tick:', 'name': 'max_step', 'type': 'int', 'value': 2000, 'min': 1},
+    {'title': 'Min command interval (s):', 'name': 'min_interval', 'type': 'float', 'value': 0.05, 'min': 0.,
+     'tip': 'Outputs computed less than this after the previous command are dropped'},
+]}]
+
+
+class OutputShaper:
+    """
+    Turn a PID output into the number of steps of a relative move
+
+    The gains are applied as multipliers of the PID output, so that they can be scheduled without retuning the PID
+    itself (for a proportional only PID, the effective kp is kp * gain). Moves of less than one step are not sent.
+
+    Parameters
+    ----------
+    coarse_threshold: (float) error above which coarse_gain is used
+    coarse_gain: (float) output multiplier for large errors
+    fine_gain: (float) output multiplier for small errors
+    deadband: (float) errors smaller than this give no move
+    max_step: (int) maximum number of steps per command
+    min_interval: (float) minimum time (s) between two non zero commands
+    """
+
+    def __init__(self, coarse_threshold=5., coarse_gain=1., fine_gain=0.3, deadband=0.05, max_step=2000,
+                 min_interval=0.05):
+        self.coarse_threshold = coarse_threshold
+        self.coarse_gain = coarse_gain
+        self.fine_gain = fine_gain
+        self.deadband = deadband
+        self.max_step = max_step
+        self.min_interval = min_interval
+        self._last_command = None
+
+    def update_from_settings(self, settings):
+        """Copy the values of the output_shaping group (see params)"""
+        for child in settings.child('output_shaping').children():
+            setattr(self, child.name(), child.value())
+
+    def reset(self):
+        self._last_command = None
+
+    def shape(self, output, error, now=None):
+        """
+        Parameters
+        ----------
+        output: (float) the PID output
+        error: (float) setpoint minus the current input
+        now: (float) perf_counter time of the tick
+
+        Returns
+        -------
+        int: the number of steps to move, 0 if nothing should be sent
+        """
+        if abs(error) < self.deadband:
+            return 0
+        if now is None:
+            now = perf_counter()
+        if self._last_command is not None and now - self._last_command < self.min_interval:
+            return 0
+        gain = self.coarse_gain if abs(error) > self.coarse_threshold else self.fine_gain
+        steps = round(max(-self.max_step, min(self.max_step, gain * output)))
+        if steps != 0:
+            self._last_command = now
+        return steps
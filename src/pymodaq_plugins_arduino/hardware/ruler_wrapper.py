@@ -2,27 +2,105 @@
 Wrapper for grating movement using Arduino
 """
 
+import logging
 import os
 import platform
 import sys
-from ctypes import c_ulong, c_double, c_ushort
+from ctypes import c_ulong, c_double, c_ushort, sizeof
 from ctypes import cdll, byref
 
+import numpy as np
+
+from pymodaq_plugins_arduino.hardware.base import EncoderBase
+
+logger = logging.getLogger(__name__)
+
 is_64bits = sys.maxsize > 2 ** 32
 
 
-class IK220:
+class RulerCalibration:
+    """
+    Conversion of the ruler positions into wavenumbers: position + correction - 1e7 / laser_wavelength
+
+    The offset is computed once when the correction or the laser wavelength changes, convert works on scalars as
+    well as on arrays of raw positions
+
+    Parameters
+    ----------
+    correction: (float) calibration correction in cm-1
+    laser_wavelength: (float) excitation wavelength in nm
+    """
+
+    def __init__(self, correction=5905., laser_wavelength=457.):
+        self._correction = correction
+        self._laser_wavelength = laser_wavelength
+        self._update_offset()
+
+    @property
+    def correction(self):
+        return self._correction
+
+    @correction.setter
+    def correction(self, value):
+        self._correction = value
+        self._update_offset()
+
+    @property
+    def laser_wavelength(self):
+        return self._laser_wavelength
+
+    @laser_wavelength.setter
+    def laser_wavelength(self, value):
+        self._laser_wavelength = value
+        self._update_offset()
+
+    def _update_offset(self):
+        self.offset = self._correction - 1e7 / self._laser_wavelength
+
+    def convert(self, positions):
+        """
+        Parameters
+        ----------
+        positions: (float or ndarray) raw ruler positions (as returned by IK220)
+
+        Returns
+        -------
+        float or ndarray: the corresponding wavenumbers
+        """
+        return positions + self.offset
+
+    def inverse(self, wavenumbers):
+        """Raw ruler positions corresponding to the given wavenumbers"""
+        return wavenumbers - self.offset
+
+
+class IK220(EncoderBase):
     """
     Wrapper to the Heidenhain dll
     """
     units = 'cm'
 
-    def __init__(self, dllpath="C:\\Program Files (x86)\\HEIDENHAIN\\DLL64"):
-        """Initialize device"""
+    def __init__(self, dllpath="C:\\Program Files (x86)\\HEIDENHAIN\\DLL64", dll=None):
+        """Initialize device
+
+        Parameters
+        ----------
+        dllpath: (str) folder of the Heidenhain dll
+        dll: (object) already loaded library to use instead of the Heidenhain dll (for instance a SimulatedIK220Dll)
+        """
+        super().__init__()
         self.dll = None
-        self.axis = []
         self.pStatus = c_ushort()
         self.pAlarm = c_ushort()
+        # preallocated dll output buffers (one slot per possible axis), with numpy views sharing their memory
+        self._p_data = (c_double * 16)()
+        self._p_status = (c_ushort * 16)()
+        self._p_alarm = (c_ushort * 16)()
+        self._data = np.ctypeslib.as_array(self._p_data)
+        self._status = np.ctypeslib.as_array(self._p_status)
+        self._alarm = np.ctypeslib.as_array(self._p_alarm)
+        self._refs = [(byref(self._p_status, ind * sizeof(c_ushort)), byref(self._p_data, ind * sizeof(c_double)),
+                       byref(self._p_alarm, ind * sizeof(c_ushort))) for ind in range(16)]
         if not dllpath:
             dllpath = 'C:\\Program Files (x86)\\HEIDENHAIN'
             if is_64bits:
@@ -32,16 +110,18 @@ class IK220:
                     dllpath = os.path.join(dllpath, 'DLL')
         try:
             # Check operating system and load library
-            if platform.system() == "Windows":
+            if dll is not None:
+                self.dll = dll
+            elif platform.system() == "Windows":
                 if is_64bits:
                     dllname = os.path.join(dllpath, "IK220Dll64")
-                    # print(dllname)
+                    logger.debug('Loading %s', dllname)
                     self.dll = cdll.LoadLibrary(dllname)
                 else:
                     dllname = os.path.join(dllpath, "IK220Dll")
                     self.dll = cdll.LoadLibrary(dllname)
             else:
-                print("Cannot detect operating system, will now stop")
+                logger.error("Cannot detect operating system, will now stop")
                 raise Exception("Cannot detect operating system, will now stop")
         except Exception as e:
             raise Exception("error while initialising hein libraries. " + str(e))
@@ -80,18 +160,31 @@ class IK220:
                 pass
         return f'Axis {self.axis} are present'
 
-    def get_axis_position(self, axis):
+    def read_axis(self, axis):
         """
-        :return: the absolute position deduced from one period.
-        To obtain the real value in cm^{-1} this result has to be multiplied by a factor 2.
-        Finally, as our goal is t reach a resolution of 0.1 cm^{-1} (i.e. 1µm),
-        the obtained result is rounded
+        Raw reading of one axis from the dll
+        Returns
+        -------
+        tuple: (position, status, alarm), the position being already multiplied by 2 (see get_axis_position)
+        """
+        self.dll.IK220ReadEn(axis, *self._refs[axis])
+        return self._data[axis] * 2, self._status[axis], self._alarm[axis]
 
-        Input:
-            None
-        Output:
+    def read_axes(self, axes=None):
+        """
+        Raw reading of several axes in one pass, reusing preallocated dll buffers
+        Parameters
+        ----------
+        axes: (list of int) the axes to read, default to all the present axes
 
+        Returns
+        -------
+        tuple of ndarray: (positions, status, alarm) one entry per axis, positions already multiplied by 2
         """
-        p_data = c_double()
-        self.dll.IK220ReadEn(axis, byref(self.pStatus), byref(p_data), byref(self.pAlarm))
-        return round(p_data.value * 2, 3)
+        if axes is None:
+            axes = self.axis
+        read = self.dll.IK220ReadEn
+        refs = self._refs
+        for axis in axes:
+            read(axis, *refs[axis])
+        return self._data[axes] * 2, self._status[axes], self._alarm[axes]
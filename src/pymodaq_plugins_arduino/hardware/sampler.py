@@ -0,0 +1,149 @@
+"""
+Background acquisition of encoder positions at a fixed rate into a preallocated ring buffer
+"""
+
+import threading
+from time import perf_counter, sleep
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed size buffer of timestamped samples, written by a single thread and read without any lock
+
+    Each entry holds a timestamp (perf_counter, in s) and, for each sampled axis, a position, a status and an alarm
+    value. The sample counter is only incremented once an entry is fully written, so readers never get a partially
+    written sample as long as they do not ask for more than the buffer size.
+
+    Parameters
+    ----------
+    size: (int) number of entries of the buffer
+    n_axes: (int) number of axes stored in each entry
+    """
+
+    def __init__(self, size=10000, n_axes=1):
+        self.size = size
+        self.n_axes = n_axes
+        self.timestamps = np.zeros(size)
+        self.positions = np.zeros((size, n_axes))
+        self.status = np.zeros((size, n_axes), dtype=np.uint16)
+        self.alarm = np.zeros((size, n_axes), dtype=np.uint16)
+        self.count = 0  # total number of samples written since creation
+
+    def append(self, timestamp, positions, status, alarm):
+        index = self.count % self.size
+        self.timestamps[index] = timestamp
+        self.positions[index] = positions
+        self.status[index] = status
+        self.alarm[index] = alarm
+        self.count += 1
+
+    def latest(self):
+        """
+        Returns
+        -------
+        tuple: (timestamp, positions, status, alarm) of the most recent sample, None if the buffer is empty
+        """
+        count = self.count
+        if count == 0:
+            return None
+        index = (count - 1) % self.size
+        return self.timestamps[index], self.positions[index].copy(), self.status[index].copy(), \
+            self.alarm[index].copy()
+
+    def last(self, n_samples):
+        """
+        Parameters
+        ----------
+        n_samples: (int) number of samples to return, clipped to the buffer size and to the number of written samples
+
+        Returns
+        -------
+        tuple of ndarray: (timestamps, positions, status, alarm), oldest sample first
+        """
+        return self._slice(self.count, n_samples)
+
+    def since(self, start):
+        """
+        Get all the samples written after the sample number start (a value of count returned by a previous call)
+
+        Returns
+        -------
+        tuple: (timestamps, positions, status, alarm, count), count to be used as start of the next call
+        """
+        count = self.count
+        return self._slice(count, count - start) + (count,)
+
+    def _slice(self, count, n_samples):
+        n_samples = max(0, min(n_samples, count, self.size))
+        indexes = np.arange(count - n_samples, count) % self.size
+        return self.timestamps[indexes], self.positions[indexes], self.status[indexes], self.alarm[indexes]
+
+
+class EncoderSampler:
+    """
+    Thread sampling a set of encoder axes at a fixed rate into a RingBuffer
+
+    Parameters
+    ----------
+    read: (callable) read(axes) returning (positions, status, alarm) arrays of the given axes, see IK220.read_axes
+    axes: (list of int) the axes to sample
+    rate: (float) sampling rate in Hz
+    size: (int) number of entries of the ring buffer
+    """
+
+    def __init__(self, read, axes, rate=1000., size=10000):
+        self.read = read
+        self.axes = list(axes)
+        self.rate = rate
+        self.buffer = RingBuffer(size, len(self.axes))
+        self._indexes = {axis: ind for ind, axis in enumerate(self.axes)}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout=1.):
+        """Start the acquisition thread and wait (at most timeout s) for the first sample"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        start = perf_counter()
+        while self.buffer.count == 0 and perf_counter() - start < timeout:
+            sleep(0.001)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def index(self, axis):
+        """Column of the given axis in the buffer"""
+        return self._indexes[axis]
+
+    def latest_position(self, axis):
+        """Most recent position of the given axis, None if nothing has been sampled yet"""
+        count = self.buffer.count
+        if count == 0:
+            return None
+        return self.buffer.positions[(count - 1) % self.buffer.size, self._indexes[axis]]
+
+    def _run(self):
+        period = 1. / self.rate
+        axes = self.axes
+        next_tick = perf_counter()
+        while not self._stop.is_set():
+            positions, status, alarm = self.read(axes)
+            self.buffer.append(perf_counter(), positions, status, alarm)
+            next_tick += period
+            delay = next_tick - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:  # late, do not try to catch up with a burst of samples
+                next_tick = perf_counter()
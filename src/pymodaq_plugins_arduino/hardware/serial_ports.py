@@ -0,0 +1,24 @@
+"""
+Lazy, cached enumeration of the serial ports, so that importing the plugins does not scan the USB devices
+"""
+
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT
+
+_ports = None
+
+
+def get_ports(refresh=False):
+    """
+    Parameters
+    ----------
+    refresh: (bool) if True, enumerate the ports again instead of returning the cached list
+
+    Returns
+    -------
+    list of str: the names of the serial ports present on the machine, plus the simulated port
+    """
+    global _ports
+    if _ports is None or refresh:
+        from serial.tools import list_ports
+        _ports = [str(port.name) for port in list_ports.comports()] + [SIMULATED_PORT]
+    return _ports
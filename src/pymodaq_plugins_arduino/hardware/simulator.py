@@ -0,0 +1,340 @@
+"""
+Software simulation of the hardware, to run the plugins, the PID model and the benchmarks without the bench setup
+
+* SimulatedTelemetrix is a drop-in replacement of telemetrix.Telemetrix for the stepper calls used by the wrappers,
+  with a trapezoidal (or constant speed) motion model and a configurable report latency. It is used by the
+  telemetrix pool for the port named SIMULATED_PORT.
+* SimulatedIK220Dll replaces the Heidenhain dll loaded by IK220 (IK220Find, IK220ReadEn and IK220ConfigEn). Its
+  functions are ctypes function pointers so that the arguments are marshalled exactly as with the real dll. By
+  default the simulated ruler follows the first stepper of the simulated board.
+"""
+
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from ctypes import CFUNCTYPE, POINTER, c_double, c_int, c_ulong, c_ushort, c_void_p, cast
+from time import perf_counter
+
+from pymodaq_plugins_arduino.hardware.base import StepperBoardBase
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT, pool
+
+# report ids of the telemetrix callbacks data (first element of the list)
+STEPPER_RUNNING_REPORT = 18
+STEPPER_RUN_COMPLETE_REPORT = 19
+STEPPER_CURRENT_POSITION = 17
+STEPPER_DISTANCE_TO_GO = 15
+STEPPER_TARGET_POSITION = 16
+
+
+def _check_int(method, value, low=None, high=None):
+    """Arguments as checked by telemetrix: integers (split into bytes), speeds and accelerations within a range"""
+    if not isinstance(value, int):
+        raise TypeError(f'{method}: {value!r} is not an integer')
+    if low is not None and not low <= value <= high:
+        raise RuntimeError(f'{method}: the range is {low} - {high}, not {value}')
+
+
+def _spin(duration):
+    """Busy wait, time.sleep being too coarse for latencies of a few tens of µs"""
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        pass
+
+
+class _Scheduler:
+    """Single thread calling functions at a given (perf_counter) time, in order, like the telemetrix report thread"""
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call_at(self, due, func, *args):
+        """
+        Returns
+        -------
+        list: handle of the call, see cancel
+        """
+        entry = [due, next(self._counter), func, args]
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            self._condition.notify()
+        return entry
+
+    def call_later(self, delay, func, *args):
+        return self.call_at(perf_counter() + delay, func, *args)
+
+    @staticmethod
+    def cancel(entry):
+        entry[2] = None
+
+    def shutdown(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._queue or self._queue[0][0] > perf_counter()):
+                    timeout = self._queue[0][0] - perf_counter() if self._queue else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                due, _, func, args = heapq.heappop(self._queue)
+            if func is not None:
+                func(*args)
+
+
+class _SimulatedStepper:
+    """
+    AccelStepper like motion model: a trapezoidal (or triangular) speed profile from the position at the start of
+    the motion to the target, or a constant speed motion
+    """
+
+    def __init__(self):
+        self.max_speed = 1000.
+        self.acceleration = 200.
+        self.speed = 0.
+        self.start_position = 0.
+        self.target = 0
+        self.start_time = 0.
+        self.duration = 0.
+        self.constant_speed = None  # speed of a constant speed motion, None for a trapezoidal profile
+        self.running = False
+        self.completion = None  # scheduler handle of the completion report
+
+    def plan(self, now, constant_speed=None):
+        self.start_position = self.position(now)
+        self.start_time = now
+        self.constant_speed = constant_speed
+        distance = abs(self.target - self.start_position)
+        if constant_speed is not None:
+            self.duration = distance / abs(constant_speed) if constant_speed else math.inf
+        elif distance * self.acceleration >= self.max_speed ** 2:  # cruise at max speed
+            self.duration = distance / self.max_speed + self.max_speed / self.acceleration
+        else:
+            self.duration = 2 * math.sqrt(distance / self.acceleration)
+        self.running = True
+        return self.duration
+
+    def position(self, now):
+        if not self.running:
+            return self.start_position
+        elapsed = now - self.start_time
+        if elapsed >= self.duration:
+            return float(self.target)
+        direction = 1 if self.target >= self.start_position else -1
+        if self.constant_speed is not None:
+            return self.start_position + direction * abs(self.constant_speed) * elapsed
+        distance = abs(self.target - self.start_position)
+        t_acc = min(self.max_speed / self.acceleration, self.duration / 2)
+        v_peak = self.acceleration * t_acc
+        if elapsed < t_acc:
+            travelled = 0.5 * self.acceleration * elapsed ** 2
+        elif elapsed < self.duration - t_acc:
+            travelled = 0.5 * self.acceleration * t_acc ** 2 + v_peak * (elapsed - t_acc)
+        else:
+            remaining = self.duration - elapsed
+            travelled = distance - 0.5 * self.acceleration * remaining ** 2
+        return self.start_position + direction * travelled
+
+    def halt(self, now):
+        self.start_position = round(self.position(now))
+        self.running = False
+
+
+class SimulatedTelemetrix(StepperBoardBase):
+    """
+    Drop-in replacement of telemetrix.Telemetrix for the stepper API. The arguments are checked as by telemetrix: a
+    TypeError is raised for non integer positions, speeds and accelerations, a RuntimeError for a speed out of
+    -1000..1000 or a max speed or acceleration out of 1..1000
+
+    Parameters
+    ----------
+    com_port: (str) ignored, kept for signature compatibility
+    arduino_wait: (float) simulated handshake duration (s), 0 by default
+    latency: (float) delay (s) between a request and its report callback, and between the end of a motion and its
+        completion callback
+    """
+
+    def __init__(self, com_port=SIMULATED_PORT, arduino_wait=0, latency=0.001):
+        self.com_port = com_port
+        self.latency = latency
+        self.steppers = []
+        self._lock = threading.Lock()
+        self._scheduler = _Scheduler()
+        if arduino_wait:
+            time.sleep(arduino_wait)
+
+    def set_pin_mode_stepper(self, interface=1, pin1=2, pin2=3, pin3=4, pin4=5, enable=True):
+        if len(self.steppers) >= 4:
+            raise RuntimeError('Maximum number of steppers has already been assigned')
+        self.steppers.append(_SimulatedStepper())
+        return len(self.steppers) - 1
+
+    def _report(self, callback, data):
+        if callback is not None:
+            self._scheduler.call_later(self.latency, callback, data)
+
+    def _complete(self, motor_id, completion_callback):
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            stepper.halt(perf_counter())
+            stepper.completion = None
+        if completion_callback is not None:
+            completion_callback([STEPPER_RUN_COMPLETE_REPORT, motor_id, time.time()])
+
+    def _start(self, motor_id, completion_callback, constant_speed=None):
+        now = perf_counter()
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            if stepper.completion is not None:
+                self._scheduler.cancel(stepper.completion)
+            duration = stepper.plan(now, constant_speed)
+            if math.isfinite(duration):
+                stepper.completion = self._scheduler.call_at(now + duration + self.latency, self._complete,
+                                                             motor_id, completion_callback)
+
+    def stepper_move_to(self, motor_id, position):
+        _check_int('stepper_move_to', position)
+        with self._lock:
+            self.steppers[motor_id].target = position
+
+    def stepper_move(self, motor_id, relative_position):
+        _check_int('stepper_move', relative_position)
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            stepper.target = int(round(stepper.position(perf_counter()))) + relative_position
+
+    def stepper_run(self, motor_id, completion_callback=None):
+        self._start(motor_id, completion_callback)
+
+    def stepper_run_speed_to_position(self, motor_id, completion_callback=None):
+        self._start(motor_id, completion_callback, constant_speed=self.steppers[motor_id].speed)
+
+    def stepper_set_speed(self, motor_id, speed):
+        _check_int('stepper_set_speed', speed, -1000, 1000)
+        self.steppers[motor_id].speed = speed
+
+    def stepper_set_max_speed(self, motor_id, max_speed):
+        _check_int('stepper_set_max_speed', max_speed, 1, 1000)
+        self.steppers[motor_id].max_speed = max_speed
+
+    def stepper_set_acceleration(self, motor_id, acceleration):
+        _check_int('stepper_set_acceleration', acceleration, 1, 1000)
+        self.steppers[motor_id].acceleration = acceleration
+
+    def stepper_set_current_position(self, motor_id, position):
+        _check_int('stepper_set_current_position', position)
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            stepper.halt(perf_counter())
+            stepper.start_position = position
+            stepper.target = position
+
+    def stepper_stop(self, motor_id):
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            if stepper.completion is not None:
+                self._scheduler.cancel(stepper.completion)
+                stepper.completion = None
+            stepper.halt(perf_counter())
+
+    def current_position(self, motor_id):
+        """Exact (not rounded) position of the motor, without any latency"""
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            return stepper.position(perf_counter())
+
+    def stepper_get_current_position(self, motor_id, current_position_callback):
+        position = int(round(self.current_position(motor_id)))
+        self._report(current_position_callback, [STEPPER_CURRENT_POSITION, motor_id, position, time.time()])
+
+    def stepper_is_running(self, motor_id, callback):
+        with self._lock:
+            stepper = self.steppers[motor_id]
+            running = int(stepper.running and perf_counter() - stepper.start_time < stepper.duration)
+        self._report(callback, [STEPPER_RUNNING_REPORT, motor_id, running, time.time()])
+
+    def stepper_get_distance_to_go(self, motor_id, distance_to_go_callback):
+        distance = self.steppers[motor_id].target - int(round(self.current_position(motor_id)))
+        self._report(distance_to_go_callback, [STEPPER_DISTANCE_TO_GO, motor_id, distance, time.time()])
+
+    def stepper_get_target_position(self, motor_id, target_callback):
+        self._report(target_callback, [STEPPER_TARGET_POSITION, motor_id, self.steppers[motor_id].target,
+                                       time.time()])
+
+    def shutdown(self):
+        self._scheduler.shutdown()
+
+
+def _board_position_source(units_per_step=0.001, motor_id=0, port=SIMULATED_PORT):
+    """Position source following a stepper of the simulated board opened in the telemetrix pool (if any)"""
+    def source(axis):
+        board = pool.board(port)
+        if board is None or len(board.steppers) <= motor_id:
+            return 0.
+        return board.current_position(motor_id) * units_per_step
+    return source
+
+
+class SimulatedIK220Dll:
+    """
+    Drop-in replacement of the IK220 dll
+
+    Parameters
+    ----------
+    axes: (list of int) the axes reported as present by IK220Find
+    position_source: (callable) position_source(axis) returning the raw position of an axis (half of the value
+        returned by IK220.get_axis_position), default to the first stepper of the simulated board with
+        units_per_step raw units per step
+    units_per_step: (float) coupling between the simulated stepper and the ruler, used by the default source
+    noise: (float) standard deviation of a gaussian noise added to the positions
+    read_latency: (float) duration (s) of a IK220ReadEn call
+    """
+
+    def __init__(self, axes=(0, 1), position_source=None, units_per_step=0.001, noise=0., read_latency=0.):
+        self.axes = list(axes)
+        if position_source is None:
+            position_source = _board_position_source(units_per_step)
+        self.position_source = position_source
+        self.noise = noise
+        self.read_latency = read_latency
+
+        # ctypes function pointers, so that byref arguments are converted to pointers as for the real dll
+        self.IK220Find = CFUNCTYPE(c_int, c_void_p)(self._find)
+        self.IK220ReadEn = CFUNCTYPE(c_int, c_ushort, c_void_p, c_void_p, c_void_p)(self._read_en)
+        self.IK220ConfigEn = CFUNCTYPE(c_int, c_ushort, *[c_void_p] * 7)(self._config_en)
+
+    def _find(self, p_serial):
+        serial = cast(p_serial, POINTER(c_ulong))
+        for axis in range(16):
+            serial[axis] = 10000 + axis if axis in self.axes else 0
+        return 1
+
+    def _read_en(self, axis, p_status, p_data, p_alarm):
+        if self.read_latency:
+            _spin(self.read_latency)
+        position = self.position_source(axis)
+        if self.noise:
+            position += random.gauss(0., self.noise)
+        cast(p_data, POINTER(c_double))[0] = position
+        cast(p_status, POINTER(c_ushort))[0] = 0
+        cast(p_alarm, POINTER(c_ushort))[0] = 0
+        return 1
+
+    def _config_en(self, axis, p_status, p_type, p_period, p_step, p_turns, p_ref_dist, p_cnt_dir):
+        for pointer, ctype, value in ((p_status, c_ushort, 0), (p_type, c_ushort, 1),  # linear encoder
+                                      (p_period, c_ulong, 20000),  # signal period in nm
+                                      (p_step, c_ulong, 1), (p_turns, c_ushort, 0), (p_ref_dist, c_ushort, 0),
+                                      (p_cnt_dir, c_ushort, 0)):
+            cast(pointer, POINTER(ctype))[0] = value
+        return 1
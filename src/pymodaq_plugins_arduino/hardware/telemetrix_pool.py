@@ -0,0 +1,117 @@
+"""
+Registry of the telemetrix boards opened in this process, keyed by COM port and shared by reference counting
+
+The first user of a port pays the telemetrix handshake, the next ones (other plugins, other axes) get the already
+opened board. The board is only shut down when its last user releases it.
+
+A stepper is driven through one state object per motor (see get_axis): telemetrix keeps one completion and one position
+callback per motor id, and the position cache, pending move and profile must be the same for all the wrappers sharing
+the motor.
+"""
+
+import threading
+
+SIMULATED_PORT = 'simulated'  # boards opened on this port are simulated, see hardware.simulator
+
+
+def _telemetrix_factory(port, arduino_wait=4):
+    if port == SIMULATED_PORT:
+        from pymodaq_plugins_arduino.hardware.simulator import SimulatedTelemetrix
+        return SimulatedTelemetrix(port)
+    from telemetrix import telemetrix
+    return telemetrix.Telemetrix(com_port=port, arduino_wait=arduino_wait)
+
+
+class TelemetrixPool:
+    """
+    Parameters
+    ----------
+    factory: (callable) factory(port, arduino_wait) returning a new (telemetrix like) board
+    """
+
+    def __init__(self, factory=_telemetrix_factory):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._boards = {}  # port: board
+        self._counts = {}  # port: number of users
+        self._steppers = {}  # port: {(interface, pin1, pin2, pin3, pin4): motor id}
+        self._axes = {}  # port: {motor id: StepperAxis}
+
+    def acquire(self, port, arduino_wait=4):
+        """
+        Returns
+        -------
+        the board connected to port, opened if it is its first user
+        """
+        with self._lock:
+            if port not in self._boards:
+                self._boards[port] = self.factory(port, arduino_wait)
+                self._counts[port] = 0
+                self._steppers[port] = {}
+                self._axes[port] = {}
+            self._counts[port] += 1
+            return self._boards[port]
+
+    def release(self, port):
+        """
+        Release one use of the board, shut it down if it was the last one
+        Returns
+        -------
+        bool: True if the board has been shut down
+        """
+        with self._lock:
+            if port not in self._boards:
+                return False
+            self._counts[port] -= 1
+            if self._counts[port] > 0:
+                return False
+            board = self._boards.pop(port)
+            self._counts.pop(port)
+            self._steppers.pop(port)
+            self._axes.pop(port)
+        board.shutdown()
+        return True
+
+    def get_stepper(self, port, interface=2, pin1=3, pin2=4, pin3=0, pin4=0):
+        """
+        Motor id of the stepper wired on the given pins of an acquired board, the stepper being created on the first
+        call only (telemetrix boards cannot declare the same pins twice)
+        """
+        key = (interface, pin1, pin2, pin3, pin4)
+        with self._lock:
+            steppers = self._steppers[port]
+            if key not in steppers:
+                steppers[key] = self._boards[port].set_pin_mode_stepper(interface=interface, pin1=pin1, pin2=pin2,
+                                                                        pin3=pin3, pin4=pin4)
+            return steppers[key]
+
+    def get_axis(self, port, axis_factory, interface=2, pin1=3, pin2=4, pin3=0, pin4=0):
+        """
+        State object of the stepper wired on the given pins of an acquired board, created on the first call only so
+        that all the wrappers driving this motor share it
+        Parameters
+        ----------
+        port: (str) port of the board
+        axis_factory: (callable) axis_factory(board, motor id) returning the state object, ex: a StepperAxis
+
+        Returns
+        -------
+        the object returned by axis_factory on the first call for this motor
+        """
+        motor = self.get_stepper(port, interface=interface, pin1=pin1, pin2=pin2, pin3=pin3, pin4=pin4)
+        with self._lock:
+            axes = self._axes[port]
+            if motor not in axes:
+                axes[motor] = axis_factory(self._boards[port], motor)
+            return axes[motor]
+
+    def board(self, port):
+        """The board opened on port, None if it is not opened"""
+        return self._boards.get(port)
+
+    def users(self, port):
+        """Number of users of the board connected to port"""
+        return self._counts.get(port, 0)
+
+
+pool = TelemetrixPool()
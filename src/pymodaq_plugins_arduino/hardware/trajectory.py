@@ -0,0 +1,134 @@
+"""
+Trajectories: a list of waypoints run by a stepper axis without going back to the scan loop between them
+
+Each move is sent from the completion callback of the previous one, so the only dead time between two waypoints is
+the telemetrix round trip. With a constant speed the steppers do not ramp up and down at each waypoint either.
+"""
+
+import math
+from concurrent.futures import Future
+from time import perf_counter
+
+import numpy as np
+
+
+def waypoints(start, stop, step):
+    """
+    Positions from start to stop (included if it falls on the grid) every step
+    Returns
+    -------
+    ndarray
+    """
+    if step == 0:
+        raise ValueError('The step of a trajectory cannot be 0')
+    n_steps = int(math.floor(abs(stop - start) / abs(step) + 1e-9))
+    direction = 1 if stop >= start else -1
+    return start + direction * abs(step) * np.arange(n_steps + 1)
+
+
+class AxisView:
+    """
+    start_move of one axis of a wrapper, as used by Trajectory. The moves go through the move_at of the wrapper so that
+    the accelerated ones are planned as any other (see ActuatorWrapper.set_planner)
+
+    Parameters
+    ----------
+    wrapper: (ActuatorWrapper or SyncActuatorWrapper)
+    name: (str) name of the axis
+    """
+
+    def __init__(self, wrapper, name):
+        self.wrapper = wrapper
+        self.name = name
+
+    def start_move(self, value, speed=None):
+        return self.wrapper.move_at(value, wait=False, axis=self.name, speed=speed)
+
+
+class Trajectory:
+    """
+    Waypoints run one after the other by a stepper axis
+
+    Parameters
+    ----------
+    axis: (AxisView or StepperAxis) the axis to move, its start_move(value, speed) returning a Future
+    positions: (list of float) the waypoints
+    speed: (int) constant speed (steps/s) of the motions, None to use the accelerated profile of the stepper, planned
+        for each waypoint if the axis is an AxisView
+    callback: (callable) callback(index, position, timestamp) called (from the telemetrix thread) when a waypoint is
+        reached, timestamp being a perf_counter value as the ones of the EncoderSampler buffer
+
+    Attributes
+    ----------
+    reached: (ndarray) positions reported at the end of each motion, nan for the waypoints not reached yet
+    timestamps: (ndarray) perf_counter time at which each waypoint was reached, nan if not reached yet
+    future: (Future) resolved with reached once the last waypoint is reached, cancelled if the axis is stopped
+    """
+
+    def __init__(self, axis, positions, speed=None, callback=None):
+        self.axis = axis
+        self.positions = np.asarray(positions, dtype=float)
+        self.speed = speed
+        self.callback = callback
+        self.reached = np.full(len(self.positions), np.nan)
+        self.timestamps = np.full(len(self.positions), np.nan)
+        self.index = 0
+        self.start_time = None
+        self.future = Future()
+
+    @property
+    def elapsed(self):
+        """Time (s) between the start of the trajectory and its last reached waypoint"""
+        if self.start_time is None or self.index == 0:
+            return 0.
+        return self.timestamps[self.index - 1] - self.start_time
+
+    def start(self):
+        """
+        Send the first waypoint
+        Returns
+        -------
+        Future: see future
+        """
+        self.start_time = perf_counter()
+        if len(self.positions) == 0:
+            self.future.set_result(self.reached)
+            return self.future
+        move = self._send(0)
+        if move.done():
+            self._waypoint_reached(move)
+        else:
+            move.add_done_callback(self._waypoint_reached)
+        return self.future
+
+    def _send(self, index):
+        return self.axis.start_move(self.positions[index], speed=self.speed)
+
+    def _waypoint_reached(self, move):
+        """
+        Done callback of the pending move. The following waypoints whose moves are already done (zero length moves)
+        are run through in a loop, a callback being only registered on a pending move
+        """
+        try:
+            while True:
+                if move.cancelled():  # the axis has been stopped
+                    self.future.cancel()
+                    return
+                timestamp = perf_counter()
+                index = self.index
+                self.reached[index] = move.result()
+                self.timestamps[index] = timestamp
+                self.index += 1
+                # the next motion is sent before calling the callback so that it is not delayed by it
+                move = self._send(self.index) if self.index < len(self.positions) else None
+                if self.callback is not None:
+                    self.callback(index, self.reached[index], timestamp)
+                if move is None:
+                    self.future.set_result(self.reached)
+                    return
+                if not move.done():
+                    move.add_done_callback(self._waypoint_reached)
+                    return
+        except Exception as error:  # the exceptions of a done callback would be swallowed by the future
+            if not self.future.done():
+                self.future.set_exception(error)
@@ -1,4 +1,9 @@
+from types import SimpleNamespace
+
 from pymodaq.pid.utils import PIDModelGeneric, OutputToActuator, InputFromDetector, main
+from pymodaq.daq_utils.parameter import Parameter
+from pymodaq_plugins_arduino.hardware import output_shaping
+from pymodaq_plugins_arduino.hardware.output_shaping import OutputShaper
 
 
 class PIDModelGrating(PIDModelGeneric):
@@ -8,6 +13,7 @@ class PIDModelGrating(PIDModelGeneric):
                   min=dict(state=False, value=0), )
     konstants = dict(kp=15, ki=0, kd=0.0000)
 
+    params = output_shaping.params
 
     Nsetpoints = 1
     setpoint_ini = [0]
@@ -17,6 +23,22 @@ class PIDModelGrating(PIDModelGeneric):
 
     def __init__(self, pid_controller):
         super().__init__(pid_controller)
+        self.shaper = OutputShaper()
+
+    @classmethod
+    def headless(cls, setpoints=None):
+        """
+        Build the model without the PID GUI, see hardware.headless_pid. PIDModelGeneric.__init__ needs the modules
+        manager of the GUI, so only what convert_input and convert_output use is set up
+        """
+        model = cls.__new__(cls)
+        model.pid_controller = SimpleNamespace(setpoints=list(cls.setpoint_ini if setpoints is None else setpoints))
+        model.settings = Parameter.create(name='model_params', type='group', children=cls.params)
+        model.curr_input = 0.
+        model.curr_output = [0.]
+        model.shaper = OutputShaper()
+        model.shaper.update_from_settings(model.settings)
+        return model
 
     def update_settings(self, param):
         """
@@ -25,11 +47,13 @@ class PIDModelGrating(PIDModelGeneric):
         ----------
         param: (Parameter) instance of Parameter object
         """
-        if param.name() == '':
-            pass
+        if param.parent() is not None and param.parent().name() == 'output_shaping':
+            self.shaper.update_from_settings(self.settings)
 
     def ini_model(self):
         super().ini_model()
+        self.shaper.update_from_settings(self.settings)
+        self.shaper.reset()
 
 
     def convert_input(self, measurements):
@@ -51,12 +75,19 @@ class PIDModelGrating(PIDModelGeneric):
 
     def convert_output(self, outputs, dt, stab=True):
         """
-
+        Shape the PID outputs (gain scheduling, deadband, clamp and command interval, see OutputShaper) into whole
+        numbers of steps, 0 meaning that no move is needed
         """
-        self.curr_output = outputs
-        return OutputToActuator(mode='rel', values=outputs)
+        error = self.pid_controller.setpoints[0] - self.curr_input
+        self.curr_output = [self.shaper.shape(outputs[0], error)]
+        return OutputToActuator(mode='rel', values=self.curr_output)
 
 
 if __name__ == '__main__':
-   main("preset_pid_z40.xml")
+    import sys
+    if '--headless' in sys.argv:
+        from pymodaq_plugins_arduino.hardware.headless_pid import main as headless_main
+        headless_main(PIDModelGrating)
+    else:
+        main("preset_pid_z40.xml")
 
@@ -0,0 +1,95 @@
+
+import numpy as np
+from pymodaq.pid.utils import InputFromDetector, main
+from pymodaq_plugins_arduino.hardware import output_shaping
+# the module rather than the class: the model discovery of PyMoDAQ takes the first class of a model module deriving
+# directly from PIDModelGeneric, PIDModelGrating would be listed under the name of this module
+from pymodaq_plugins_arduino.models import PIDModelGrating as grating
+
+# reductions of the (possibly batched) ruler data to the single value fed to the PID. np.median has to partition a
+# copy of the data, the other ones work on the data as delivered
+REDUCTIONS = dict(mean=np.mean,
+                  median=np.median,
+                  last=lambda data: data.flat[-1])
+
+
+class PIDModelGratingArray(grating.PIDModelGrating):
+    """
+    Same model as PIDModelGrating, but the detector data to use is resolved once in ini_model and may be an array
+    (batch of samples from the streaming mode of the ruler viewer, or a Data1D channel) reduced with NumPy
+
+    As it does not derive directly from PIDModelGeneric, the PID module of PyMoDAQ does not list it, it is run with
+    hardware.headless_pid (python -m pymodaq_plugins_arduino.models.PIDModelGratingArray --headless)
+    """
+
+    params = [
+        {'title': 'Data dimension:', 'name': 'data_dim', 'type': 'list', 'value': 'data0D',
+         'limits': ['data0D', 'data1D']},
+        {'title': 'Channel:', 'name': 'channel', 'type': 'str', 'value': '',
+         'tip': 'Key of the channel in the detector data (ex: Ruler_Ruler_CH000), empty to use the first one'},
+        {'title': 'Reduction:', 'name': 'reduction', 'type': 'list', 'value': 'mean', 'limits': list(REDUCTIONS)},
+    ] + output_shaping.params
+
+    _keys = None  # (detector, data dimension, channel), see resolve_keys
+    _reduce = None
+    _input = None  # InputFromDetector reused at each tick
+
+    def update_settings(self, param):
+        """
+        Get a parameter instance whose value has been modified by a user on the UI
+        Parameters
+        ----------
+        param: (Parameter) instance of Parameter object
+        """
+        if param.name() in ('data_dim', 'channel', 'reduction'):
+            self.resolve_keys()
+        else:
+            super().update_settings(param)
+
+    def ini_model(self):
+        super().ini_model()
+        self.resolve_keys()
+
+    def resolve_keys(self):
+        """Cache the keys of the measurements and the reduction, so that convert_input does no lookup by name"""
+        channel = self.settings.child('channel').value()
+        self._keys = (self.detectors_name[0], self.settings.child('data_dim').value(), channel if channel else None)
+        self._reduce = REDUCTIONS[self.settings.child('reduction').value()]
+        self._input = InputFromDetector([0.])
+
+    def convert_input(self, measurements):
+        """
+        Convert the measurements in the units to be fed to the PID (same dimensionality as the setpoint)
+        Parameters
+        ----------
+        measurements: (Ordereddict) Ordereded dict of object from which the model extract a value of the same units as the setpoint
+
+        Returns
+        -------
+        InputFromDetector: the converted input, the same instance being reused at each tick
+
+        """
+        if self._keys is None:  # built by headless, without ini_model
+            self.resolve_keys()
+        detector, dim, channel = self._keys
+        channels = measurements[detector][dim]
+        if channel is None:  # first tick: use (and keep) the first channel delivered by the detector
+            channel = next(iter(channels))
+            self._keys = (detector, dim, channel)
+        data = channels[channel]['data']
+        if np.isscalar(data):
+            self.curr_input = data
+        else:
+            data = np.asarray(data)  # no copy of the arrays delivered by the viewers
+            self.curr_input = float(self._reduce(data)) if data.size > 1 else float(data.flat[0])
+        self._input.values[0] = self.curr_input
+        return self._input
+
+
+if __name__ == '__main__':
+    import sys
+    if '--headless' in sys.argv:
+        from pymodaq_plugins_arduino.hardware.headless_pid import main as headless_main
+        headless_main(PIDModelGratingArray)
+    else:
+        main("preset_pid_z40.xml")
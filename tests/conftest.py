@@ -0,0 +1,45 @@
+"""
+The tests run against the simulated backends (SimulatedTelemetrix, SimulatedIK220Dll), no hardware is needed
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1].joinpath('src')))
+
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT, pool  # noqa: E402
+
+# fastest profile accepted by telemetrix (integers within 1..1000), the test moves are kept to a few tens of steps
+MAX_SPEED = 1000
+ACCELERATION = 1000
+
+
+@pytest.fixture
+def actuator():
+    """ActuatorWrapper on the simulated board, with one axis ('Motor 1')"""
+    from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
+    actuator = ActuatorWrapper()
+    actuator.open_communication(SIMULATED_PORT)
+    actuator.max_speed_set(MAX_SPEED)
+    actuator.accel_set(ACCELERATION)
+    yield actuator
+    actuator.stop_all()
+    actuator.close_communication()
+
+
+@pytest.fixture
+def ruler(actuator):
+    """Simulated IK220 following the stepper of the actuator fixture (500 steps per ruler unit on axis 1)"""
+    from pymodaq_plugins_arduino.hardware.backends import create_encoder
+    ruler = create_encoder(simulated=True)
+    yield ruler
+    ruler.stop_sampling()
+
+
+@pytest.fixture(autouse=True)
+def released_boards():
+    """Every test must release the simulated board it opened"""
+    yield
+    assert pool.users(SIMULATED_PORT) == 0
@@ -0,0 +1,87 @@
+from concurrent.futures import wait
+from time import sleep
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT
+
+
+def test_move_at_is_resolved_by_the_completion_callback(actuator):
+    future = actuator.move_at(100, wait=False)
+    assert future.result(2) == 100
+    assert actuator.get_value(fresh=True) == 100
+    assert actuator.move_by(-30) is not None
+    assert actuator.get_value() == 70
+
+
+def test_stop_cancels_the_move(actuator):
+    future = actuator.move_at(100000, wait=False)
+    sleep(0.05)
+    assert actuator.stop()
+    assert future.cancelled()
+    assert 0 < actuator.get_value(fresh=True) < 100000
+
+
+def test_move_timeout(actuator):
+    actuator.max_speed_set(100)
+    with pytest.raises(TimeoutError):
+        actuator.move_at(100000, timeout=0.05)
+
+
+def test_move_axes_runs_the_axes_in_parallel(actuator):
+    actuator.add_axis('Motor 2', interface=2, pin1=5, pin2=6)
+    actuator.max_speed_set(1000, axis='Motor 2')
+    actuator.accel_set(1000, axis='Motor 2')
+    futures = actuator.move_axes({'Motor 1': 200, 'Motor 2': -100}, timeout=2)
+    assert {name: future.result() for name, future in futures.items()} == {'Motor 1': 200, 'Motor 2': -100}
+    assert actuator.get_value(axis='Motor 2', fresh=True) == -100
+
+
+def test_position_listeners_and_subscription(actuator):
+    reports = []
+    actuator.add_position_listener(reports.append)
+    actuator.subscribe(100)
+    actuator.move_at(50, timeout=2)
+    wait([actuator.move_at(0, wait=False)], 2)
+    actuator.unsubscribe()
+    assert 50 in reports and reports[-1] == 0
+
+
+def test_retarget_mid_move(actuator):
+    first = actuator.move_at(300, wait=False)
+    sleep(0.05)
+    second = actuator.move_at(0, wait=False)
+    assert first.cancelled()  # superseded
+    assert second.result(2) == 0
+    assert actuator.get_value(fresh=True) == 0
+
+
+def test_zero_length_move_when_idle_is_immediate(actuator):
+    actuator.move_at(20, timeout=2)
+    future = actuator.move_at(20, wait=False)
+    assert future.done() and future.result() == 20
+
+
+def test_fractional_target_is_cached_as_whole_steps(actuator):
+    assert actuator.move_at(20.4, timeout=2).result() == 20
+    assert actuator.get_value() == actuator.get_value(fresh=True) == 20
+    assert actuator.move_at(19.6, wait=False).done()  # already there once rounded
+
+
+def test_motor_shared_by_two_wrappers(actuator):
+    other = ActuatorWrapper()
+    other.open_communication(SIMULATED_PORT, axes={'Shared': dict(interface=2, pin1=3, pin2=4)})
+    try:
+        assert other._axis() is actuator._axis()
+        actuator.move_at(50, timeout=2)
+        assert other.get_value() == 50
+        assert other.move_at(0, timeout=2).result() == 0  # not short-circuited by a stale cache
+        assert actuator.get_value(fresh=True) == 0
+
+        first = actuator.move_at(300, wait=False)
+        second = other.move_at(100, wait=False)  # takes over the motor (and its completion callback)
+        assert first.cancelled()
+        assert second.result(2) == 100
+    finally:
+        other.close_communication()
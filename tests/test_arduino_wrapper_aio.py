@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import wait
+from time import sleep
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.arduino_wrapper_aio import AsyncActuatorWrapper, SyncActuatorWrapper, \
+    wait_moves
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT
+
+AXES = {'X': dict(interface=2, pin1=3, pin2=4), 'Y': dict(interface=2, pin1=5, pin2=6)}
+
+
+def test_async_moves_are_awaited_together():
+    async def scenario():
+        actuator = AsyncActuatorWrapper()
+        await actuator.open_communication(SIMULATED_PORT, axes=AXES)
+        try:
+            for axis in AXES:
+                await actuator.max_speed_set(1000, axis=axis)
+                await actuator.accel_set(1000, axis=axis)
+            moves = [await actuator.move_at(100, wait=False, axis='X'),
+                     await actuator.move_at(-50, wait=False, axis='Y')]
+            reached = await wait_moves(moves, timeout=2)
+            return reached, await actuator.get_value(axis='X', fresh=True)
+        finally:
+            await actuator.close_communication()
+
+    assert asyncio.run(scenario()) == ([100, -50], 100)
+
+
+def test_sync_facade():
+    actuator = SyncActuatorWrapper()
+    actuator.open_communication(SIMULATED_PORT)
+    try:
+        actuator.max_speed_set(1000)
+        actuator.accel_set(1000)
+        assert actuator.move_at(30, timeout=2).result() == 30
+        assert actuator.get_value(fresh=True) == 30
+        future = actuator.move_at(100000, wait=False)
+        assert actuator.stop()
+        wait([future], 1)  # cancelled from the loop thread
+        assert future.cancelled()
+    finally:
+        actuator.close_communication()
+
+
+def test_loop_thread_run_is_bounded():
+    from pymodaq_plugins_arduino.hardware.arduino_wrapper_aio import loop_thread
+    loop = loop_thread()
+    with pytest.raises(TimeoutError):
+        loop.run(asyncio.sleep(10), timeout=0.05)
+    assert loop.run(asyncio.sleep(0, result=1)) == 1  # the loop keeps running
+
+
+def test_sync_facade_get_value_updates_the_current_value():
+    actuator = SyncActuatorWrapper()
+    actuator.open_communication(SIMULATED_PORT)
+    try:
+        actuator.max_speed_set(1000)
+        actuator.accel_set(1000)
+        actuator.move_at(300, wait=False)
+        sleep(0.1)
+        stepper = actuator.aio._axis()
+        reports = stepper._reports
+        actuator._loop.run(stepper.request_position())  # reported while running
+        while stepper._reports == reports:
+            sleep(0.001)
+        value = actuator.get_value()  # cached
+        assert 0 < value < 300
+        assert stepper._current_value == value  # as ActuatorWrapper.get_value
+        actuator.stop()
+    finally:
+        actuator.close_communication()
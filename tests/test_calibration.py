@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_arduino.hardware.calibration import StepCalibration
+
+
+def calibration_with_backlash(backlash=20):
+    calibration = StepCalibration()
+    for position in np.linspace(0, 10, 11):
+        calibration.record(500 * position, position, 1)
+        calibration.record(500 * position - backlash, position, -1)
+    return calibration
+
+
+def test_maps_and_backlash():
+    calibration = calibration_with_backlash()
+    assert len(calibration) == 22
+    assert np.isclose(calibration.backlash, 20)
+    assert np.isclose(calibration.steps_for(2.5, 1), 1250)
+    assert np.isclose(calibration.steps_for(2.5, -1), 1230)
+    assert np.isclose(calibration.steps_for(12, 1), 6000)  # extrapolated
+    assert StepCalibration().steps_for(1, 1) is None
+
+
+def test_save_load(tmp_path):
+    calibration = calibration_with_backlash()
+    path = tmp_path.joinpath('calibration.json')
+    calibration.save(path)
+    loaded = StepCalibration.load(path)
+    assert len(loaded) == len(calibration)
+    assert loaded.steps_for(2.5, -1) is None  # until anchored, see below
+    loaded.anchor(1250, 2.5, direction=1)  # same step counter
+    assert np.isclose(loaded.steps_for(2.5, -1), calibration.steps_for(2.5, -1))
+
+
+def test_loaded_calibration_is_anchored_on_the_current_step_count():
+    loaded = calibration_with_backlash()
+    loaded.anchored = False
+    assert loaded.steps_for(2.5, 1) is None
+    loaded.anchor(0, 2., direction=1)  # step counter reset to 0 with the ruler at 2
+    assert np.isclose(loaded.steps_for(2.5, 1), 250)
+    assert np.isclose(loaded.backlash, 20)
+
+
+def test_calibration_reload_after_a_step_counter_reset(tmp_path):
+    from pymodaq_plugins_arduino.hardware.arduino_wrapper import ActuatorWrapper
+    from pymodaq_plugins_arduino.hardware.backends import create_encoder
+    from pymodaq_plugins_arduino.hardware.closed_loop import ClosedLoopPositioner
+    from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT, pool
+
+    offset = [0]  # steps of the ruler origin, kept across the simulated power cycle of the board
+    actuator = ActuatorWrapper()
+    actuator.open_communication(SIMULATED_PORT)
+    board = pool.board(SIMULATED_PORT)
+    ruler = create_encoder(simulated=True,
+                           position_source=lambda axis: (board.current_position(0) + offset[0]) * 0.001)
+    try:
+        actuator.max_speed_set(1000)
+        actuator.accel_set(1000)
+        calibration = StepCalibration()
+        for steps in (0, 20, 40, 60, 50, 30, 10):
+            direction = 1 if steps >= actuator.get_value() else -1
+            actuator.move_at(steps, timeout=2)
+            calibration.record(steps, ruler.get_axis_position(1), direction)
+        actuator.move_at(40, timeout=2)
+        path = tmp_path.joinpath('calibration.json')
+        calibration.save(path)
+
+        # power cycle: the step counter restarts at 0, the ruler still reads 0.08
+        offset[0] = 40
+        board.stepper_set_current_position(0, 0)
+        assert actuator.get_value(fresh=True) == 0
+        assert ruler.get_axis_position(1) == pytest.approx(0.08)
+
+        positioner = ClosedLoopPositioner(actuator, lambda: ruler.get_axis_position(1), kp=1., output_scale=500,
+                                          tolerance=0.01, timeout=5., calibration=StepCalibration.load(path))
+        moves = []
+        move_at = actuator.move_at
+        actuator.move_at = lambda value, **kwargs: moves.append(value) or move_at(value, **kwargs)
+        result = positioner.run(0.1)
+        assert result.converged
+        assert moves[0] == 10  # feed-forward from the new origin, not to the step count of the previous session
+    finally:
+        actuator.close_communication()
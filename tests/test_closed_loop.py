@@ -0,0 +1,64 @@
+import threading
+import time
+
+from pymodaq_plugins_arduino.hardware.closed_loop import ClosedLoopPositioner, TwoPhasePositioner
+
+STEPS_PER_UNIT = 500  # of the simulated ruler
+
+
+def positioner_of(actuator, ruler, **kwargs):
+    # proportional gain matching the coupling of the simulator: one iteration per move
+    return ClosedLoopPositioner(actuator, lambda: ruler.get_axis_position(1), kp=1., output_scale=STEPS_PER_UNIT,
+                                tolerance=0.01, timeout=5., **kwargs)
+
+
+def test_closed_loop_converges(actuator, ruler):
+    result = positioner_of(actuator, ruler).run(0.3)
+    assert result.converged
+    assert abs(result.position - 0.3) <= 0.01
+
+
+def test_two_phase_converges_from_the_approach_side(actuator, ruler):
+    positioner = positioner_of(actuator, ruler)
+    mover = TwoPhasePositioner(positioner, coarse_threshold=0.05, approach_offset=0.02, approach_side=1,
+                               steps_per_unit=STEPS_PER_UNIT)
+    moves = []
+    move_at = actuator.move_at
+    actuator.move_at = lambda value, **kwargs: moves.append(value) or move_at(value, **kwargs)
+    result = mover.run(0.4)
+    assert result.converged
+    assert moves[0] == round((0.4 - 0.02) * STEPS_PER_UNIT)  # slew stopping short of the target
+    assert all(move >= moves[0] for move in moves[1:])  # approached from below
+
+
+def two_phase_of(actuator, ruler):
+    return TwoPhasePositioner(positioner_of(actuator, ruler), coarse_threshold=0.05, approach_offset=0.02,
+                              approach_side=1, steps_per_unit=STEPS_PER_UNIT)
+
+
+def test_move_after_abort(actuator, ruler):
+    mover = two_phase_of(actuator, ruler)
+    mover.abort()  # ex: stop_motion of an idle plugin, or the abort of a retarget
+    assert not mover.run(0.2).converged  # not cleared by run
+    mover.reset()
+    result = mover.run(0.2)
+    assert result.converged
+    assert abs(ruler.get_axis_position(1) - 0.2) <= 0.01
+    mover.positioner.abort()
+    mover.positioner.reset()
+    assert mover.positioner.run(0.15).converged
+
+
+def test_abort_stops_the_slew(actuator, ruler):
+    mover = two_phase_of(actuator, ruler)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(mover.run(10.)))
+    thread.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    mover.abort()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert time.perf_counter() - start < 0.1
+    assert not results[0].converged
+    assert not actuator.running
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+
+from pymodaq_plugins_arduino.daq_viewer_plugins.plugins_0D.daq_0Dviewer_Arduino import DAQ_0DViewer_Arduino  # noqa
+from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220  # noqa: E402
+from pymodaq_plugins_arduino.hardware.simulator import SimulatedIK220Dll  # noqa: E402
+
+
+@pytest.fixture
+def viewer():
+    """Viewer on a simulated ruler, with its emitted data appended to viewer.emitted"""
+    viewer = DAQ_0DViewer_Arduino(None, None)
+    viewer.settings.child('simulated').setValue(True)
+    viewer.ini_detector()
+    viewer.emitted = []
+    viewer.data_grabed_signal.connect(viewer.emitted.append)
+    yield viewer
+    viewer.close()
+
+
+def set_setting(viewer, *path, value):
+    param = viewer.settings.child(*path)
+    param.setValue(value)
+    viewer.commit_settings(param)
+
+
+def test_hardware_averaging(viewer):
+    viewer.controller = IK220(dll=SimulatedIK220Dll(axes=[1], position_source=lambda axis: 1., noise=0.01))
+    set_setting(viewer, 'show_std', value=True)
+    viewer.grab_data(Naverage=200)
+    data = viewer.emitted[-1][0]
+    assert data['labels'] == ['dat0', 'dat0 std']
+    mean, std = data['data'][0][0], data['data'][1][0]
+    expected = viewer.calibration.convert(2.)
+    assert mean == pytest.approx(expected, abs=abs(viewer.calibration.convert(2.01) - expected))
+    assert std == pytest.approx(0.02, rel=0.3)  # raw noise multiplied by 2
+
+    viewer.grab_data()
+    data = viewer.emitted[-1][0]
+    assert data['data'][1][0] == 0  # no std without averaging
+
+
+def test_streaming_emits_the_samples_since_the_previous_batch(viewer):
+    set_setting(viewer, 'streaming', 'batch_size', value=20)
+    set_setting(viewer, 'streaming', 'emit_rate', value=100.)
+    set_setting(viewer, 'streaming', 'streaming_on', value=True)
+    assert viewer.controller.sampler.running
+    viewer.grab_data()
+    viewer.grab_data()
+    first, second = viewer.emitted[-2], viewer.emitted[-1]
+    mean, trace = second
+    assert mean['dim'] == 'Data0D' and trace['dim'] == 'Data1D'
+    assert len(trace['data'][0]) >= 20
+    assert mean['data'][0][0] == pytest.approx(np.mean(trace['data'][0]))
+    # consecutive batches do not overlap
+    assert first[1]['x_axis']['data'][-1] < trace['x_axis']['data'][0]
+
+    set_setting(viewer, 'streaming', 'streaming_on', value=False)
+    assert viewer.controller.sampler is None  # background sampling was only started for the streaming
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_arduino.hardware.fly_scan import FlyScan
+
+
+def test_sweep_samples_the_ruler(actuator, ruler):
+    fly_scan = FlyScan(actuator, ruler, rate=500., settle=0.02)
+    result = fly_scan.run(0, 100, 1000, max_speed=500)
+    assert result.completed
+    assert result.duration == pytest.approx(0.1, abs=0.08)
+    assert len(result.timestamps) == len(result.positions) == len(result.steps) > 0
+    assert result.steps[-1] == 100
+    assert result.positions[-1] == pytest.approx(100 / 500)  # 500 steps per ruler unit
+    assert np.all(np.diff(result.timestamps) > 0)
+    assert actuator._axis().max_speed == 500  # restored after the sweep
+
+
+def test_sweep_speed_out_of_the_telemetrix_range(actuator, ruler):
+    fly_scan = FlyScan(actuator, ruler)
+    with pytest.raises(ValueError):
+        fly_scan.run(0, 100, 0)
+    with pytest.raises(ValueError):
+        fly_scan.run(0, 100, 5000)
@@ -0,0 +1,61 @@
+import threading
+from time import sleep
+from types import SimpleNamespace
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.headless_pid import FixedPeriodScheduler, HeadlessPID
+
+
+def test_scheduler_ticks_at_a_fixed_period():
+    scheduler = FixedPeriodScheduler(0.01)
+    scheduler.start()
+    while scheduler.wait() and scheduler.ticks < 10:
+        pass
+    assert scheduler.missed == 0
+    assert scheduler.statistics()['ticks'] == 10
+
+
+def test_scheduler_skips_the_missed_deadlines():
+    scheduler = FixedPeriodScheduler(0.01)
+    scheduler.start()
+    scheduler.wait()
+    sleep(0.045)  # overrun
+    assert scheduler.wait()
+    assert scheduler.missed in (3, 4)
+    assert scheduler.ticks == 2  # no burst of late ticks
+
+
+def test_scheduler_stop():
+    scheduler = FixedPeriodScheduler(10.)
+    scheduler.start()
+    threading.Timer(0.05, scheduler.stop_event.set).start()
+    assert not scheduler.wait()
+
+
+class StepsModel:
+    """Proportional model in ruler units, its output being converted to steps (500 steps per ruler unit)"""
+    konstants = dict(kp=1., ki=0., kd=0.)
+    limits = dict(max=dict(state=False, value=0), min=dict(state=False, value=0))
+    detectors_name = ['Ruler']
+
+    @classmethod
+    def headless(cls, setpoints=None):
+        model = cls()
+        model.pid_controller = SimpleNamespace(setpoints=list(setpoints))
+        return model
+
+    def convert_input(self, measurements):
+        return SimpleNamespace(values=[measurements['Ruler']['data0D']['Ruler_Ruler_CH000']['data']])
+
+    def convert_output(self, outputs, dt, stab=True):
+        return SimpleNamespace(mode='rel', values=[round(outputs[0] * 500)])
+
+
+def test_headless_pid_holds_the_setpoint(actuator, ruler):
+    runner = HeadlessPID(StepsModel, actuator, ruler, setpoint=0.1, period=0.01)
+    stats = runner.run(duration=0.5)
+    assert ruler.get_axis_position(1) == pytest.approx(0.1)
+    assert stats['moves'] >= 1 and stats['ticks'] > 10
+    assert not actuator.running
+
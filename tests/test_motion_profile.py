@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.motion_profile import MotionPlanner, trapezoid_duration
+
+
+def test_trapezoid_duration():
+    assert trapezoid_duration(0, 1000, 1000) == 0.
+    # triangle: the max speed is not reached
+    assert trapezoid_duration(100, 1000, 1000) == pytest.approx(2 * math.sqrt(0.1))
+    assert trapezoid_duration(-100, 1000, 1000) == trapezoid_duration(100, 1000, 1000)
+    # trapezoid: 2 ramps of 1 s (500 steps each) and 0.5 s of cruise
+    assert trapezoid_duration(1500, 1000, 1000) == pytest.approx(2.5)
+    # both formulas agree at the limit, when the max speed is just reached
+    assert trapezoid_duration(1000, 1000, 1000) == pytest.approx(2 * math.sqrt(1.))
+
+
+def test_planner_uses_the_limits_of_a_constant_torque_motor():
+    planner = MotionPlanner(speed_limit=800, accel_limit=400)
+    profile = planner.plan(-1000)
+    assert (profile.max_speed, profile.acceleration) == (800, 400)
+    assert profile.duration == pytest.approx(trapezoid_duration(1000, 800, 400))
+
+
+def test_planner_with_a_stall_speed():
+    planner = MotionPlanner(speed_limit=1000, accel_limit=1000, stall_speed=5000, n_candidates=20)
+    short, long = planner.plan(20), planner.plan(20000)
+    assert short.max_speed < long.max_speed  # short moves favour the acceleration
+    assert long.max_speed == 1000
+    for profile, distance in ((short, 20), (long, 20000)):
+        assert profile.acceleration == pytest.approx(planner.available_acceleration(profile.max_speed))
+        assert profile.duration <= trapezoid_duration(distance, 1000, planner.available_acceleration(1000))
+    assert planner.plan(20) is short  # cached
+    planner.configure(stall_speed=None)
+    assert planner.plan(20).max_speed == 1000
+
+
+def test_planned_profile_is_sent_before_the_move(actuator):
+    actuator.set_planner(MotionPlanner(speed_limit=900, accel_limit=700))
+    actuator.move_at(30, timeout=2)
+    axis = actuator._axis()
+    assert (axis.max_speed, axis.acceleration) == (900, 700)
+    assert axis.predicted_duration == pytest.approx(trapezoid_duration(30, 900, 700))
+    assert axis.last_duration == pytest.approx(axis.predicted_duration, abs=0.05)
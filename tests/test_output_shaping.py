@@ -0,0 +1,27 @@
+from pymodaq_plugins_arduino.hardware.output_shaping import OutputShaper
+
+
+def test_deadband():
+    shaper = OutputShaper(deadband=0.05, min_interval=0.)
+    assert shaper.shape(100., error=0.01, now=0.) == 0
+    assert shaper.shape(100., error=-0.049, now=0.) == 0
+    assert shaper.shape(100., error=0.05, now=0.) != 0
+
+
+def test_gain_scheduling_and_clamp():
+    shaper = OutputShaper(coarse_threshold=5., coarse_gain=1., fine_gain=0.3, max_step=2000, min_interval=0.)
+    assert shaper.shape(100., error=1., now=0.) == 30  # fine
+    assert shaper.shape(100., error=-10., now=1.) == 100  # coarse
+    assert shaper.shape(1e6, error=10., now=2.) == 2000  # clamped
+    assert shaper.shape(-1e6, error=-10., now=3.) == -2000
+    assert shaper.shape(1., error=1., now=4.) == 0  # less than one step
+
+
+def test_min_interval():
+    shaper = OutputShaper(fine_gain=1., min_interval=0.05)
+    assert shaper.shape(10., error=1., now=1.) == 10
+    assert shaper.shape(10., error=1., now=1.02) == 0  # dropped
+    assert shaper.shape(0.2, error=1., now=1.06) == 0
+    assert shaper.shape(10., error=1., now=1.07) == 10  # the zero command did not restart the interval
+    shaper.reset()
+    assert shaper.shape(10., error=1., now=1.08) == 10
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+
+from pymodaq_plugins_arduino.models.PIDModelGratingArray import PIDModelGratingArray  # noqa: E402
+
+
+def measurements(data, dim='data0D', channel='Ruler_Ruler_CH000'):
+    return {'Ruler': {dim: {channel: {'data': data}}}}
+
+
+def test_array_model_reduces_the_batches():
+    model = PIDModelGratingArray.headless(setpoints=[1.])
+    batch = np.array([1., 2., 10.])
+    assert model.convert_input(measurements(batch)).values == [pytest.approx(13 / 3)]  # mean by default
+    assert model.convert_input(measurements(2.5)).values == [2.5]  # scalars as is
+
+    model.settings.child('reduction').setValue('median')
+    model.update_settings(model.settings.child('reduction'))
+    model_input = model.convert_input(measurements(batch))
+    assert model_input.values == [2.]
+    model.settings.child('reduction').setValue('last')
+    model.update_settings(model.settings.child('reduction'))
+    assert model.convert_input(measurements(batch)) is model_input  # reused between settings changes
+    assert model_input.values == [10.]
+
+
+def test_array_model_channel_resolution():
+    model = PIDModelGratingArray.headless()
+    model.settings.child('data_dim').setValue('data1D')
+    model.update_settings(model.settings.child('data_dim'))
+    data = {'Ruler': {'data1D': {'first': {'data': np.ones(4)}, 'second': {'data': np.zeros(4)}}}}
+    assert model.convert_input(data).values == [1.]  # first channel, kept afterwards
+    assert model._keys == ('Ruler', 'data1D', 'first')
+    model.settings.child('channel').setValue('second')
+    model.update_settings(model.settings.child('channel'))
+    assert model.convert_input(data).values == [0.]
+
+
+def test_array_model_output_is_shaped_as_the_grating_one():
+    model = PIDModelGratingArray.headless(setpoints=[1.])
+    model.convert_input(measurements(np.array([0.5, 0.5])))
+    output = model.convert_output([12.3], dt=0.01)  # error of 0.5: fine gain (0.3) of the default shaping
+    assert output.mode == 'rel'
+    assert output.values == [4]
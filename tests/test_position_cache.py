@@ -0,0 +1,52 @@
+import math
+from time import sleep
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import SIMULATED_PORT, pool
+
+
+def test_first_read_waits_for_a_report(actuator):
+    axis = actuator._axis()
+    assert axis.position_age == math.inf
+    value, age = actuator.get_value(with_age=True)
+    assert value == 0 and age < 0.1
+
+
+def test_cached_and_fresh_reads(actuator):
+    actuator.move_at(20, timeout=2)
+    sleep(0.05)
+    value, age = actuator.get_value(with_age=True)
+    assert value == 20 and age >= 0.05  # from the completion callback, no request sent
+    # the board position changes without the cache knowing it
+    pool.board(SIMULATED_PORT).stepper_set_current_position(actuator.motor, 5)
+    assert actuator.get_value() == 20
+    value, age = actuator.get_value(fresh=True, with_age=True)
+    assert value == 5 and age < 0.05
+    assert actuator.get_value() == 5
+
+
+def test_fresh_read_timeout(actuator):
+    board = pool.board(SIMULATED_PORT)
+    board.latency = 0.5
+    try:
+        with pytest.raises(TimeoutError):
+            actuator.get_value(fresh=True, timeout=0.05)
+    finally:
+        board.latency = 0.001
+        sleep(0.5)  # the late report
+
+
+def test_periodic_reports(actuator):
+    reports = []
+    actuator.add_position_listener(reports.append)
+    actuator.subscribe(100)
+    try:
+        sleep(0.2)
+        assert len(reports) >= 10
+        assert actuator.get_value(with_age=True)[1] < 0.05
+    finally:
+        actuator.unsubscribe()
+    count = len(reports)
+    sleep(0.1)
+    assert len(reports) <= count + 1  # a report may have been pending
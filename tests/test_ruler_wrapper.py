@@ -0,0 +1,23 @@
+import numpy as np
+
+from pymodaq_plugins_arduino.hardware.ruler_wrapper import IK220
+from pymodaq_plugins_arduino.hardware.simulator import SimulatedIK220Dll
+
+
+def test_read_axes_in_one_pass():
+    ruler = IK220(dll=SimulatedIK220Dll(axes=[0, 2, 3], position_source=lambda axis: 0.25 * axis))
+    assert ruler.axis == [0, 2, 3]
+    positions, status, alarm = ruler.read_axes()
+    assert np.allclose(positions, [0., 1., 1.5])  # raw positions multiplied by 2
+    assert not status.any() and not alarm.any()
+    positions = ruler.read_axes([3, 2])[0]
+    assert np.allclose(positions, [1.5, 1.])  # in the requested order
+    assert np.allclose(positions, [ruler.read_axis(axis)[0] for axis in (3, 2)])
+    assert np.allclose(ruler.get_axes_positions([2, 3]), [1., 1.5])
+
+
+def test_read_axes_follows_the_simulated_stepper(actuator):
+    ruler = IK220(dll=SimulatedIK220Dll(axes=[1]))
+    actuator.move_at(50, timeout=2)
+    assert np.allclose(ruler.read_axes([1])[0], [0.1])  # 500 steps per ruler unit
+    assert ruler.get_axis_position(1) == 0.1
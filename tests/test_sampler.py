@@ -0,0 +1,40 @@
+import numpy as np
+
+from pymodaq_plugins_arduino.hardware.sampler import RingBuffer, EncoderSampler
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(size=4, n_axes=2)
+    assert buffer.latest() is None
+    for ind in range(6):
+        buffer.append(ind, [ind, -ind], 0, 0)
+    assert buffer.count == 6
+    timestamps, positions, status, alarm = buffer.last(10)  # clipped to the size, oldest first
+    assert np.array_equal(timestamps, [2, 3, 4, 5])
+    assert np.array_equal(positions[:, 1], [-2, -3, -4, -5])
+    assert buffer.latest()[0] == 5
+    *samples, count = buffer.since(4)
+    assert np.array_equal(samples[0], [4, 5]) and count == 6
+    assert len(buffer.since(count)[0]) == 0
+
+
+def test_sampler_fills_the_buffer(ruler):
+    sampler = EncoderSampler(ruler.read_axes, [1], rate=1000., size=100)
+    sampler.start()
+    try:
+        assert sampler.running
+        assert sampler.latest_position(1) == ruler.read_axes([1])[0][0]
+    finally:
+        sampler.stop()
+    assert not sampler.running
+    timestamps = sampler.buffer.last(sampler.buffer.count)[0]
+    assert len(timestamps) > 0 and np.all(np.diff(timestamps) > 0)
+
+
+def test_reads_from_the_sampler(actuator, ruler):
+    ruler.start_sampling(axes=[1], rate=1000.)
+    actuator.move_at(50, timeout=2)
+    samples = ruler.sample_axes([1], n_samples=5)
+    assert samples.shape == (5, 1)
+    assert np.allclose(samples, 0.1)  # 500 steps per ruler unit
+    assert ruler.get_axis_position(1) == 0.1
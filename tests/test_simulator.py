@@ -0,0 +1,59 @@
+from time import sleep
+
+import pytest
+
+from pymodaq_plugins_arduino.hardware.base import StepperBoardBase
+from pymodaq_plugins_arduino.hardware.simulator import SimulatedTelemetrix, STEPPER_CURRENT_POSITION, \
+    STEPPER_RUNNING_REPORT
+
+
+@pytest.fixture
+def board():
+    board = SimulatedTelemetrix()
+    yield board
+    board.shutdown()
+
+
+def test_arguments_are_checked_as_by_telemetrix(board):
+    motor = board.set_pin_mode_stepper(interface=2, pin1=3, pin2=4)
+    board.stepper_set_speed(motor, -1000)
+    board.stepper_set_max_speed(motor, 1000)
+    board.stepper_set_acceleration(motor, 1)
+    board.stepper_move_to(motor, 10)
+    for method, value in [(board.stepper_set_speed, 1001), (board.stepper_set_max_speed, 0),
+                          (board.stepper_set_max_speed, 20000), (board.stepper_set_acceleration, 100000)]:
+        with pytest.raises(RuntimeError):
+            method(motor, value)
+    for method, value in [(board.stepper_set_speed, 500.), (board.stepper_set_max_speed, 500.5),
+                          (board.stepper_set_acceleration, 200.), (board.stepper_move_to, 10.)]:
+        with pytest.raises(TypeError):
+            method(motor, value)
+
+
+def test_reports_have_the_telemetrix_layout(board):
+    motor = board.set_pin_mode_stepper(interface=2, pin1=3, pin2=4)
+    board.stepper_set_max_speed(motor, 1000)
+    board.stepper_set_acceleration(motor, 1000)
+    reports = []
+    board.stepper_move_to(motor, 100)
+    board.stepper_run(motor)
+    board.stepper_is_running(motor, reports.append)
+    board.stepper_get_current_position(motor, reports.append)
+    board.stepper_stop(motor)
+    board.stepper_is_running(motor, reports.append)
+    sleep(0.05)
+    assert [report[:3] for report in reports[::2]] == [[STEPPER_RUNNING_REPORT, motor, 1],
+                                                        [STEPPER_RUNNING_REPORT, motor, 0]]
+    assert reports[1][:2] == [STEPPER_CURRENT_POSITION, motor]
+    assert all(len(report) == 4 for report in reports)  # [report id, motor id, value, time]
+
+
+def test_boards_implement_the_whole_stepper_api(board):
+    assert isinstance(board, StepperBoardBase)
+
+    class IncompleteBoard(StepperBoardBase):
+        def stepper_move_to(self, motor_id, position):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteBoard()
@@ -0,0 +1,22 @@
+from pymodaq_plugins_arduino.hardware.telemetrix_pool import TelemetrixPool, SIMULATED_PORT
+
+
+def test_boards_are_shared_and_reference_counted():
+    pool = TelemetrixPool()
+    board = pool.acquire(SIMULATED_PORT)
+    assert pool.acquire(SIMULATED_PORT) is board
+    assert pool.users(SIMULATED_PORT) == 2
+    assert not pool.release(SIMULATED_PORT)
+    assert pool.board(SIMULATED_PORT) is board
+    assert pool.release(SIMULATED_PORT)
+    assert pool.board(SIMULATED_PORT) is None
+    assert not pool.release(SIMULATED_PORT)
+
+
+def test_steppers_are_declared_once_per_pins():
+    pool = TelemetrixPool()
+    pool.acquire(SIMULATED_PORT)
+    motor = pool.get_stepper(SIMULATED_PORT, interface=2, pin1=3, pin2=4)
+    assert pool.get_stepper(SIMULATED_PORT, interface=2, pin1=3, pin2=4) == motor
+    assert pool.get_stepper(SIMULATED_PORT, interface=2, pin1=5, pin2=6) != motor
+    pool.release(SIMULATED_PORT)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_arduino.hardware.motion_profile import MotionPlanner
+from pymodaq_plugins_arduino.hardware.trajectory import waypoints
+
+
+def test_waypoints():
+    assert np.allclose(waypoints(0, 1, 0.25), [0, 0.25, 0.5, 0.75, 1])
+    assert np.allclose(waypoints(1, 0, 0.4), [1, 0.6, 0.2])
+    with pytest.raises(ValueError):
+        waypoints(0, 1, 0)
+
+
+def test_trajectory_reaches_the_waypoints_in_order(actuator):
+    reached = []
+    trajectory = actuator.run_trajectory([10, 30, 20, 60], speed=1000,
+                                         callback=lambda index, position, timestamp: reached.append(index),
+                                         wait=True, timeout=5)
+    assert trajectory.future.done()
+    assert np.array_equal(trajectory.reached, [10, 30, 20, 60])
+    assert reached == [0, 1, 2, 3]
+    assert np.all(np.diff(trajectory.timestamps) > 0)
+    assert trajectory.elapsed > 0
+
+
+def test_stop_cancels_the_trajectory(actuator):
+    trajectory = actuator.run_trajectory([100000, 0], speed=1000)
+    actuator.stop()
+    assert trajectory.future.cancelled()
+
+
+def test_constant_speed_out_of_the_telemetrix_range(actuator):
+    with pytest.raises(ValueError):
+        actuator.run_trajectory([100], speed=10000)
+    with pytest.raises(ValueError):
+        actuator.move_at(100, speed=0.2)
+    assert not actuator.running
+
+
+def test_accelerated_waypoints_are_planned(actuator):
+    planner = MotionPlanner(800, 400)
+    actuator.set_planner(planner)
+    actuator.run_trajectory([20, 40], wait=True, timeout=5)
+    axis = actuator._axis()
+    assert (axis.max_speed, axis.acceleration) == (800, 400)
+
+
+def test_repeated_waypoints_do_not_recurse(actuator):
+    trajectory = actuator.run_trajectory([0] * 3000 + [100], wait=True, timeout=5)
+    assert trajectory.future.done()
+    assert trajectory.index == 3001
+    assert trajectory.reached[-1] == 100
+
+
+def test_send_failure_is_reported_by_the_future(actuator):
+    axis = actuator._axis()
+    start_move = axis.start_move
+
+    def failing_second_move(value, speed=None):
+        if value == 200:
+            raise ConnectionError('board disconnected')
+        return start_move(value, speed=speed)
+
+    axis.start_move = failing_second_move
+    try:
+        trajectory = actuator.run_trajectory([100, 200])
+        with pytest.raises(ConnectionError):
+            trajectory.future.result(2)
+        assert trajectory.index == 1
+    finally:
+        del axis.start_move